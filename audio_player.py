@@ -1,17 +1,11 @@
 import wave
-import pyaudio
-import pygame
-from pydub import AudioSegment
-from mutagen.mp3 import MP3
 import time
 import os
 import asyncio
 import subprocess
 import threading
-import sounddevice as sd
-import soundfile as sf
-import keyboard
-import numpy as np
+# The audio libraries (pygame, pyaudio, sounddevice, soundfile, mutagen, pydub) are imported by the methods that use them,
+# so importing this module is instant and each one is only loaded if that playback/recording path is actually used
 
 
 class AudioManager:
@@ -21,18 +15,23 @@ class AudioManager:
     def play_audio(self, audio_path, block=True, fade_in=False, use_pygame=True):
         """
         Play an audio file using pygame or another method.
+        audio_path can also be an in-memory file object (e.g. the BytesIO returned by the speech managers).
+        Returns the pygame Channel it's playing on, which can be used to stop() it early.
         """
         if use_pygame:
             import pygame.mixer
             pygame.mixer.init()
+            if hasattr(audio_path, "seek"):
+                audio_path.seek(0)
             sound = pygame.mixer.Sound(audio_path)
             if fade_in:
-                sound.play(fade_ms=1000)
+                channel = sound.play(fade_ms=1000)
             else:
-                sound.play()
+                channel = sound.play()
             if block:
                 while pygame.mixer.get_busy():
                     time.sleep(0.1)
+            return channel
         else:
             # Implement other playback methods if needed
             pass
@@ -41,6 +40,10 @@ class AudioManager:
         """
         Record audio from the microphone and save it to a file with improved naming.
         """
+        import keyboard
+        import numpy as np
+        import sounddevice as sd
+        import soundfile as sf
         samplerate = 44100
         channels = 1
         print("[green]Recording... Press {} to stop.".format(end_recording_key))
@@ -80,11 +83,33 @@ class AudioManager:
         #         except PermissionError:
         #             print(f"Couldn't remove {file_path} because it is being used by another process.")
 
+    def stream_microphone(self, on_frames, end_recording_key='num 8', samplerate=16000, block_seconds=0.1):
+        """
+        Records from the default mic until end_recording_key is pressed, handing each block of audio to on_frames as it arrives
+        (float32 mono numpy array), e.g. so it can be transcribed while you're still talking.
+        Returns the whole recording as a numpy array.
+        """
+        import keyboard
+        import numpy as np
+        import sounddevice as sd
+        recording = []
+        def callback(indata, frames, time_info, status):
+            block = indata[:, 0].copy()
+            recording.append(block)
+            on_frames(block)
+
+        print("[green]Recording... Press {} to stop.".format(end_recording_key))
+        with sd.InputStream(samplerate=samplerate, channels=1, dtype='float32', blocksize=int(samplerate * block_seconds), callback=callback):
+            while not keyboard.is_pressed(end_recording_key):
+                time.sleep(0.02)
+        return np.concatenate(recording) if recording else np.zeros(0, dtype=np.float32)
+
     async def play_audio_async(self, file_path):
         """
         Parameters:
         file_path (str): path to the audio file
         """
+        import pygame
         if not pygame.mixer.get_init(): # Reinitialize mixer if needed
             pygame.mixer.init(frequency=48000, buffer=1024) 
         pygame_sound = pygame.mixer.Sound(file_path) 
@@ -96,13 +121,23 @@ class AudioManager:
         await asyncio.sleep(file_length)
     
     def get_audio_length(self, file_path):
+        from pydub import AudioSegment
+        # In-memory audio (BytesIO) carries its format in its .name
+        if hasattr(file_path, "read"):
+            _, ext = os.path.splitext(getattr(file_path, "name", "tts.mp3"))
+            file_path.seek(0)
+            file_length = AudioSegment.from_file(file_path, format=ext[1:]).duration_seconds
+            file_path.seek(0)
+            return file_length
         # Calculate length of the file based on the file format
         _, ext = os.path.splitext(file_path) # Get the extension of this file
         if ext.lower() == '.wav':
+            import soundfile as sf
             wav_file = sf.SoundFile(file_path)
             file_length = wav_file.frames / wav_file.samplerate
             wav_file.close()
         elif ext.lower() == '.mp3':
+            from mutagen.mp3 import MP3
             mp3_file = MP3(file_path)
             file_length = mp3_file.info.length
         else:
@@ -112,6 +147,7 @@ class AudioManager:
     
     def combine_audio_files(self, input_files):
         # input_files is an array of file paths
+        from pydub import AudioSegment
         output_file = os.path.join(os.path.abspath(os.curdir), f"___Msg{str(hash(' '.join(input_files)))}.wav")
         combined = None
         for file in input_files:
@@ -139,6 +175,8 @@ class AudioManager:
         # Example device names are "Line In (Realtek(R) Audio)", "Sample (TC-Helicon GoXLR)", or just leave empty to use default mic
         # For some reason this doesn't work on the Broadcast GoXLR Mix, the other 3 GoXLR audio inputs all work fine.
         # Both Azure Speech-to-Text AND this script have issues listening to Broadcast Stream Mix, so just ignore it.
+        import keyboard
+        import pyaudio
         audio = pyaudio.PyAudio()
         
         if audio_device is None:
@@ -196,3 +234,87 @@ class AudioManager:
 
         return filename
         
+
+
+class StreamingAudioPlayer:
+    """
+    Plays raw 16-bit mono PCM while it is still arriving (e.g. streamed TTS).
+    Call feed() with each chunk of audio, and finish() once there is no more.
+    Playback starts once preroll_seconds of audio has been buffered, or on finish() for clips shorter than that.
+    If the audio arrives slower than it plays, silence is played until the next chunk shows up.
+    """
+
+    def __init__(self, sample_rate=22050, preroll_seconds=0.25):
+        self.sample_rate = sample_rate
+        self.preroll_bytes = int(sample_rate * preroll_seconds) * 2
+        self.played_bytes = 0
+        self.started_at = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._finished = False
+        self._stopped = False
+        self._stream = None
+        self._done = threading.Event()
+
+    @property
+    def position(self):
+        # How many seconds of audio have been played so far
+        return self.played_bytes / 2 / self.sample_rate
+
+    def feed(self, data):
+        with self._lock:
+            self._buffer.extend(data)
+            ready = len(self._buffer) >= self.preroll_bytes
+        if ready:
+            self._start()
+
+    def finish(self):
+        with self._lock:
+            self._finished = True
+        self._start()
+
+    def wait(self):
+        # Blocks until everything that was fed in has been played
+        self._done.wait()
+        if self._stream is not None:
+            self._stream.close()
+
+    def stop(self):
+        # Cuts playback off straight away. Anything fed in afterwards is ignored
+        with self._lock:
+            self._stopped = True
+            stream = self._stream
+        if stream is not None:
+            stream.abort()
+            stream.close()
+        self._done.set()
+
+    def _start(self):
+        import sounddevice as sd
+        with self._lock:
+            if self._stream is not None or self._stopped:
+                return
+            self._stream = sd.RawOutputStream(
+                samplerate=self.sample_rate,
+                channels=1,
+                dtype="int16",
+                callback=self._callback,
+                finished_callback=self._done.set,
+            )
+        self.started_at = time.perf_counter()
+        self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        needed = len(outdata)
+        with self._lock:
+            chunk = bytes(self._buffer[:needed])
+            del self._buffer[:needed]
+            finished = self._finished and not self._buffer
+        self.played_bytes += len(chunk)
+        outdata[:len(chunk)] = chunk
+        if len(chunk) < needed:
+            # Buffer underrun, pad with silence
+            outdata[len(chunk):] = b"\x00" * (needed - len(chunk))
+            if finished:
+                import sounddevice as sd
+                raise sd.CallbackStop
@@ -0,0 +1,183 @@
+import os
+import re
+import json
+import time
+import itertools
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pydub import AudioSegment
+from rich import print
+
+from subtitle_timing import load_audio, format_srt, format_vtt
+from process_workers import SpeechWorker, WorkerError, ROLES
+
+# Renders a finished show from a conversation backup (backup_history_<agent>.txt), without replaying it in real time:
+# every line is synthesized in parallel through the speech managers, then everything is laid out back to back (with the
+# same pause between speakers as the live show) into one audio file, plus .srt and .vtt subtitles next to it.
+#
+#     python batch_render.py backup_history_OSWALD.txt --engine offline --output renders/show.wav
+#     python batch_render.py backup_history_OSWALD.txt --engine elevenlabs --voice "TONY KING=Tony Voice" --speakers OSWALD "TONY KING"
+#
+# Each agent's backup holds the whole conversation: its own lines are the assistant messages, everyone else's are "[NAME] text".
+# The local engines render in one worker process per core (piper can only do one line at a time per process).
+# ElevenLabs is network bound, so it renders on threads in this process instead.
+
+SPEAKER_LINE = re.compile(r"^\[(?P<speaker>[^\]]+)\]\s*(?P<text>.*)$", re.S)
+
+
+def load_transcript(backup_file, agent_name=None):
+    """Returns the show's lines in order, as (speaker, text). agent_name defaults to the one in the file name"""
+    if agent_name is None:
+        match = re.match(r"backup_history_(.+)\.txt$", os.path.basename(backup_file))
+        agent_name = match.group(1) if match else "AGENT"
+    with open(backup_file, "r") as file:
+        history = json.load(file)
+    lines = []
+    for message in history:
+        content = message.get("content")
+        # System prompts, and the "what is your response?" prompts (lists of content parts), aren't part of the show
+        if not isinstance(content, str):
+            continue
+        if message.get("role") == "assistant":
+            lines.append((agent_name, content.replace("*", "").strip()))
+        elif message.get("role") == "user":
+            match = SPEAKER_LINE.match(content.strip())
+            if match:
+                lines.append((match.group("speaker"), match.group("text").strip()))
+    return [(speaker, text) for speaker, text in lines if text]
+
+
+class _Synthesizers:
+    """submit(text, voice) -> Future of (audio, timings), spread over worker processes, or threads in this process if processes=0"""
+
+    def __init__(self, backend, processes, threads):
+        self._workers = []
+        self._executor = None
+        # archive_dir="" keeps every clip in memory, whatever TTS_ARCHIVE_DIR says
+        if processes:
+            print(f"[cyan]Starting {processes} {backend} speech worker processes...")
+            # Each one loads its engine, so start them all at once
+            with ThreadPoolExecutor(processes) as starter:
+                self._workers = list(starter.map(lambda _: SpeechWorker(backend, threads=threads, archive_dir=""), range(processes)))
+            self._next_worker = itertools.cycle(self._workers)
+        else:
+            self._manager = ROLES["speech"](backend, archive_dir="")
+            self._executor = ThreadPoolExecutor(threads, thread_name_prefix="batch-render")
+
+    def submit(self, text, voice):
+        # save_as_wave=False is what the agents use live, so the clips come out the same as on the show (e.g. gTTS's speed-up)
+        if self._workers:
+            return next(self._next_worker).submit("text_to_audio_with_timings", text, voice, False)
+        return self._executor.submit(self._manager.text_to_audio_with_timings, text, voice, False)
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+
+def render_show(lines, backend="offline", voices=None, processes=None, threads=2, gap=1.0, speaker_names=True, frame_rate=24000):
+    """
+    Synthesizes every (speaker, text) line and lays them out one after another, gap seconds apart.
+    voices maps speaker -> voice name (a speaker's own name is used otherwise).
+    Returns (audio, subtitle timings), with the timings in the same format as the rest of the app uses.
+    """
+    voices = voices or {}
+    if processes is None:
+        processes = 0 if backend == "elevenlabs" else os.cpu_count()
+    start_time = time.perf_counter()
+    synthesizers = _Synthesizers(backend, processes, threads)
+    setup_time = time.perf_counter() - start_time
+    print(f"[cyan]Rendering {len(lines)} lines with {backend} ({processes or 'no'} worker processes, {threads} threads each)")
+
+    clips = [None] * len(lines)
+    rendered_seconds = 0.0
+    failed = 0
+    last_report = 0.0
+    start_time = time.perf_counter()
+    try:
+        futures = {synthesizers.submit(text, voices.get(speaker, speaker)): index for index, (speaker, text) in enumerate(lines)}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                audio, timings = future.result()
+                if audio is None:
+                    raise RuntimeError("no audio was generated")
+                # Every clip in the same format, so they can be joined as raw PCM
+                segment = load_audio(audio).set_frame_rate(frame_rate).set_channels(1).set_sample_width(2)
+                clips[index] = (segment, timings)
+                rendered_seconds += len(segment) / 1000
+            except Exception as e:
+                failed += 1
+                print(f"[red]Couldn't render line {index + 1} ({lines[index][0]}): {e}")
+            elapsed = time.perf_counter() - start_time
+            if elapsed - last_report >= 1.0 or done_count == len(lines):
+                last_report = elapsed
+                print(f"[white]{done_count}/{len(lines)} lines, {rendered_seconds:.0f}s of audio in {elapsed:.1f}s "
+                      f"({rendered_seconds / max(elapsed, 1e-9):.1f}x real time, {done_count / max(elapsed, 1e-9):.1f} lines/s)")
+    finally:
+        synthesizers.close()
+
+    # Lay everything out in one buffer, rather than adding AudioSegments together (which copies the whole show every time)
+    pcm_audio = bytearray()
+    gap_bytes = b"\x00\x00" * int(gap * frame_rate)
+    subtitles = []
+    for (speaker, text), clip in zip(lines, clips):
+        if clip is None:
+            continue
+        segment, timings = clip
+        offset = len(pcm_audio) / 2 / frame_rate
+        for timing in timings or [{"text": text, "start_time": 0.0, "end_time": len(segment) / 1000}]:
+            subtitle_text = f"{speaker}: {timing['text'].strip()}" if speaker_names else timing["text"]
+            subtitles.append({"text": subtitle_text, "start_time": offset + timing["start_time"], "end_time": offset + timing["end_time"]})
+        pcm_audio += segment.raw_data
+        pcm_audio += gap_bytes
+    show = AudioSegment(data=bytes(pcm_audio), sample_width=2, frame_rate=frame_rate, channels=1)
+
+    total_time = time.perf_counter() - start_time
+    print(f"[green]Rendered {len(lines) - failed}/{len(lines)} lines, {len(show) / 1000:.0f}s of show in {total_time:.1f}s "
+          f"({len(show) / 1000 / max(total_time, 1e-9):.1f}x real time, plus {setup_time:.1f}s loading the speech engines)")
+    return show, subtitles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a conversation backup into one audio file with SRT/VTT subtitles")
+    parser.add_argument("backup_file", help="a backup_history_<agent>.txt file")
+    parser.add_argument("--agent", default=None, help="whose backup this is (taken from the file name by default)")
+    parser.add_argument("--engine", default="offline", choices=["offline", "gtts", "elevenlabs"])
+    parser.add_argument("--output", default=None, help="audio file to write, .wav or .mp3 (default renders/<backup name>.wav)")
+    parser.add_argument("--voice", action="append", default=[], metavar="SPEAKER=VOICE", help="voice for a speaker (default: the speaker's name)")
+    parser.add_argument("--speakers", nargs="+", default=None, help="only render these speakers' lines")
+    parser.add_argument("--processes", type=int, default=None, help="speech worker processes (default: one per core, none for elevenlabs)")
+    parser.add_argument("--threads", type=int, default=2, help="lines each process renders at once")
+    parser.add_argument("--gap", type=float, default=1.0, help="seconds of silence between lines")
+    parser.add_argument("--no-speaker-names", action="store_true", help="don't put the speaker's name in front of each subtitle")
+    args = parser.parse_args()
+
+    lines = load_transcript(args.backup_file, args.agent)
+    if args.speakers:
+        lines = [(speaker, text) for speaker, text in lines if speaker in args.speakers]
+    if not lines:
+        print(f"[red]No lines to render in {args.backup_file}")
+        return
+    voices = dict(voice.split("=", 1) for voice in args.voice)
+    output = args.output or os.path.join("renders", os.path.splitext(os.path.basename(args.backup_file))[0] + ".wav")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    try:
+        show, subtitles = render_show(lines, args.engine, voices, args.processes, args.threads, args.gap, not args.no_speaker_names)
+    except WorkerError as e:
+        print(f"[red]{e}")
+        return
+    base, ext = os.path.splitext(output)
+    show.export(output, format=ext[1:] or "wav")
+    with open(base + ".srt", "w", encoding="utf-8") as file:
+        file.write(format_srt(subtitles))
+    with open(base + ".vtt", "w", encoding="utf-8") as file:
+        file.write(format_vtt(subtitles))
+    print(f"[green]Wrote {output}, {base}.srt and {base}.vtt")
+
+
+if __name__ == "__main__":
+    main()
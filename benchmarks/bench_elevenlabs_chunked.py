@@ -0,0 +1,59 @@
+# Compares one long ElevenLabs request against parallel sentence-chunked requests, using the local stand-in server.
+# The stand-in takes request_latency + latency_per_character * len(text) to answer each request, like the real API.
+#
+#     python -m benchmarks.bench_elevenlabs_chunked --latency 0.3 --per-char 0.01 --concurrency 3
+
+import os
+import time
+import argparse
+from rich import print
+
+from benchmarks.standins import ElevenLabsStandIn, install_elevenlabs_sdk_standin
+from metrics import metrics
+
+SAMPLE_TEXT = (
+    "Okay, listen up, because I am only going to say this once. "
+    "The greatest videogame of all time is obviously the one where you play as a sentient pepper fighting a war against salt. "
+    "Nobody else remembers it, but that is because the rest of you have no taste. "
+    "Also I will be taking questions at the end, but only from Victoria."
+)
+
+
+def run(manager, text, repeats):
+    first_audio = []
+    total = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        manager.stream_to_audio(text, "OSWALD", autoplay=False)
+        total.append(time.perf_counter() - start_time)
+        first_audio.append(metrics.timings["elevenlabs.stream.first_byte"][-1])
+    return sum(first_audio) / repeats, sum(total) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs parallel chunked ElevenLabs synthesis against a local stand-in")
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed latency per request, in seconds")
+    parser.add_argument("--per-char", type=float, default=0.01, help="extra latency per character of text, in seconds")
+    parser.add_argument("--concurrency", type=int, default=3, help="max concurrent requests for the chunked mode")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # Imported here so the stand-in's address is in place before the manager is built
+    os.environ.setdefault("ELEVENLABS_API_KEY", "standin")
+    install_elevenlabs_sdk_standin()
+    from eleven_labs import ElevenLabsManager
+
+    with ElevenLabsStandIn(request_latency=args.latency, latency_per_character=args.per_char, first_byte_delay=0, chunk_delay=0) as standin:
+        single = ElevenLabsManager(base_url=standin.url, cache=False, parallel_chunks=False)
+        chunked = ElevenLabsManager(base_url=standin.url, cache=False, parallel_chunks=True, max_concurrent_requests=args.concurrency)
+        single_first, single_total = run(single, SAMPLE_TEXT, args.repeats)
+        chunked_first, chunked_total = run(chunked, SAMPLE_TEXT, args.repeats)
+
+    print(f"[cyan]{len(SAMPLE_TEXT)} characters, {args.latency}s + {args.per_char}s/char per request, {args.repeats} runs each")
+    print(f"[white]single request:  first audio {single_first:.3f}s, complete {single_total:.3f}s")
+    print(f"[white]parallel chunks: first audio {chunked_first:.3f}s, complete {chunked_total:.3f}s (concurrency {args.concurrency})")
+    print(f"[green]first audio {single_first / chunked_first:.1f}x sooner, complete clip {single_total / chunked_total:.1f}x sooner")
+
+
+if __name__ == "__main__":
+    main()
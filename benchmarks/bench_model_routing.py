@@ -0,0 +1,69 @@
+# Turn cadence with and without the model router's latency-SLA fallback, against a local OpenAI stand-in where the
+# primary model (gpt-4o) is now and then very slow and the fallback (gpt-4o-mini) always answers quickly.
+# Reports the turn time percentiles and how many turns each model ended up answering.
+#
+#     python -m benchmarks.bench_model_routing --turns 60 --slow 0.15 --sla 2
+
+import os
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import time
+import argparse
+from collections import Counter
+from rich import print
+
+from benchmarks.standins import OpenAIStandIn
+from benchmarks.bench_openai_resilience import MESSAGES, percentile
+from openai_chat import OpenAiManager
+from model_router import model_router
+
+
+def run(args, routed):
+    with OpenAIStandIn(request_latency=args.latency, slow_fraction=args.slow, slow_latency=args.slow_latency,
+                       model_latency={model_router.fallback_model: args.fallback_latency}, seed=args.seed) as standin:
+        manager = OpenAiManager(name="benchmark", base_url=standin.url + "/v1", deadline=30)
+        turn_times = []
+        answered_by = Counter()
+        for _ in range(args.turns):
+            start_time = time.perf_counter()
+            try:
+                completion = manager._create_completion("conversation", MESSAGES, estimated_prompt_tokens=0,
+                                                        model=None if routed else model_router.default_model)
+                answered_by[completion.model] += 1
+            except Exception:
+                answered_by["no answer"] += 1
+            turn_times.append(time.perf_counter() - start_time)
+        return turn_times, answered_by
+
+
+def report(name, turn_times, answered_by):
+    print(f"[white]{name}: p50 {percentile(turn_times, 50):.2f}s / p95 {percentile(turn_times, 95):.2f}s / max {max(turn_times):.2f}s, "
+          f"answered by {dict(answered_by)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turn times with and without latency-SLA model fallback, against a local OpenAI stand-in")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.8, help="the primary model's normal response time, in seconds")
+    parser.add_argument("--slow", type=float, default=0.15, help="fraction of the primary model's requests that are very slow")
+    parser.add_argument("--slow-latency", type=float, default=8.0)
+    parser.add_argument("--fallback-latency", type=float, default=0.3, help="the fallback model's response time")
+    parser.add_argument("--sla", type=float, default=2.0, help="turn SLA, seconds the primary model gets before falling back")
+    parser.add_argument("--cooldown", type=float, default=1.0, help="seconds a route stays on the fallback model after a miss")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    model_router.turn_sla = args.sla
+    model_router.cooldown = args.cooldown
+    primary_only = run(args, routed=False)
+    routed = run(args, routed=True)
+
+    print(f"[cyan]{args.turns} turns, {model_router.default_model} takes {args.latency:.1f}s ({args.slow:.0%} take {args.slow_latency:.0f}s), "
+          f"{model_router.fallback_model} takes {args.fallback_latency:.1f}s, {args.sla:.1f}s turn SLA")
+    report("primary model only", *primary_only)
+    report("model router      ", *routed)
+    print(f"[green]p95 turn time {percentile(primary_only[0], 95):.2f}s -> {percentile(routed[0], 95):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# How long a whole visual cue (filter on, source visible, transform) takes to reach OBS, using the local OBS stand-in.
+# Compares one blocking request at a time with a GetSceneItemId before every scene item request (the old way)
+# against cached sceneItemIds plus a single RequestBatch.
+#
+#     python -m benchmarks.bench_obs_batching --latency 0.02 --cues 20
+
+import time
+import argparse
+from rich import print
+
+from benchmarks.standins import OBSStandIn
+from benchmarks.bench_obs_client import wait_for
+from obs_websockets import OBSWebsocketsManager
+
+SCENE = "Scene"
+SOURCE = "OSWALD"
+
+
+def cue_applied(standin, cue):
+    item = standin.scene_items[SCENE].get(SOURCE)
+    return (item is not None and standin.filters.get(("Line In", "Move OSWALD")) == cue["enabled"]
+            and item["sceneItemEnabled"] == cue["enabled"] and item["sceneItemTransform"]["scaleX"] == cue["scale"])
+
+
+def sequential_cue(manager, cue):
+    # What the original client did: every request waits for its answer, and scene item requests look up the id first
+    manager.call("SetSourceFilterEnabled", {"sourceName": "Line In", "filterName": "Move OSWALD", "filterEnabled": cue["enabled"]})
+    item_id = manager.call("GetSceneItemId", {"sceneName": SCENE, "sourceName": SOURCE})["sceneItemId"]
+    manager.call("SetSceneItemEnabled", {"sceneName": SCENE, "sceneItemId": item_id, "sceneItemEnabled": cue["enabled"]})
+    item_id = manager.call("GetSceneItemId", {"sceneName": SCENE, "sourceName": SOURCE})["sceneItemId"]
+    manager.call("SetSceneItemTransform", {"sceneName": SCENE, "sceneItemId": item_id, "sceneItemTransform": {"scaleX": cue["scale"], "scaleY": cue["scale"]}})
+
+
+def batched_cue(manager, standin, cue):
+    with manager.batch():
+        manager.set_filter_visibility("Line In", "Move OSWALD", cue["enabled"])
+        manager.set_source_visibility(SCENE, SOURCE, cue["enabled"])
+        manager.set_source_transform(SCENE, SOURCE, {"scaleX": cue["scale"], "scaleY": cue["scale"]})
+    wait_for(lambda: cue_applied(standin, cue))
+
+
+def measure(standin, cues, run_cue):
+    start_messages = standin.message_count
+    start_time = time.perf_counter()
+    for cue in cues:
+        run_cue(cue)
+    return (time.perf_counter() - start_time) / len(cues), (standin.message_count - start_messages) / len(cues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs batched OBS visual cues against a local OBS stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="round trip time of each OBS message, in seconds")
+    parser.add_argument("--cues", type=int, default=20, help="visual cues to send with each approach")
+    args = parser.parse_args()
+    cues = [{"enabled": i % 2 == 0, "scale": 1.0 + (i % 5) / 10} for i in range(args.cues)]
+
+    with OBSStandIn(request_latency=args.latency) as standin:
+        manager = OBSWebsocketsManager(host="127.0.0.1", port=standin.port, password="")
+        wait_for(lambda: manager.connected)
+
+        sequential_time, sequential_messages = measure(standin, cues, lambda cue: sequential_cue(manager, cue))
+        # The first batched cue also has to look up the sceneItemId
+        cold_time, cold_messages = measure(standin, cues[:1], lambda cue: batched_cue(manager, standin, dict(cue, scale=9.0)))
+        batched_time, batched_messages = measure(standin, cues, lambda cue: batched_cue(manager, standin, cue))
+
+        # Recreating the source in OBS gives it a new id, the SceneItem events make the client look it up again
+        standin.remove_scene_item(SCENE, SOURCE)
+        standin.add_scene_item(SCENE, SOURCE)
+        time.sleep(args.latency)
+        recreated_time, _ = measure(standin, cues[:1], lambda cue: batched_cue(manager, standin, dict(cue, scale=7.0)))
+        manager.disconnect()
+
+    print(f"[cyan]{args.cues} cues (filter + visibility + transform), {args.latency * 1000:.0f}ms per OBS round trip")
+    print(f"[white]sequential requests: {sequential_time * 1000:.1f}ms per cue, {sequential_messages:.0f} round trips")
+    print(f"[white]batched, cold cache: {cold_time * 1000:.1f}ms for the first cue, {cold_messages:.0f} round trips")
+    print(f"[white]batched, warm cache: {batched_time * 1000:.1f}ms per cue, {batched_messages:.0f} round trip")
+    print(f"[white]after the source was recreated in OBS: {recreated_time * 1000:.1f}ms")
+    print(f"[green]{sequential_time / batched_time:.1f}x faster per cue")
+
+
+if __name__ == "__main__":
+    main()
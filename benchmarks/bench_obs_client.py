@@ -0,0 +1,95 @@
+# How long OBS calls hold up the speaking thread, using the local OBS stand-in.
+# Compares waiting for each request (what a blocking client does) against the fire-and-forget command queue,
+# then checks coalescing, reconnecting after OBS drops the connection, and starting up with OBS not running at all.
+#
+#     python -m benchmarks.bench_obs_client --latency 0.02 --turns 20
+
+import time
+import socket
+import argparse
+from rich import print
+
+from benchmarks.standins import OBSStandIn
+from obs_websockets import OBSWebsocketsManager
+from metrics import metrics
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Timed out waiting for the OBS client")
+        time.sleep(0.005)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocking vs queued OBS requests against a local OBS stand-in")
+    parser.add_argument("--latency", type=float, default=0.02, help="how long the stand-in takes to answer each request, in seconds")
+    parser.add_argument("--turns", type=int, default=20, help="agent turns to simulate (each turns a filter on and off)")
+    args = parser.parse_args()
+
+    with OBSStandIn(password="standin", request_latency=args.latency) as standin:
+        manager = OBSWebsocketsManager(port=standin.port, host="127.0.0.1", password="standin")
+        wait_for(lambda: manager.connected)
+
+        # What every turn used to cost: each toggle waits for OBS to answer
+        start_time = time.perf_counter()
+        for turn in range(args.turns):
+            for enabled in (True, False):
+                manager.call("SetSourceFilterEnabled", {"sourceName": "Line In", "filterName": f"Move {turn % 3}", "filterEnabled": enabled})
+        blocking = (time.perf_counter() - start_time) / args.turns
+
+        # Fire-and-forget: the caller only pays for putting the command on the queue
+        caller_time = 0.0
+        for turn in range(args.turns):
+            start_time = time.perf_counter()
+            manager.set_filter_visibility("Line In", f"Move {turn % 3}", True)
+            caller_time += time.perf_counter() - start_time
+            # Give the sender a moment, like the audio playing between the two toggles
+            time.sleep(args.latency * 2)
+            start_time = time.perf_counter()
+            manager.set_filter_visibility("Line In", f"Move {turn % 3}", False)
+            caller_time += time.perf_counter() - start_time
+        queued = caller_time / args.turns
+
+        # A burst of toggles while OBS is busy collapses into the last state
+        sent_before = standin.request_count
+        for i in range(100):
+            manager.set_filter_visibility("Line In", "Burst", i % 2 == 0)
+        wait_for(lambda: standin.filters.get(("Line In", "Burst")) is False)
+        time.sleep(args.latency * 4)
+        burst_requests = standin.request_count - sent_before
+
+        # OBS closing the connection, e.g. being restarted
+        connects = metrics.counters["obs.connects"]
+        start_time = time.perf_counter()
+        standin.drop_connections()
+        wait_for(lambda: metrics.counters["obs.connects"] > connects and manager.connected)
+        reconnect = time.perf_counter() - start_time
+        manager.disconnect()
+
+    # Nothing listening at all
+    start_time = time.perf_counter()
+    offline = OBSWebsocketsManager(host="127.0.0.1", port=free_port())
+    offline.set_filter_visibility("Line In", "Move 1", True)
+    text = offline.get_text("Subtitles")
+    offline_time = time.perf_counter() - start_time
+    offline.disconnect()
+
+    print(f"[cyan]{args.turns} turns, two filter toggles each, {args.latency * 1000:.0f}ms per OBS request")
+    print(f"[white]blocking requests: {blocking * 1000:.2f}ms per turn on the speaking thread")
+    print(f"[white]queued commands:   {queued * 1000:.3f}ms per turn on the speaking thread")
+    print(f"[white]100 toggles in a burst -> {burst_requests} requests sent to OBS")
+    print(f"[white]reconnected {reconnect:.2f}s after OBS dropped the connection")
+    print(f"[white]without OBS: startup + a toggle + a getter took {offline_time * 1000:.1f}ms (getter returned {text!r})")
+    print(f"[green]{blocking / max(queued, 1e-9):.0f}x less time on the speaking thread per turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Turn latency of OpenAI requests against a local OpenAI stand-in that is sometimes very slow and sometimes fails.
+# Compares a single unbounded request (how chat_with_history used to work) with deadlines + jittered retries,
+# and with hedging on top. Reports the turn time percentiles, how many turns got no answer, and how many requests each turn cost.
+#
+#     python -m benchmarks.bench_openai_resilience --turns 100 --slow 0.03 --slow-latency 8 --deadline 5
+
+import os
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import time
+import argparse
+from rich import print
+
+from benchmarks.standins import OpenAIStandIn
+from openai_chat import OpenAiManager
+from metrics import metrics
+
+MESSAGES = [{"role": "system", "content": "You are Oswald, a skeleton who guards a dungeon door."},
+            {"role": "user", "content": "Okay what is your response? 3 sentences maximum."}]
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))] if samples else float("nan")
+
+
+def run(args, **manager_options):
+    with OpenAIStandIn(request_latency=args.latency, slow_fraction=args.slow, slow_latency=args.slow_latency,
+                       error_fraction=args.errors, seed=args.seed) as standin:
+        manager = OpenAiManager(name="benchmark", base_url=standin.url + "/v1", **manager_options)
+        manager.hedge_after = args.latency * 3
+        turn_times = []
+        failures = 0
+        for _ in range(args.turns):
+            start_time = time.perf_counter()
+            try:
+                # The token estimate needs tiktoken's encoding, which may not be downloadable here
+                # model= skips the model router, so every run uses the same model
+                manager._create_completion("conversation", MESSAGES, estimated_prompt_tokens=0, model="gpt-4o")
+            except Exception:
+                failures += 1
+            turn_times.append(time.perf_counter() - start_time)
+        return turn_times, failures, standin.request_count / args.turns
+
+
+def report(name, turn_times, failures, requests_per_turn):
+    print(f"[white]{name}: p50 {percentile(turn_times, 50):.2f}s / p95 {percentile(turn_times, 95):.2f}s / p99 {percentile(turn_times, 99):.2f}s / "
+          f"max {max(turn_times):.2f}s, {failures} turns without an answer, {requests_per_turn:.2f} requests per turn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI turn latency with deadlines, retries and hedging, against a misbehaving local stand-in")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.1, help="normal response time, in seconds")
+    parser.add_argument("--slow", type=float, default=0.03, help="fraction of requests that are very slow")
+    parser.add_argument("--slow-latency", type=float, default=8.0, help="how long the slow ones take")
+    parser.add_argument("--errors", type=float, default=0.05, help="fraction of requests that fail with a 500")
+    parser.add_argument("--deadline", type=float, default=5.0, help="per-turn deadline for the retrying clients")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    single = run(args, deadline=600, max_retries=0, hedge=False)
+    retries = run(args, deadline=args.deadline, max_retries=3, hedge=False)
+    # The hedge fires at the p95 of the attempts so far, which the runs above have already filled in
+    hedged = run(args, deadline=args.deadline, max_retries=3, hedge=True)
+
+    print(f"[cyan]{args.turns} turns, {args.latency * 1000:.0f}ms normally, {args.slow:.0%} take {args.slow_latency:.1f}s, {args.errors:.0%} fail")
+    report("single request  ", *single)
+    report("deadline+retries", *retries)
+    report("+ hedging       ", *hedged)
+    snapshot = metrics.snapshot()["counters"]
+    print(f"[white]retries {snapshot.get('openai.retries', 0):.0f}, hedges {snapshot.get('openai.hedges', 0):.0f} "
+          f"(won {snapshot.get('openai.hedge_wins', 0):.0f}), deadlines missed {snapshot.get('openai.deadline_exceeded', 0):.0f}")
+    print(f"[green]p99 turn time {percentile(single[0], 99):.2f}s -> {percentile(hedged[0], 99):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# Load test for the overlay's Socket.IO fan-out: starts a Flask-SocketIO server on a local port, connects many simulated
+# overlay/dashboard clients (python-socketio clients over websockets), then sends subtitle events two ways:
+# socketio.emit() straight from the "agent" thread, like the app used to, and through the Broadcaster.
+# Reports how long the agent thread is held up per event, and how long events take to reach the clients.
+# The clients run in this same process, so with a lot of them the delivery times are pessimistic (they all share one GIL).
+#
+#     pip install "python-socketio[client]"
+#     python -m benchmarks.bench_socketio_fanout --clients 200 --events 50
+
+import time
+import socket
+import logging
+import argparse
+import threading
+from flask import Flask
+from flask_socketio import SocketIO, join_room
+import socketio as socketio_client
+from rich import print
+
+from broadcaster import Broadcaster
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples, percent):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))] if samples else float("nan")
+
+
+class SimulatedClient:
+    def __init__(self, url, room):
+        self.latencies = []
+        self.received = 0
+        self.client = socketio_client.Client(reconnection=False)
+        self.client.on("agent_message", self.on_agent_message)
+        self.client.on("connect", lambda: self.client.emit("join", {"room": room}))
+        self.client.connect(url, transports=["websocket"], wait_timeout=10)
+
+    def on_agent_message(self, data):
+        # Same process, so perf_counter() is comparable with the sender's
+        self.latencies.append(time.perf_counter() - data["sent_at"])
+        self.received += 1
+
+
+def run(clients, events, send, gap):
+    for client in clients:
+        client.latencies.clear()
+        client.received = 0
+    caller_times = []
+    for i in range(events):
+        start_time = time.perf_counter()
+        send({"agent_id": 1, "text": f"Sentence number {i}", "sent_at": start_time})
+        caller_times.append(time.perf_counter() - start_time)
+        time.sleep(gap)
+    # Wait for the stragglers
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and any(client.received < events for client in clients):
+        time.sleep(0.05)
+    latencies = [latency for client in clients for latency in client.latencies]
+    delivered = sum(client.received for client in clients)
+    return caller_times, latencies, delivered
+
+
+def report(name, caller_times, latencies, delivered, expected):
+    print(f"[white]{name}: agent thread {sum(caller_times) / len(caller_times) * 1000:.3f}ms per event (max {max(caller_times) * 1000:.2f}ms), "
+          f"delivery p50 {percentile(latencies, 50) * 1000:.1f}ms / p95 {percentile(latencies, 95) * 1000:.1f}ms / max {max(latencies) * 1000:.1f}ms, "
+          f"{delivered}/{expected} delivered")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO fan-out load test with simulated overlay clients")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--events", type=int, default=50, help="subtitle events to send with each approach")
+    parser.add_argument("--gap", type=float, default=0.02, help="seconds between events")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = SocketIO(app, async_mode="threading")
+
+    @server.event
+    def join(data):
+        join_room(data["room"])
+
+    port = free_port()
+    threading.Thread(target=lambda: server.run(app, host="127.0.0.1", port=port, allow_unsafe_werkzeug=True), daemon=True).start()
+    time.sleep(1)
+    url = f"http://127.0.0.1:{port}"
+
+    print(f"[cyan]Connecting {args.clients} clients...")
+    clients = [SimulatedClient(url, "main") for _ in range(args.clients)]
+    # A client in another room, which shouldn't get this conversation's events
+    outsider = SimulatedClient(url, "other")
+    time.sleep(1)
+
+    broadcaster = Broadcaster(server, room="main").start()
+    expected = args.clients * args.events
+    direct = run(clients, args.events, lambda data: server.emit("agent_message", data, to="main"), args.gap)
+    queued = run(clients, args.events, lambda data: broadcaster.emit("agent_message", data), args.gap)
+
+    print(f"[cyan]{args.clients} clients, {args.events} events each way, one every {args.gap * 1000:.0f}ms")
+    report("direct emit ", *direct, expected)
+    report("broadcaster ", *queued, expected)
+    print(f"[white]client in another room received {outsider.received} events")
+    print(f"[green]{(sum(direct[0]) / len(direct[0])) / (sum(queued[0]) / len(queued[0])):.0f}x less time on the agent thread per event")
+
+    # Each disconnect waits on the server, so do them all at once
+    disconnects = [threading.Thread(target=client.client.disconnect) for client in clients + [outsider]]
+    for thread in disconnects:
+        thread.start()
+    for thread in disconnects:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Compares the Whisper backends (WHISPER_BACKEND=torch / int8 / onnx) on the bundled fixtures: real-time factor and word error rate.
+# The fixture transcripts live in benchmarks/fixtures/asr_transcripts.json. Their audio is generated once with espeak-ng into
+# benchmarks/fixtures/audio/, or you can drop your own recordings in there (<name>.wav) to test on real voices.
+#
+#     python -m benchmarks.bench_whisper_backends --backends torch int8 onnx --threads 4
+#
+# Real-time factor = inference time / audio length, so lower is better and anything under 1 is faster than real time.
+
+import os
+import re
+import json
+import time
+import wave
+import shutil
+import argparse
+import subprocess
+from rich import print
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+AUDIO_DIR = os.path.join(FIXTURES_DIR, "audio")
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, "asr_transcripts.json"), "r") as file:
+        fixtures = json.load(file)
+    os.makedirs(AUDIO_DIR, exist_ok=True)
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    for fixture in fixtures:
+        fixture["audio"] = os.path.join(AUDIO_DIR, f"{fixture['name']}.wav")
+        if not os.path.exists(fixture["audio"]):
+            if espeak is None:
+                raise RuntimeError(f"Missing {fixture['audio']} and espeak-ng isn't installed to generate it")
+            subprocess.run([espeak, "-v", "en-us", "-w", fixture["audio"], fixture["text"]], check=True)
+        with wave.open(fixture["audio"], "rb") as wav_file:
+            fixture["duration"] = wav_file.getnframes() / wav_file.getframerate()
+    return fixtures
+
+
+def normalize(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    # Word-level edit distance / number of reference words
+    reference, hypothesis = normalize(reference), normalize(hypothesis)
+    distances = list(range(len(hypothesis) + 1))
+    for i, reference_word in enumerate(reference, 1):
+        previous_diagonal, distances[0] = distances[0], i
+        for j, hypothesis_word in enumerate(hypothesis, 1):
+            substitution = previous_diagonal + (reference_word != hypothesis_word)
+            previous_diagonal = distances[j]
+            distances[j] = min(distances[j] + 1, distances[j - 1] + 1, substitution)
+    return distances[-1] / max(1, len(reference))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper backend real-time factor and WER on the bundled fixtures")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads (WHISPER_THREADS)")
+    args = parser.parse_args()
+
+    from whisper_openai import WhisperManager
+    fixtures = load_fixtures()
+    total_audio = sum(fixture["duration"] for fixture in fixtures)
+
+    results = {}
+    for backend in args.backends:
+        try:
+            manager = WhisperManager(backend=backend, num_threads=args.threads)
+        except Exception as e:
+            print(f"[red]Skipping {backend}: {e}")
+            continue
+        manager.warm_up()
+        inference_time = 0.0
+        errors = []
+        for fixture in fixtures:
+            start_time = time.perf_counter()
+            transcript = manager.audio_to_text(fixture["audio"])
+            inference_time += time.perf_counter() - start_time
+            errors.append(word_error_rate(fixture["text"], transcript))
+        results[backend] = (inference_time / total_audio, sum(errors) / len(errors))
+
+    print(f"[cyan]{len(fixtures)} fixtures, {total_audio:.1f}s of audio")
+    baseline_rtf = results.get("torch", (None,))[0]
+    for backend, (rtf, wer) in results.items():
+        speedup = f", {baseline_rtf / rtf:.2f}x vs torch" if baseline_rtf else ""
+        print(f"[white]{backend:>6}: real-time factor {rtf:.3f}, WER {wer:.1%}{speedup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Cold vs warm first-turn latency for Whisper.
+# "Cold" is what the first human turn used to cost: load the model on demand, then transcribe with a never-used pipeline.
+# "Warm" is what it costs now: the model was loaded and warmed up on a background thread at startup, so only the transcription is left.
+#
+# Every measurement runs in its own fresh process, so warm doesn't get a head start from imports and allocations the cold run
+# already paid for. Runs alternate cold/warm/cold/... and the medians are reported, so the OS file cache (which stays warm
+# between processes) favours neither side.
+#
+#     python -m benchmarks.bench_whisper_warmup                     # uses 3 seconds of a generated tone
+#     python -m benchmarks.bench_whisper_warmup --audio my_clip.wav --runs 5
+
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import numpy as np
+from rich import print
+
+
+def make_test_audio(seconds=3.0, sampling_rate=16000):
+    t = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    return {"raw": (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32), "sampling_rate": sampling_rate}
+
+
+def measure(kind, audio):
+    # Runs in the child process. Import time counts towards the load, since that's part of what the first turn used to wait on
+    start_time = time.perf_counter()
+    from whisper_openai import WhisperManager
+    manager = WhisperManager()
+    load = time.perf_counter() - start_time
+    # Warm: the same warm-up WhisperLoader does at startup
+    warm_up = manager.warm_up() if kind == "warm" else 0.0
+    start_time = time.perf_counter()
+    manager.pipe(audio if audio is not None else make_test_audio(), return_timestamps=False)
+    inference = time.perf_counter() - start_time
+    return {"load": load, "warm_up": warm_up, "inference": inference}
+
+
+def run_in_new_process(kind, audio):
+    command = [sys.executable, "-m", "benchmarks.bench_whisper_warmup", "--measure", kind]
+    if audio:
+        command += ["--audio", audio]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"The {kind} run failed:\n{result.stderr}")
+    # The result is the last line, anything before it is the model's own logging
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold vs warm first-turn Whisper latency")
+    parser.add_argument("--audio", help="audio file to transcribe (defaults to a generated tone)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per side")
+    parser.add_argument("--measure", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        sys.stdout.write(json.dumps(measure(args.measure, args.audio)) + "\n")
+        return
+
+    results = {"cold": [], "warm": []}
+    for run in range(args.runs):
+        for kind in (("cold", "warm") if run % 2 == 0 else ("warm", "cold")):
+            results[kind].append(run_in_new_process(kind, args.audio))
+
+    def median(kind, key):
+        return statistics.median(result[key] for result in results[kind])
+
+    cold_load, cold_inference = median("cold", "load"), median("cold", "inference")
+    warm_load, warm_up, warm_inference = median("warm", "load"), median("warm", "warm_up"), median("warm", "inference")
+    print(f"[white]medians over {args.runs} fresh processes each")
+    print(f"[white]cold first turn: {cold_load + cold_inference:.2f}s (load {cold_load:.2f}s + first inference {cold_inference:.2f}s)")
+    print(f"[white]warm first turn: {warm_inference:.2f}s (load {warm_load:.2f}s and warm-up {warm_up:.2f}s happened in the background at startup)")
+    print(f"[green]first human turn is {cold_load + cold_inference - warm_inference:.2f}s faster")
+
+
+if __name__ == "__main__":
+    main()
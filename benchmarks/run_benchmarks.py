@@ -0,0 +1,330 @@
+# Microbenchmarks for the hot paths that run on every turn of a show: token counting on a long history, saving/loading
+# the chat backups, picking the memories to send, base64-encoding screenshots, splitting replies into TTS chunks,
+# the pydub export/speed-up path, reading audio lengths and Whisper on the bundled short fixtures. Everything runs offline: the OpenAI client is never
+# called, gTTS is replaced by a generated tone, and anything whose dependency or model isn't available is reported as skipped.
+#
+# Results are written to benchmarks/results.json. Save a baseline on the machine you stream from, then run the suite
+# again before a show (or after a change) and it exits with status 1 if any median got more than --threshold slower.
+#
+#     python -m benchmarks.run_benchmarks --save-baseline
+#     python -m benchmarks.run_benchmarks --threshold 0.25
+#     python -m benchmarks.run_benchmarks --filter speech tokens --repeats 50
+
+import os
+# Before anything imports openai or pygame: no real key needed (nothing is sent) and no sound card needed
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# Only use a Whisper model that's already downloaded
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import io
+import sys
+import json
+import math
+import time
+import wave
+import contextlib
+import array
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from rich import print
+
+BENCHMARKS_DIR = os.path.dirname(__file__)
+DEFAULT_OUTPUT = os.path.join(BENCHMARKS_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+# Sample reply, about the length of a long agent answer
+REPLY = ("Well, that's the thing about dungeons, isn't it? Nobody ever asks the skeleton how it feels. "
+         "I've been guarding this door for three hundred years, and not once, not ONCE, has an adventurer said thank you. "
+         "They just kick it open, steal the chest, and leave mud on the carpet; honestly, the carpet was imported. ") * 6
+
+# name -> (setup, repeats). setup() prepares everything and returns the function to time, or raises Skip
+BENCHMARKS = {}
+
+
+class Skip(Exception):
+    pass
+
+
+def benchmark(name, repeats=20):
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeats)
+        return setup
+    return register
+
+
+# Scratch files for one run, removed at the end
+_TEMP_DIR = None
+
+
+def _temp_dir():
+    global _TEMP_DIR
+    if _TEMP_DIR is None:
+        _TEMP_DIR = tempfile.mkdtemp(prefix="benchmarks-")
+    return _TEMP_DIR
+
+
+def write_tone_wav(path, seconds=3.0, sample_rate=16000, frequency=220.0):
+    samples = array.array("h", (int(12000 * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(int(seconds * sample_rate))))
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+    return path
+
+
+def large_history(turns=400, image_every=50):
+    """A chat history like a long show: a system prompt, then user/assistant turns, with a screenshot now and then"""
+    history = [{"role": "system", "content": "You are Oswald, a skeleton who guards a dungeon door. " * 20}]
+    image_url = "data:image/jpeg;base64," + "A" * 20000
+    for turn in range(turns):
+        content = [{"type": "text", "text": f"[Turn {turn}] " + REPLY[:400]}]
+        if turn % image_every == 0:
+            content.append({"type": "image_url", "image_url": {"url": image_url, "detail": "high"}})
+        history.append({"role": "user", "content": content})
+        history.append({"role": "assistant", "content": REPLY[:600]})
+    return history
+
+
+def make_openai_manager(**kwargs):
+    try:
+        from openai_chat import OpenAiManager
+    except ImportError as e:
+        raise Skip(f"can't import openai_chat: {e}")
+    manager = OpenAiManager(**kwargs)
+    manager.logging = False
+    return manager
+
+
+def make_speech_manager():
+    try:
+        from local_speech_manager import SpeechManager
+        manager = SpeechManager(num_workers=0, cache=False, archive_dir="")
+    except Exception as e:
+        raise Skip(f"can't create a SpeechManager: {e}")
+    return manager
+
+
+@benchmark("tokens.large_history", repeats=10)
+def bench_num_tokens():
+    manager = make_openai_manager()
+    history = large_history()
+    try:
+        # Also loads the tiktoken encoding, which is cached on disk after the first download
+        manager.num_tokens_from_messages(history)
+    except NotImplementedError:
+        raise Skip("the tiktoken encoding isn't available offline (run once with internet to cache it)")
+    return lambda: manager.num_tokens_from_messages(history)
+
+
+@benchmark("backup.save", repeats=10)
+def bench_save_backup():
+    manager = make_openai_manager(chat_history_backup=os.path.join(_temp_dir(), "save_backup.txt"))
+    manager.chat_history = large_history()
+    return manager.save_chat_to_backup
+
+
+@benchmark("backup.load", repeats=10)
+def bench_load_backup():
+    backup = os.path.join(_temp_dir(), "load_backup.txt")
+    with open(backup, "w") as file:
+        json.dump(large_history(), file)
+    make_openai_manager(chat_history_backup=backup)
+    return lambda: make_openai_manager(chat_history_backup=backup)
+
+
+@benchmark("memory.build_messages", repeats=50)
+def bench_memory_build_messages():
+    from conversation_memory import ConversationMemory, HashingEmbedder
+    memory = ConversationMemory(embedder=HashingEmbedder())
+    history = large_history(turns=1000)
+    # Index the older lines up front, so this times a normal turn: embed the recent window, then search
+    memory.build_messages(history, "OSWALD")
+    return lambda: memory.build_messages(history, "OSWALD")
+
+
+@benchmark("image.base64")
+def bench_image_base64():
+    from openai_chat import image_to_data_url
+    # About the size of a 1080p screenshot jpg
+    image_path = os.path.join(_temp_dir(), "screenshot.jpg")
+    with open(image_path, "wb") as file:
+        file.write(os.urandom(600_000))
+    return lambda: image_to_data_url(image_path)
+
+
+@benchmark("speech.split_into_chunks", repeats=200)
+def bench_split_into_chunks():
+    manager = make_speech_manager()
+    return lambda: manager.split_into_chunks(REPLY)
+
+
+def bench_render(ext):
+    manager = make_speech_manager()
+    from pydub import AudioSegment
+    if ext != "wav" and not (shutil.which("ffmpeg") or shutil.which("avconv")):
+        raise Skip(f"exporting {ext} needs ffmpeg")
+    # Stands in for gTTS, which needs the internet: 4 seconds of tone, decoded the same way gTTS output is
+    tone = AudioSegment.from_file(write_tone_wav(os.path.join(_temp_dir(), "tone.wav"), seconds=4.0, sample_rate=24000), format="wav")
+    manager._synthesize = lambda text, voice=None: tone
+    return lambda: manager._render(REPLY[:200], "default", "gtts", ext, manager.speed)
+
+
+@benchmark("speech.render_wav", repeats=10)
+def bench_render_wav():
+    return bench_render("wav")
+
+
+@benchmark("speech.render_mp3", repeats=10)
+def bench_render_mp3():
+    return bench_render("mp3")
+
+
+def make_audio_manager():
+    try:
+        from audio_player import AudioManager
+    except ImportError as e:
+        raise Skip(f"can't import audio_player: {e}")
+    return AudioManager()
+
+
+@benchmark("audio.get_audio_length_file", repeats=100)
+def bench_audio_length_file():
+    audio_manager = make_audio_manager()
+    path = write_tone_wav(os.path.join(_temp_dir(), "length.wav"))
+    return lambda: audio_manager.get_audio_length(path)
+
+
+@benchmark("audio.get_audio_length_memory", repeats=100)
+def bench_audio_length_memory():
+    # The speech managers return BytesIO clips unless TTS_ARCHIVE_DIR is set
+    audio_manager = make_audio_manager()
+    with open(write_tone_wav(os.path.join(_temp_dir(), "length_memory.wav")), "rb") as file:
+        buffer = io.BytesIO(file.read())
+    buffer.name = "tts.wav"
+    return lambda: audio_manager.get_audio_length(buffer)
+
+
+@benchmark("whisper.audio_to_text", repeats=5)
+def bench_whisper():
+    try:
+        from benchmarks.bench_whisper_backends import load_fixtures
+        fixtures = load_fixtures()
+    except Exception as e:
+        raise Skip(f"no fixture audio: {e}")
+    fixture = min(fixtures, key=lambda fixture: fixture["duration"])
+    try:
+        from whisper_openai import WhisperManager
+        whisper_manager = WhisperManager()
+        whisper_manager.audio_to_text(fixture["audio"])
+    except Exception as e:
+        raise Skip(f"Whisper isn't available: {e}")
+    return lambda: whisper_manager.audio_to_text(fixture["audio"])
+
+
+def measure(function, repeats):
+    samples = []
+    # The code under test prints progress messages, keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()  # warm up
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            function()
+            samples.append(time.perf_counter() - start_time)
+    return {"status": "ok", "repeats": repeats, "min": min(samples), "median": statistics.median(samples),
+            "mean": statistics.fmean(samples), "max": max(samples)}
+
+
+def run(names, repeats=None):
+    results = {}
+    for name in names:
+        setup, default_repeats = BENCHMARKS[name]
+        try:
+            function = setup()
+        except Skip as e:
+            results[name] = {"status": "skipped", "reason": str(e)}
+            print(f"[yellow]{name}: skipped ({e})")
+            continue
+        try:
+            results[name] = measure(function, repeats or default_repeats)
+        except Exception as e:
+            results[name] = {"status": "error", "reason": repr(e)}
+            print(f"[red]{name}: failed with {e!r}")
+            continue
+        result = results[name]
+        print(f"[white]{name}: median {result['median'] * 1000:.3f}ms (min {result['min'] * 1000:.3f}ms, {result['repeats']} runs)")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of the benchmarks whose median got more than threshold slower than the baseline's"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if result["status"] != "ok" or not before or before.get("status") != "ok":
+            continue
+        change = result["median"] / before["median"] - 1
+        if change > threshold:
+            regressions.append(name)
+            print(f"[red]{name}: {change:+.0%} ({before['median'] * 1000:.3f}ms -> {result['median'] * 1000:.3f}ms)")
+        else:
+            color = "green" if change < -threshold else "white"
+            print(f"[{color}]{name}: {change:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the hot paths, with a regression check against a saved baseline")
+    parser.add_argument("--filter", nargs="+", default=None, help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--repeats", type=int, default=None, help="timed runs per benchmark (each has its own default)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.25, help="fail if a median is this much slower than the baseline (0.25 = 25%%)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if not args.filter or any(pattern in name for pattern in args.filter)]
+    if args.list:
+        for name in names:
+            print(name)
+        return 0
+
+    try:
+        results = run(names, args.repeats)
+    finally:
+        if _TEMP_DIR:
+            shutil.rmtree(_TEMP_DIR, ignore_errors=True)
+    report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+              "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)", "results": results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"[cyan]Results written to {args.output}")
+
+    errors = [name for name, result in results.items() if result["status"] == "error"]
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"[cyan]Saved as the baseline in {args.baseline}")
+        return 1 if errors else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[yellow]No baseline at {args.baseline} yet, run with --save-baseline to make one")
+        return 1 if errors else 0
+    with open(args.baseline, "r") as file:
+        baseline = json.load(file)
+    print(f"[cyan]Compared with the baseline from {baseline.get('created')} on {baseline.get('machine')}:")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions or errors:
+        print(f"[red]{len(regressions)} regression(s) over {args.threshold:.0%}, {len(errors)} error(s)")
+        return 1
+    print("[green]No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,679 @@
+# Local stand-ins for the network services we talk to, so streaming/latency behaviour can be exercised offline.
+# Each stand-in is a plain http.server (or, for OBS, a bare-bones websocket server) running on a background thread:
+#
+#     with ElevenLabsStandIn(first_byte_delay=0.3, chunk_delay=0.05) as standin:
+#         manager = ElevenLabsManager(base_url=standin.url, cache=False)
+#         ...
+#
+# Without the elevenlabs SDK installed, call install_elevenlabs_sdk_standin() before importing eleven_labs.
+#
+# Delays are attributes on the stand-in, so they can be changed while it is running.
+
+import json
+import math
+import time
+import base64
+import random
+import sys
+import types
+import struct
+import hashlib
+import threading
+import socketserver
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _StandInServer:
+    server_class = ThreadingHTTPServer
+    handler_class = None
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.request_count = 0
+        self._server = self.server_class((host, port), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass  # The client hung up, e.g. it closed a stream it no longer wanted
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class _ElevenLabsHandler(_StandInHandler):
+
+    def do_GET(self):
+        if self.path.startswith("/v1/voices"):
+            voices = [{"voice_id": f"standin-{index}", "name": name} for index, name in enumerate(self.standin.voice_names)]
+            self._send_json({"voices": voices})
+        else:
+            self._send_json({"detail": "not found"}, 404)
+
+    def do_POST(self):
+        self.standin.request_count += 1
+        self.standin.paths.append(self.path.split("?")[0])
+        body = self._read_json()
+        text = body.get("text", "")
+        if "/v1/text-to-speech/" not in self.path:
+            self._send_json({"detail": "not found"}, 404)
+            return
+        time.sleep(self.standin.request_latency + len(text) * self.standin.latency_per_character)
+        pcm_audio = self.standin.make_pcm(text)
+        path = self.path.split("?")[0]
+        if path.endswith("/with-timestamps"):
+            self._send_json({"audio_base64": base64.b64encode(pcm_audio).decode("ascii"), "alignment": self.standin.make_alignment(text, 0, len(pcm_audio))})
+        elif path.endswith("/stream"):
+            self._stream_audio(text, pcm_audio, with_timestamps=path.endswith("/with-timestamps/stream"))
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/pcm")
+            self.send_header("Content-Length", str(len(pcm_audio)))
+            self.end_headers()
+            self.wfile.write(pcm_audio)
+
+    def _stream_audio(self, text, pcm_audio, with_timestamps=False):
+        # With timestamps, each piece is a line of JSON: its audio, plus the characters whose start falls within it
+        try:
+            self._start_chunked("application/json" if with_timestamps else "audio/pcm")
+            time.sleep(self.standin.first_byte_delay)
+            for offset in range(0, len(pcm_audio), self.standin.chunk_bytes):
+                chunk = pcm_audio[offset:offset + self.standin.chunk_bytes]
+                if with_timestamps:
+                    alignment = self.standin.make_alignment(text, offset, offset + len(chunk))
+                    chunk = (json.dumps({"audio_base64": base64.b64encode(chunk).decode("ascii"), "alignment": alignment}) + "\n").encode("utf-8")
+                self._send_chunk(chunk)
+                time.sleep(self.standin.chunk_delay)
+            self._end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream part way, so the rest of the audio is never generated
+            self.standin.streams_closed += 1
+
+
+class ElevenLabsStandIn(_StandInServer):
+    """
+    Pretends to be the ElevenLabs API: GET /v1/voices and POST /v1/text-to-speech/<voice_id>[/stream|/with-timestamps[/stream]].
+    Audio is a quiet tone, 16-bit mono PCM at 22050Hz, seconds_per_character long, and each character's alignment is its share of that.
+    Every request path is recorded in paths, and streams_closed counts the streams the client closed part way.
+    request_latency:  delay before the response starts (both endpoints)
+    latency_per_character: extra delay per character of text, like real synthesis time growing with length
+    first_byte_delay: extra delay before the first streamed chunk
+    chunk_delay:      delay after each streamed chunk of chunk_bytes
+    """
+
+    handler_class = _ElevenLabsHandler
+
+    def __init__(self, voice_names=("OSWALD", "TONY KING", "VICTORIA"), request_latency=0.0, latency_per_character=0.0,
+                 first_byte_delay=0.2, chunk_delay=0.05, chunk_bytes=4410, seconds_per_character=0.06, sample_rate=22050, **kwargs):
+        super().__init__(**kwargs)
+        self.voice_names = list(voice_names)
+        self.request_latency = request_latency
+        self.latency_per_character = latency_per_character
+        self.first_byte_delay = first_byte_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_bytes = chunk_bytes
+        self.seconds_per_character = seconds_per_character
+        self.sample_rate = sample_rate
+        self.paths = []
+        self.streams_closed = 0
+
+    def make_pcm(self, text):
+        frames = int(max(1, len(text)) * self.seconds_per_character * self.sample_rate)
+        return b"".join(struct.pack("<h", int(2000 * math.sin(2 * math.pi * 220 * i / self.sample_rate))) for i in range(frames))
+
+    def make_alignment(self, text, start_byte, end_byte):
+        """The alignment for the characters that start between those two byte offsets of make_pcm(text), times from the start of the clip"""
+        start, end = start_byte / 2 / self.sample_rate, end_byte / 2 / self.sample_rate
+        indexes = [i for i in range(len(text)) if start <= i * self.seconds_per_character < end]
+        return {
+            "characters": [text[i] for i in indexes],
+            "character_start_times_seconds": [i * self.seconds_per_character for i in indexes],
+            "character_end_times_seconds": [(i + 1) * self.seconds_per_character for i in indexes],
+        }
+
+
+class _TextToSpeechStandIn:
+    # The client.text_to_speech calls eleven_labs.py makes, sent over HTTP the way the SDK sends them
+
+    def __init__(self, client):
+        self._client = client
+
+    def _stream_bytes(self, path, voice_id, text, model_id, output_format=None, **extra):
+        body = dict({"text": text, "model_id": model_id}, **{key: value for key, value in extra.items() if value is not None})
+        params = {"output_format": output_format} if output_format else None
+        with self._client.http.stream("POST", f"{self._client.base_url}/v1/text-to-speech/{voice_id}{path}", json=body, params=params) as response:
+            response.raise_for_status()
+            yield from response.iter_bytes()
+
+    def convert(self, voice_id, text, model_id=None, output_format=None, previous_text=None, next_text=None):
+        return self._stream_bytes("", voice_id, text, model_id, output_format, previous_text=previous_text, next_text=next_text)
+
+    def convert_as_stream(self, voice_id, text, model_id=None, output_format=None):
+        return self._stream_bytes("/stream", voice_id, text, model_id, output_format)
+
+    def convert_with_timestamps(self, voice_id, text, model_id=None):
+        response = self._client.http.post(f"{self._client.base_url}/v1/text-to-speech/{voice_id}/with-timestamps", json={"text": text, "model_id": model_id})
+        response.raise_for_status()
+        return response.json()
+
+    def stream_with_timestamps(self, voice_id, text, model_id=None):
+        with self._client.http.stream("POST", f"{self._client.base_url}/v1/text-to-speech/{voice_id}/with-timestamps/stream", json={"text": text, "model_id": model_id}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class _VoicesStandIn:
+
+    def __init__(self, client):
+        self._client = client
+
+    def get_all(self):
+        response = self._client.http.get(f"{self._client.base_url}/v1/voices")
+        response.raise_for_status()
+        voices = [types.SimpleNamespace(**voice) for voice in response.json()["voices"]]
+        return types.SimpleNamespace(voices=voices)
+
+
+class _ElevenLabsClientStandIn:
+
+    def __init__(self, api_key=None, base_url="https://api.elevenlabs.io", httpx_client=None):
+        import httpx
+        self.base_url = base_url.rstrip("/")
+        self.http = httpx_client or httpx.Client()
+        self.voices = _VoicesStandIn(self)
+        self.text_to_speech = _TextToSpeechStandIn(self)
+
+
+def install_elevenlabs_sdk_standin():
+    """
+    Makes "import elevenlabs" work without the ElevenLabs SDK, with just the parts eleven_labs.py uses, so ElevenLabsManager can
+    still be run against ElevenLabsStandIn. Requests go over HTTP through the httpx client the manager hands it, like the real SDK.
+    Does nothing if the SDK is installed. Returns True if the stand-in was put in place.
+    """
+    try:
+        import elevenlabs  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    sdk = types.ModuleType("elevenlabs")
+    sdk.client = types.ModuleType("elevenlabs.client")
+    sdk.client.ElevenLabs = _ElevenLabsClientStandIn
+    sdk.Voice = types.SimpleNamespace
+    sys.modules["elevenlabs"] = sdk
+    sys.modules["elevenlabs.client"] = sdk.client
+    return True
+
+
+class _OpenAIHandler(_StandInHandler):
+
+    def do_POST(self):
+        body = self._read_json()
+        if not self.path.endswith("/chat/completions"):
+            self._send_json({"error": {"message": "not found", "type": "invalid_request_error"}}, 404)
+            return
+        latency, status = self.standin.next_response(body)
+        if status == 200 and body.get("stream"):
+            self._stream_completion(body, latency)
+            return
+        time.sleep(latency)
+        try:
+            if status != 200:
+                self._send_error(status)
+            else:
+                self._send_json(self.standin.make_completion(body))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up (its deadline passed, or a hedged request won)
+
+    def _stream_completion(self, body, latency):
+        # Like OpenAI: the headers go out straight away, the first token after latency, then one chunk per word
+        completion = self.standin.make_completion(body)
+        base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": completion["model"]}
+        words = completion["choices"][0]["message"]["content"].split(" ")
+        chunks = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+        chunks += [dict(base, choices=[{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]) for i, word in enumerate(words)]
+        chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunks.append(dict(base, choices=[], usage=completion["usage"]))
+        try:
+            self._start_chunked("text/event-stream")
+            time.sleep(latency)
+            for i, chunk in enumerate(chunks):
+                if i > 1:
+                    time.sleep(self.standin.token_delay)
+                self._send_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._end_chunked()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream part way, so the rest of the answer is never generated
+            with self.standin._lock:
+                self.standin.streams_closed += 1
+            return
+        with self.standin._lock:
+            self.standin.streams_completed += 1
+
+    def _send_error(self, status):
+        body = json.dumps({"error": {"message": f"Stand-in error {status}", "type": "server_error" if status >= 500 else "rate_limit_error", "code": None}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429 and self.standin.retry_after is not None:
+            self.send_header("Retry-After", str(self.standin.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OpenAIStandIn(_StandInServer):
+    """
+    Pretends to be the OpenAI API's POST /v1/chat/completions, answering with a short canned reply and a usage block.
+    Point a client at it with base_url=standin.url + "/v1". Every request body is recorded in requests.
+    Streamed requests (stream=True) get one chunk per word, token_delay apart. streams_completed and streams_closed count how many
+    were read to the end and how many the client closed part way.
+    request_latency: delay before every answer (before the first token, when streaming)
+    slow_fraction:   fraction of requests that take slow_latency instead, like OpenAI's occasional very slow responses
+    error_fraction:  fraction of requests that fail with error_status (500 by default, 429 for rate limits)
+    failures:        statuses to answer the next few requests with, in order, before going back to normal (e.g. [500, 429])
+    retry_after:     Retry-After header (seconds) sent with 429s
+    model_latency:   {model: seconds} for models that always take that long instead, e.g. a small model that's never slow
+    seed makes the random slowness and errors repeatable.
+    """
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, request_latency=0.1, slow_fraction=0.0, slow_latency=3.0, error_fraction=0.0, error_status=500, failures=(),
+                 retry_after=None, model_latency=None, token_delay=0.0, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.request_latency = request_latency
+        self.token_delay = token_delay
+        self.streams_completed = 0
+        self.streams_closed = 0
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_fraction = error_fraction
+        self.error_status = error_status
+        self.failures = deque(failures)
+        self.retry_after = retry_after
+        self.model_latency = dict(model_latency or {})
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_response(self, body):
+        """Returns (delay, status) for the next request"""
+        with self._lock:
+            self.request_count += 1
+            self.requests.append(body)
+            if self.failures:
+                return self.request_latency, self.failures.popleft()
+            latency = self.slow_latency if self._random.random() < self.slow_fraction else self.request_latency
+            latency = self.model_latency.get(body.get("model"), latency)
+            status = self.error_status if self._random.random() < self.error_fraction else 200
+            return latency, status
+
+    def make_completion(self, body):
+        prompt_characters = sum(len(json.dumps(message.get("content", ""))) for message in body.get("messages", []))
+        content = "Stand-in reply. Nobody ever asks the skeleton how it feels."
+        return {
+            "id": f"chatcmpl-standin-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_characters // 4, "completion_tokens": len(content) // 4, "total_tokens": prompt_characters // 4 + len(content) // 4},
+        }
+
+
+class _WebSocketHandler(socketserver.StreamRequestHandler):
+    # Just enough of RFC 6455 for a local test server: one text frame per message, no extensions
+
+    GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    # Small frames (like events) go out straight away instead of waiting on the previous frame's ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def standin(self):
+        return self.server.standin
+
+    def handle(self):
+        headers = {}
+        request_line = self.rfile.readline()
+        if not request_line:
+            return
+        while True:
+            line = self.rfile.readline().decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + self.GUID).encode("ascii")).digest()).decode("ascii")
+        response = ["HTTP/1.1 101 Switching Protocols", "Upgrade: websocket", "Connection: Upgrade", f"Sec-WebSocket-Accept: {accept}"]
+        if "sec-websocket-protocol" in headers:
+            response.append(f"Sec-WebSocket-Protocol: {headers['sec-websocket-protocol'].split(',')[0].strip()}")
+        self.wfile.write(("\r\n".join(response) + "\r\n\r\n").encode("latin-1"))
+        self._send_lock = threading.Lock()
+        self.on_open()
+        try:
+            while True:
+                opcode, payload = self._read_frame()
+                if opcode == 0x8:
+                    self._send_frame(0x8, payload[:2])
+                    break
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+                elif opcode == 0x1:
+                    self.on_message(payload.decode("utf-8"))
+        except (ConnectionError, OSError, struct.error):
+            pass
+        finally:
+            self.on_close()
+
+    def send_message(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def close(self, code=1000):
+        try:
+            self._send_frame(0x8, struct.pack(">H", code))
+        except OSError:
+            pass
+
+    def on_open(self):
+        pass
+
+    def on_message(self, text):
+        pass
+
+    def on_close(self):
+        pass
+
+    def _read_frame(self):
+        first, second = struct.unpack(">BB", self._read_exactly(2))
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self._read_exactly(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self._read_exactly(8))[0]
+        mask = self._read_exactly(4) if second & 0x80 else None
+        payload = self._read_exactly(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        return first & 0x0F, payload
+
+    def _read_exactly(self, size):
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise ConnectionError("The client went away")
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = struct.pack(">B", 0x80 | opcode)
+        if len(payload) < 126:
+            header += struct.pack(">B", len(payload))
+        elif len(payload) < 65536:
+            header += struct.pack(">BH", 126, len(payload))
+        else:
+            header += struct.pack(">BQ", 127, len(payload))
+        with self._send_lock:
+            self.wfile.write(header + payload)
+            self.wfile.flush()
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _OBSHandler(_WebSocketHandler):
+
+    def on_open(self):
+        self.event_subscriptions = 0
+        self.identified = False
+        hello = {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}
+        if self.standin.password:
+            self.challenge = base64.b64encode(struct.pack(">d", time.time())).decode("ascii")
+            hello["authentication"] = {"challenge": self.challenge, "salt": self.standin.salt}
+        self.send_message(json.dumps({"op": 0, "d": hello}))
+
+    def on_message(self, text):
+        message = json.loads(text)
+        op, data = message["op"], message["d"]
+        if op == 1:
+            if self.standin.password and data.get("authentication") != self.standin.expected_authentication(self.challenge):
+                self.close(4009)
+                raise ConnectionError("Authentication failed")
+            self.event_subscriptions = data.get("eventSubscriptions", 0)
+            self.identified = True
+            with self.standin._lock:
+                self.standin.connections.append(self)
+            self.send_message(json.dumps({"op": 2, "d": {"negotiatedRpcVersion": 1}}))
+        elif op == 6 and self.identified:
+            self.standin.message_count += 1
+            time.sleep(self.standin.request_latency)
+            response = self.standin.run_request(data["requestType"], data.get("requestData") or {})
+            self.send_message(json.dumps({"op": 7, "d": dict(response, requestId=data["requestId"])}))
+        elif op == 8 and self.identified:
+            # RequestBatch: one round trip for the lot, run in order
+            self.standin.message_count += 1
+            time.sleep(self.standin.request_latency)
+            results = []
+            for request in data["requests"]:
+                results.append(self.standin.run_request(request["requestType"], request.get("requestData") or {}))
+                if data.get("haltOnFailure") and not results[-1]["requestStatus"]["result"]:
+                    break
+            self.send_message(json.dumps({"op": 9, "d": {"requestId": data["requestId"], "results": results}}))
+
+    def on_close(self):
+        with self.standin._lock:
+            if self in self.standin.connections:
+                self.standin.connections.remove(self)
+
+
+class OBSStandIn(_StandInServer):
+    """
+    Pretends to be OBS with obs-websocket v5, with enough state to answer the requests OBSWebsocketsManager makes:
+    scenes and their items (ids, visibility, transforms), source filters, input settings and the current program scene.
+    Every request is recorded in requests, as (requestType, requestData). message_count counts round trips,
+    so a RequestBatch of five requests adds five to request_count but only one to message_count.
+
+    password:        require obs-websocket authentication, like OBS does when a password is set
+    request_latency: delay before each request or batch is answered (requests on one connection are answered in order, like OBS)
+    drop_connections() disconnects every client, to exercise reconnecting.
+    add_scene_item()/remove_scene_item() change a scene behind the client's back, sending the same events OBS would.
+    """
+
+    server_class = _ThreadingTCPServer
+    handler_class = _OBSHandler
+
+    def __init__(self, scenes=None, password=None, request_latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.password = password
+        self.salt = "standin-salt"
+        self.request_latency = request_latency
+        self.requests = []
+        self.message_count = 0
+        self.connections = []
+        self._lock = threading.Lock()
+        scenes = scenes or {"Scene": ["Line In", "OSWALD", "TONY KING", "VICTORIA"]}
+        self.current_scene = next(iter(scenes))
+        self.scene_items = {}
+        self._item_ids = iter(range(1, 1_000_000))
+        for scene_name, source_names in scenes.items():
+            self.scene_items[scene_name] = {source_name: self._new_scene_item() for source_name in source_names}
+        self.filters = {}
+        self.input_settings = {}
+        self.streaming = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def expected_authentication(self, challenge):
+        secret = base64.b64encode(hashlib.sha256((self.password + self.salt).encode("utf-8")).digest()).decode("utf-8")
+        return base64.b64encode(hashlib.sha256((secret + challenge).encode("utf-8")).digest()).decode("utf-8")
+
+    def drop_connections(self):
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close(1001)
+            connection.request.close()
+
+    def stop(self):
+        self.drop_connections()
+        super().stop()
+
+    def emit_event(self, event_type, event_data, intent):
+        # intent is the obs-websocket EventSubscription bit this event belongs to
+        with self._lock:
+            connections = [connection for connection in self.connections if connection.event_subscriptions & intent]
+        for connection in connections:
+            connection.send_message(json.dumps({"op": 5, "d": {"eventType": event_type, "eventIntent": intent, "eventData": event_data}}))
+
+    def add_scene_item(self, scene_name, source_name):
+        item = self._new_scene_item()
+        self.scene_items[scene_name][source_name] = item
+        # EventSubscription::SceneItems
+        self.emit_event("SceneItemCreated", {"sceneName": scene_name, "sourceName": source_name, "sceneItemId": item["sceneItemId"]}, 1 << 7)
+        return item["sceneItemId"]
+
+    def remove_scene_item(self, scene_name, source_name):
+        item = self.scene_items[scene_name].pop(source_name)
+        self.emit_event("SceneItemRemoved", {"sceneName": scene_name, "sourceName": source_name, "sceneItemId": item["sceneItemId"]}, 1 << 7)
+
+    def run_request(self, request_type, request_data):
+        with self._lock:
+            self.request_count += 1
+            self.requests.append((request_type, request_data))
+        try:
+            response_data = getattr(self, f"_request_{request_type}")(request_data)
+            status = {"result": True, "code": 100}
+        except AttributeError:
+            response_data, status = None, {"result": False, "code": 204, "comment": f"Unknown request type {request_type}"}
+        except KeyError as e:
+            response_data, status = None, {"result": False, "code": 600, "comment": f"No resource was found: {e}"}
+        response = {"requestType": request_type, "requestStatus": status}
+        if response_data is not None:
+            response["responseData"] = response_data
+        return response
+
+    def _new_scene_item(self):
+        return {"sceneItemId": next(self._item_ids), "sceneItemEnabled": True, "sceneItemTransform": self._default_transform()}
+
+    @staticmethod
+    def _default_transform():
+        return {"positionX": 0.0, "positionY": 0.0, "scaleX": 1.0, "scaleY": 1.0, "rotation": 0.0, "sourceWidth": 1920.0, "sourceHeight": 1080.0,
+                "width": 1920.0, "height": 1080.0, "cropLeft": 0, "cropRight": 0, "cropTop": 0, "cropBottom": 0}
+
+    def _scene_item(self, request_data):
+        for item in self.scene_items[request_data["sceneName"]].values():
+            if item["sceneItemId"] == request_data["sceneItemId"]:
+                return item
+        raise KeyError(request_data["sceneItemId"])
+
+    def _request_GetSceneItemId(self, request_data):
+        return {"sceneItemId": self.scene_items[request_data["sceneName"]][request_data["sourceName"]]["sceneItemId"]}
+
+    def _request_SetSceneItemEnabled(self, request_data):
+        self._scene_item(request_data)["sceneItemEnabled"] = request_data["sceneItemEnabled"]
+
+    def _request_GetSceneItemTransform(self, request_data):
+        return {"sceneItemTransform": dict(self._scene_item(request_data)["sceneItemTransform"])}
+
+    def _request_SetSceneItemTransform(self, request_data):
+        self._scene_item(request_data)["sceneItemTransform"].update(request_data["sceneItemTransform"])
+
+    def _request_GetSceneItemList(self, request_data):
+        items = self.scene_items[request_data["sceneName"]]
+        return {"sceneItems": [{"sourceName": name, "sceneItemId": item["sceneItemId"], "sceneItemEnabled": item["sceneItemEnabled"]} for name, item in items.items()]}
+
+    def _request_RemoveSceneItem(self, request_data):
+        for source_name, item in self.scene_items[request_data["sceneName"]].items():
+            if item["sceneItemId"] == request_data["sceneItemId"]:
+                self.remove_scene_item(request_data["sceneName"], source_name)
+                return
+        raise KeyError(request_data["sceneItemId"])
+
+    def _request_SetSourceFilterEnabled(self, request_data):
+        self.filters[(request_data["sourceName"], request_data["filterName"])] = request_data["filterEnabled"]
+
+    def _request_SetCurrentProgramScene(self, request_data):
+        if request_data["sceneName"] not in self.scene_items:
+            raise KeyError(request_data["sceneName"])
+        self.current_scene = request_data["sceneName"]
+        # EventSubscription::Scenes
+        self.emit_event("CurrentProgramSceneChanged", {"sceneName": self.current_scene}, 1 << 2)
+
+    def _request_GetInputSettings(self, request_data):
+        return {"inputSettings": dict(self.input_settings.get(request_data["inputName"], {"text": ""})), "inputKind": "text_gdiplus_v2"}
+
+    def _request_SetInputSettings(self, request_data):
+        self.input_settings.setdefault(request_data["inputName"], {"text": ""}).update(request_data["inputSettings"])
+
+    def _request_GetInputKindList(self, request_data):
+        return {"inputKinds": ["text_gdiplus_v2", "image_source", "browser_source"]}
+
+    def _request_StopStream(self, request_data):
+        self.streaming = False
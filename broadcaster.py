@@ -0,0 +1,73 @@
+import time
+import itertools
+import threading
+from collections import OrderedDict
+from rich import print
+
+from metrics import metrics
+
+
+class Broadcaster:
+    """
+    Sends Socket.IO events to the overlay/dashboard clients from a dedicated background task, so the agent threads
+    never do the fan-out themselves. emit() just queues the event and returns, however many clients are connected.
+
+    Events with a coalesce_key replace the one still waiting with the same event, room and key, so a client that's
+    behind only gets the latest state (e.g. the newest partial transcript) instead of every step on the way.
+    The replacement goes to the back of the queue, so it's never sent ahead of anything emitted before it.
+    Events go to room (the conversation's room by default), or to every client if there's no room.
+    If more than max_pending events are waiting, the oldest are dropped.
+    """
+
+    def __init__(self, socketio, room=None, max_pending=1000):
+        self.socketio = socketio
+        self.room = room
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._ids = itertools.count()
+        self._condition = threading.Condition()
+        self._started = False
+
+    def start(self):
+        # A thread, since the server runs with async_mode="threading". _run blocks on a threading.Condition that agent threads notify,
+        # so it would block the hub under eventlet/gevent
+        if not self._started:
+            self._started = True
+            self.socketio.start_background_task(self._run)
+        return self
+
+    def emit(self, event, data, room=None, coalesce_key=None):
+        room = room or self.room
+        key = (event, room, coalesce_key) if coalesce_key is not None else ("unique", next(self._ids))
+        with self._condition:
+            if key in self._pending:
+                # Send the newer data in this event's place in the queue, rather than the old one's. Left where it was, a newer
+                # agent_message could go out before a clear_agent queued after the old one, and then be hidden straight away.
+                # The original enqueue time is kept, so the emit delay still counts from when the first one was queued
+                self._pending[key] = (event, data, room, self._pending[key][3])
+                self._pending.move_to_end(key)
+                metrics.increment("socketio.coalesced")
+            else:
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popitem(last=False)
+                    metrics.increment("socketio.dropped")
+                self._pending[key] = (event, data, room, time.perf_counter())
+            metrics.set_gauge("socketio.queue_length", len(self._pending))
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                events = list(self._pending.values())
+                self._pending.clear()
+                metrics.set_gauge("socketio.queue_length", 0)
+            for event, data, room, enqueued_at in events:
+                try:
+                    self.socketio.emit(event, data, to=room)
+                except Exception as e:
+                    print(f"[red]Couldn't send {event} to the overlay: {e}")
+                    continue
+                metrics.observe("socketio.emit_delay", time.perf_counter() - enqueued_at)
+                metrics.increment("socketio.emitted")
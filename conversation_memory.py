@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import zlib
+import functools
+import numpy as np
+from rich import print
+
+from metrics import metrics
+
+# Words too common to say anything about what a line is about
+STOP_WORDS = set("""
+a an and are as at be been but by can could did do does for from had has have he her him his how i i'm if in into is it it's
+its just me my no not of oh on or our she so than that that's the their them then there they this to too up us was we were
+what when where which who why will with would you your yeah okay well really like get got go going know think
+""".split())
+
+WORD = re.compile(r"[a-z0-9']+")
+# The "[NAME] " in front of each line. Left out of the embeddings, or every line from the same speaker would look alike
+SPEAKER_TAG = re.compile(r"^\[[^\]]*\]\s*")
+
+
+class HashingEmbedder:
+    """
+    Hashed bag-of-words embeddings: every word (and pair of neighbouring words) is hashed into one of dimensions buckets.
+    No model and no downloads, and about 50us a line. It only matches lines that share words, but that's most of what
+    recalling "the thing about the haunted toaster from an hour ago" needs.
+    """
+
+    def __init__(self, dimensions=1024):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [word.strip("'") for word in WORD.findall(text.lower())]
+            words = [word for word in words if word and word not in STOP_WORDS]
+            features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+            if not features:
+                continue
+            hashes = np.array([zlib.crc32(feature.encode()) for feature in features], dtype=np.uint32)
+            # The top bit picks the sign, so collisions cancel out rather than pile up
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dimensions, signs)
+        # Dampen words repeated in the same line, then scale to unit length so a dot product is the cosine similarity
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceTransformerEmbedder:
+    """
+    A local sentence-transformers model (pip install sentence-transformers), e.g. MEMORY_EMBEDDING_MODEL=all-MiniLM-L6-v2.
+    Finds lines that mean the same thing even with different words. Runs offline once the model has been downloaded.
+    """
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = model_name
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedder(model_name=None):
+    """The embedder every memory in the process shares: MEMORY_EMBEDDING_MODEL if it's set and loads, otherwise hashing"""
+    model_name = model_name or os.getenv("MEMORY_EMBEDDING_MODEL")
+    if model_name:
+        try:
+            start_time = time.perf_counter()
+            embedder = SentenceTransformerEmbedder(model_name)
+            print(f"[green]Loaded memory embedding model {model_name} in {time.perf_counter() - start_time:.2f}s")
+            return embedder
+        except Exception as e:
+            print(f"[yellow]Couldn't load memory embedding model {model_name}, using hashed bag-of-words instead: {e}")
+    return HashingEmbedder()
+
+
+class MemoryIndex:
+    """Unit vectors in one numpy array (grown by doubling), searched with a single matrix-vector product"""
+
+    def __init__(self, dimensions, capacity=256):
+        self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.size = 0
+
+    def add(self, vectors):
+        needed = self.size + len(vectors)
+        if needed > len(self._vectors):
+            grown = np.zeros((max(needed, len(self._vectors) * 2), self._vectors.shape[1]), dtype=np.float32)
+            grown[:self.size] = self._vectors[:self.size]
+            self._vectors = grown
+        self._vectors[self.size:needed] = vectors
+        self.size = needed
+
+    def get(self, positions):
+        return self._vectors[positions]
+
+    def search(self, vector, k):
+        """Returns [(position, cosine similarity)] of the k closest vectors, best first"""
+        if self.size == 0 or k <= 0:
+            return []
+        scores = self._vectors[:self.size] @ vector
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(position), float(scores[position])) for position in top]
+
+
+class ConversationMemory:
+    """
+    Long-term memory for one agent's conversation, so requests don't have to carry the whole history.
+    Each request is the system prompt, the top_k older lines most relevant to what's being said right now, and the last
+    recent_messages messages. Prompt size stays about the same however long the show runs, and nothing said earlier is lost
+    (the full history is still kept in chat_history and its backup, this only decides what gets sent).
+
+    recent_messages (OPENAI_MEMORY_RECENT, 12) and top_k (OPENAI_MEMORY_TOP_K, 4) set the size of the prompt.
+    Older lines that score below min_score aren't sent at all, so an unrelated "memory" never gets forced in.
+    Lines are indexed as they fall out of the recent window. Each line is indexed once, so repeats only count once.
+    """
+
+    def __init__(self, embedder=None, recent_messages=None, top_k=None, min_score=0.2, query_messages=3, duplicate_score=0.8, query_decay=0.25):
+        self.embedder = embedder or get_embedder()
+        self.recent_messages = recent_messages or int(os.getenv("OPENAI_MEMORY_RECENT", "12"))
+        self.top_k = top_k if top_k is not None else int(os.getenv("OPENAI_MEMORY_TOP_K", "4"))
+        self.min_score = min_score
+        # Older lines this close to something still in the recent window would only repeat it, so they're skipped
+        self.duplicate_score = duplicate_score
+        # The latest few lines from everyone else are what the next answer will be about, so they're what memories are searched with.
+        # Each line before the newest counts query_decay times as much as the one after it
+        self.query_messages = query_messages
+        self.query_decay = query_decay
+        self.texts = []
+        self._known = set()
+        self._index = None
+
+    @staticmethod
+    def line_of(message, speaker_name):
+        # The lines of the show: "[NAME] text" from everyone else, and the agent's own answers. Prompts (lists of parts) aren't lines
+        content = message.get("content")
+        if not isinstance(content, str) or not content.strip():
+            return None
+        return f"[{speaker_name}] {content}" if message.get("role") == "assistant" else content
+
+    def add_lines(self, lines):
+        lines = [line for line in dict.fromkeys(lines) if line not in self._known]
+        if not lines:
+            return
+        vectors = self._embed(lines)
+        if self._index is None:
+            self._index = MemoryIndex(vectors.shape[1])
+        self._index.add(vectors)
+        self.texts.extend(lines)
+        self._known.update(lines)
+
+    def _embed(self, lines):
+        return self.embedder.embed([SPEAKER_TAG.sub("", line) for line in lines])
+
+    def recall(self, recent_lines, k=None, speaker_name=None):
+        """
+        The older lines most relevant to the last query_messages of recent_lines, oldest first.
+        Lines by speaker_name (the agent asking) are left out of the query when there are others to go on: the agent's own last
+        answer is what it's replying after, not what it's replying to, and would pull back more of whatever it was just talking about.
+        """
+        others = [line for line in recent_lines if not (speaker_name and line.startswith(f"[{speaker_name}] "))]
+        queries = (others or recent_lines)[-self.query_messages:]
+        if self._index is None or not queries:
+            return []
+        k = k or self.top_k
+        start_time = time.perf_counter()
+        recent_vectors = self._embed(recent_lines)
+        # The newest line counts the most, so what was just said decides what gets recalled
+        weights = self.query_decay ** np.arange(len(queries) - 1, -1, -1, dtype=np.float32)
+        query = weights @ self._embed(queries)
+        query /= max(np.linalg.norm(query), 1e-9)
+        # Look further down the list whenever too many of the candidates turn out to be repeats
+        candidates = k * 4
+        while True:
+            matches = [(position, score) for position, score in self._index.search(query, candidates) if score >= self.min_score]
+            if matches:
+                repeats = (self._index.get([position for position, _ in matches]) @ recent_vectors.T).max(axis=1) >= self.duplicate_score
+                matches = [match for match, repeat in zip(matches, repeats) if not repeat]
+            if len(matches) >= k or candidates >= self._index.size:
+                break
+            candidates *= 4
+        metrics.observe("memory.search", time.perf_counter() - start_time)
+        return [self.texts[position] for position in sorted(position for position, _ in matches[:k])]
+
+    def build_messages(self, history, speaker_name):
+        """The messages to send for this turn, from the agent's full chat_history"""
+        has_system_prompt = bool(history) and history[0].get("role") == "system"
+        first = 1 if has_system_prompt else 0
+        split = max(first, len(history) - self.recent_messages)
+        recent = history[split:]
+
+        start_time = time.perf_counter()
+        self.add_lines(line for line in (self.line_of(message, speaker_name) for message in history[first:split]) if line)
+        recent_lines = [line for line in (self.line_of(message, speaker_name) for message in recent) if line]
+        memories = self.recall(recent_lines, speaker_name=speaker_name)
+        metrics.observe("memory.build", time.perf_counter() - start_time)
+        metrics.set_gauge(f"memory.lines.{speaker_name}", len(self.texts))
+
+        messages = history[:first]
+        if memories:
+            messages.append({"role": "system", "content": "Things that were said earlier in the conversation, which might be worth bringing back up:\n" + "\n".join(memories)})
+        return messages + recent
@@ -1,17 +1,79 @@
 from elevenlabs.client import ElevenLabs
-from elevenlabs import play, stream, save, Voice, VoiceSettings
+from elevenlabs import Voice
+from pydub import AudioSegment
+import httpx
+import hashlib
+import threading
+import base64
+import json
 import time
 import os
+import io
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_cache import TTSCache, get_tts_cache
+from audio_player import StreamingAudioPlayer
+from metrics import metrics
+from text_chunking import split_sentences, group_sentences
+from subtitle_timing import timings_from_durations, timings_from_character_alignment, estimate_timings
+
+# One pooled HTTP client for every ElevenLabs request in the process, so connections (and TLS sessions) get reused
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=120),
+            )
+        return _http_client
 
 class ElevenLabsManager:
 
-    def __init__(self):
-        self.client = ElevenLabs(api_key=os.getenv('ELEVENLABS_API_KEY')) # Defaults to ELEVEN_API_KEY)
-        self.voices = self.client.voices.get_all().voices
+    # Raw 16-bit mono PCM, so streamed audio can be played the moment it arrives without an mp3 decoder
+    STREAM_OUTPUT_FORMAT = "pcm_22050"
+    STREAM_SAMPLE_RATE = 22050
+
+    # The voice list is cached here so startup doesn't have to wait on the API. Refreshed in the background once it's older than the TTL.
+    VOICE_CATALOG_FILE = ".elevenlabs_voices.json"
+    VOICE_CATALOG_TTL = float(os.getenv("ELEVENLABS_VOICE_TTL_HOURS", "24")) * 3600
+
+    # parallel_chunks: when streaming, split the text at sentence boundaries and synthesize the pieces concurrently
+    # (at most max_concurrent_requests in flight, which is how ElevenLabs rate limits), rather than as one long request.
+    def __init__(self, archive_dir=None, cache=None, base_url=None, parallel_chunks=None, max_concurrent_requests=None):
+        if parallel_chunks is None:
+            parallel_chunks = os.getenv("ELEVENLABS_PARALLEL_CHUNKS", "0") == "1"
+        self.parallel_chunks = parallel_chunks
+        self.max_concurrent_requests = max_concurrent_requests or int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "3"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent_requests, thread_name_prefix="elevenlabs")
+        # Identical lines are only sent to ElevenLabs once. Pass cache=False to turn this off.
+        self.cache = get_tts_cache() if cache is None else cache
+        # Audio is kept in memory (BytesIO) by default. Set archive_dir (or the TTS_ARCHIVE_DIR env var)
+        # to also write every generated clip to disk, in which case file paths are returned instead.
+        self.archive_dir = archive_dir if archive_dir is not None else os.getenv("TTS_ARCHIVE_DIR")
+        # base_url (or ELEVENLABS_BASE_URL) lets you point this at a local stand-in server, see benchmarks/standins.py
+        base_url = base_url or os.getenv("ELEVENLABS_BASE_URL")
+        if base_url:
+            self.client = ElevenLabs(api_key=os.getenv('ELEVENLABS_API_KEY'), base_url=base_url, httpx_client=get_http_client())
+        else:
+            self.client = ElevenLabs(api_key=os.getenv('ELEVENLABS_API_KEY'), httpx_client=get_http_client()) # Defaults to ELEVEN_API_KEY)
+        # The catalog file is per server, so a stand-in's voices never end up in the real cache
+        self.voice_catalog_file = self.VOICE_CATALOG_FILE if not base_url else f".elevenlabs_voices_{hashlib.sha1(base_url.encode('utf-8')).hexdigest()[:10]}.json"
+        self._catalog_lock = threading.Lock()
+        self._refreshing = False
+
         # Create a map of Names->IDs, so that we can easily grab a voice's ID later on 
         self.voice_to_id = {}
-        for voice in self.voices:
-           self.voice_to_id[voice.name] = voice.voice_id
+        catalog_age = self._load_voice_catalog()
+        if catalog_age is None:
+            # Nothing cached yet, so we have to wait for the API this one time
+            self.refresh_voices()
+        elif catalog_age > self.VOICE_CATALOG_TTL:
+            self.refresh_voices(background=True)
         
         # Print available voices for debugging
         print("[cyan]Available ElevenLabs voices:")
@@ -20,16 +82,66 @@ class ElevenLabsManager:
         
         self.voice_to_settings = {}
 
-    # Convert text to speech, then save it to file. Returns the file path.
+    # Loads the cached voice catalog from disk. Returns its age in seconds, or None if there isn't a usable one.
+    def _load_voice_catalog(self):
+        try:
+            with open(self.voice_catalog_file, 'r') as file:
+                catalog = json.load(file)
+            self.voice_to_id = dict(catalog["voices"])
+            return time.time() - catalog["fetched_at"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    # Fetches the voice list from ElevenLabs and writes it to the catalog file
+    def refresh_voices(self, background=False):
+        if background:
+            with self._catalog_lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self.refresh_voices, daemon=True).start()
+            return
+        try:
+            voices = self.client.voices.get_all().voices
+            voice_to_id = {voice.name: voice.voice_id for voice in voices}
+            with self._catalog_lock:
+                self.voice_to_id = voice_to_id
+            with open(self.voice_catalog_file, 'w') as file:
+                json.dump({"fetched_at": time.time(), "voices": voice_to_id}, file)
+        except Exception as e:
+            # A failed background refresh just means we keep using the cached catalog
+            print(f"[red]Couldn't refresh the ElevenLabs voice list: {e}")
+            if not self.voice_to_id:
+                raise
+        finally:
+            with self._catalog_lock:
+                self._refreshing = False
+
+    # If a voice isn't in the cached catalog, it may have been added since the catalog was saved, so check the API once before giving up
+    def _check_voice(self, voice):
+        if voice not in self.voice_to_id:
+            self.refresh_voices()
+        if voice not in self.voice_to_id:
+            print(f"[red]ERROR: Voice '{voice}' not found in ElevenLabs account!")
+            print(f"[red]Available voices: {list(self.voice_to_id.keys())}")
+            raise ValueError(f"Voice '{voice}' not found. Available voices: {list(self.voice_to_id.keys())}")
+
+    # Convert text to speech. Returns a BytesIO with the audio, or the file path if archiving is enabled.
     # Current model options (that I would use) are eleven_monolingual_v1 or eleven_turbo_v2
     # eleven_turbo_v2 takes about 60% of the time that eleven_monolingual_v1 takes
     # However eleven_monolingual_v1 seems to produce more variety and emphasis, whereas turbo feels more monotone. Turbo still sounds good, just a little less interesting
     def text_to_audio(self, input_text, voice="Doug VO Only", save_as_wave=True, subdirectory="", model_id="eleven_monolingual_v1"):
         # Check if voice exists
-        if voice not in self.voice_to_id:
-            print(f"[red]ERROR: Voice '{voice}' not found in ElevenLabs account!")
-            print(f"[red]Available voices: {list(self.voice_to_id.keys())}")
-            raise ValueError(f"Voice '{voice}' not found. Available voices: {list(self.voice_to_id.keys())}")
+        self._check_voice(voice)
+
+        ext = "wav" if save_as_wave else "mp3"
+        file_name = f"___Msg{str(hash(input_text))}{time.time()}_{model_id}.{ext}"
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key("elevenlabs", voice, model_id, 1.0, input_text, ext)
+            buffer = self.cache.get_buffer(cache_key, file_name)
+            if buffer is not None:
+                return self._archive_or_return(buffer, subdirectory)
             
         # Use the current ElevenLabs API - try multiple method patterns for compatibility
         try:
@@ -56,10 +168,268 @@ class ElevenLabsManager:
                     model=model_id,
                     api_key=os.getenv('ELEVENLABS_API_KEY')
                 )
-        if save_as_wave:
-            file_name = f"___Msg{str(hash(input_text))}{time.time()}_{model_id}.wav"
+        # The SDK hands back either raw bytes or an iterator of byte chunks
+        audio_bytes = audio_saved if isinstance(audio_saved, bytes) else b"".join(audio_saved)
+        buffer = self._mp3_to_buffer(audio_bytes, save_as_wave, file_name)
+        if cache_key:
+            self.cache.put(cache_key, buffer.getvalue())
+        return self._archive_or_return(buffer, subdirectory)
+
+    # Same as text_to_audio, but also returns subtitle timings for each sentence: (audio, timings)
+    # The timings come from ElevenLabs' own character alignment data, so the audio never has to be transcribed.
+    # Timings look like WhisperManager's: [{'text': 'here is my speech', 'start_time': 11.58, 'end_time': 14.74}, ...]
+    # Given a CancelToken as cancel, the audio and alignment are streamed instead, and cancelling the turn closes the request part way
+    # (with TurnCancelled) rather than leaving it running. The result is the same either way.
+    def text_to_audio_with_timings(self, input_text, voice="Doug VO Only", save_as_wave=True, subdirectory="", model_id="eleven_monolingual_v1", cancel=None):
+        self._check_voice(voice)
+        ext = "wav" if save_as_wave else "mp3"
+        file_name = f"___Msg{str(hash(input_text))}{time.time()}_{model_id}.{ext}"
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key("elevenlabs", voice, model_id, 1.0, input_text, ext)
+            buffer = self.cache.get_buffer(cache_key, file_name)
+            timings = self._cached_timings(cache_key)
+            if buffer is not None and timings is not None:
+                return self._archive_or_return(buffer, subdirectory), timings
+
+        try:
+            audio_bytes, alignment = self._convert_with_timestamps(self.voice_to_id[voice], input_text, model_id, cancel)
+        except AttributeError:
+            # This SDK version can't return alignment data, so line the sentences up against the audio instead
+            audio = self.text_to_audio(input_text, voice, save_as_wave, subdirectory, model_id)
+            return audio, estimate_timings(input_text, audio)
+
+        buffer = self._mp3_to_buffer(audio_bytes, save_as_wave, file_name)
+        if alignment and alignment.get("characters"):
+            timings = timings_from_character_alignment(input_text, alignment["characters"], alignment["character_start_times_seconds"], alignment["character_end_times_seconds"])
         else:
-            file_name = f"___Msg{str(hash(input_text))}{time.time()}_{model_id}.mp3"
-        tts_file = os.path.join(os.path.abspath(os.curdir), subdirectory, file_name)
-        save(audio_saved,tts_file)
-        return tts_file
\ No newline at end of file
+            timings = estimate_timings(input_text, buffer)
+        if cache_key:
+            self.cache.put(cache_key, buffer.getvalue())
+            self._cache_timings(cache_key, timings)
+        return self._archive_or_return(buffer, subdirectory), timings
+
+    # Returns (mp3 bytes, alignment), the alignment being a dict of characters and their start and end times, or None
+    def _convert_with_timestamps(self, voice_id, text, model_id, cancel=None):
+        text_to_speech = self.client.text_to_speech
+        # SDKs without stream_with_timestamps can't stop the request part way, so a cancelled turn just stops waiting for it (see CancelToken.run)
+        if cancel is None or not hasattr(text_to_speech, "stream_with_timestamps"):
+            response = text_to_speech.convert_with_timestamps(voice_id=voice_id, text=text, model_id=model_id)
+            # Older SDKs return a plain dict, newer ones a pydantic model
+            if not isinstance(response, dict):
+                response = response.dict()
+            return base64.b64decode(response["audio_base64"]), response.get("alignment")
+
+        # Streamed, the audio and alignment arrive a piece at a time, so the turn can stop the request between any two of them
+        audio = bytearray()
+        alignment = {"characters": [], "character_start_times_seconds": [], "character_end_times_seconds": []}
+        response_stream = text_to_speech.stream_with_timestamps(voice_id=voice_id, text=text, model_id=model_id)
+        try:
+            for chunk in response_stream:
+                cancel.check()
+                if not isinstance(chunk, dict):
+                    chunk = chunk.dict()
+                if chunk.get("audio_base64"):
+                    audio.extend(base64.b64decode(chunk["audio_base64"]))
+                chunk_alignment = chunk.get("alignment")
+                if not chunk_alignment or not chunk_alignment.get("characters"):
+                    continue
+                # Each piece's times are from the start of the whole clip, so they just join up
+                for key in alignment:
+                    alignment[key].extend(chunk_alignment[key])
+        finally:
+            # Closing the stream drops the connection to ElevenLabs, rather than leaving it to generate the rest
+            self._close(response_stream)
+        return bytes(audio), alignment
+
+    def _mp3_to_buffer(self, audio_bytes, save_as_wave, file_name):
+        buffer = io.BytesIO(audio_bytes)
+        if save_as_wave:
+            # ElevenLabs returns mp3, so convert it in memory
+            wav_buffer = io.BytesIO()
+            AudioSegment.from_file(buffer, format="mp3").export(wav_buffer, format="wav")
+            buffer = wav_buffer
+        buffer.seek(0)
+        # Lets AudioManager.get_audio_length() work out the format, the same way it would from a file extension
+        buffer.name = file_name
+        return buffer
+
+    # Subtitle timings are cached next to the audio they belong to
+    def _cached_timings(self, cache_key):
+        data = self.cache.get(f"{cache_key}-timings") if self.cache else None
+        return json.loads(data) if data is not None else None
+
+    def _cache_timings(self, cache_key, timings):
+        if self.cache:
+            self.cache.put(f"{cache_key}-timings", json.dumps(timings).encode("utf-8"))
+
+    def _archive_or_return(self, buffer, subdirectory=""):
+        if not self.archive_dir:
+            return buffer
+
+        file_name = buffer.name
+        directory = os.path.join(os.path.abspath(self.archive_dir), subdirectory)
+        os.makedirs(directory, exist_ok=True)
+        tts_file = os.path.join(directory, file_name)
+        with open(tts_file, "wb") as file:
+            file.write(buffer.getvalue())
+        return tts_file
+
+    # Streams the audio from ElevenLabs and starts playing it as soon as preroll_seconds of audio has arrived,
+    # instead of waiting for the whole clip to be synthesized.
+    # Blocks until the download is complete (playback carries on in the background), then returns (audio, player, timings):
+    # the complete clip as a wav (BytesIO, or the file path if archiving is enabled), the player, and subtitle timings for each sentence.
+    # The player can be used to wait() for playback to end, or to check how far into the clip it is.
+    # With a CancelToken as cancel (see turn_cancellation.py), cancelling it stops playback and the download, and this raises TurnCancelled.
+    # With autoplay=False nothing is played and the player is None, e.g. for benchmarks.
+    def stream_to_audio(self, input_text, voice="Doug VO Only", subdirectory="", model_id="eleven_monolingual_v1", preroll_seconds=None, autoplay=True, cancel=None):
+        self._check_voice(voice)
+        if preroll_seconds is None:
+            preroll_seconds = float(os.getenv("ELEVENLABS_PREROLL_SECONDS", "0.25"))
+
+        player = StreamingAudioPlayer(self.STREAM_SAMPLE_RATE, preroll_seconds) if autoplay else None
+        if player and cancel:
+            cancel.on_cancel(player.stop)
+        file_name = f"___Msg{str(hash(input_text))}{time.time()}_{model_id}.wav"
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key("elevenlabs-stream", voice, model_id, 1.0, input_text, "wav")
+            buffer = self.cache.get_buffer(cache_key, file_name)
+            timings = self._cached_timings(cache_key)
+            if buffer is not None and timings is not None:
+                if player:
+                    with wave.open(buffer, "rb") as wav_file:
+                        player.feed(wav_file.readframes(wav_file.getnframes()))
+                    player.finish()
+                    buffer.seek(0)
+                return self._archive_or_return(buffer, subdirectory), player, timings
+
+        start_time = time.perf_counter()
+        try:
+            if self.parallel_chunks:
+                pcm_audio, timings = self._stream_parallel_chunks(input_text, self.voice_to_id[voice], model_id, player, cancel)
+            else:
+                pcm_audio, timings = self._stream_single_request(input_text, self.voice_to_id[voice], model_id, player, cancel)
+        except BaseException:
+            # The caller never gets the player, so stop it here or its audio stream would never be closed
+            if player:
+                player.stop()
+            raise
+        if player:
+            player.finish()
+        metrics.observe("elevenlabs.stream.total", time.perf_counter() - start_time)
+
+        # Write out the complete clip so it can be used for subtitle alignment
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.STREAM_SAMPLE_RATE)
+            wav_file.writeframes(bytes(pcm_audio[:len(pcm_audio) - len(pcm_audio) % 2]))
+        buffer.seek(0)
+        buffer.name = file_name
+        if timings is None:
+            timings = estimate_timings(input_text, buffer)
+        if cache_key:
+            self.cache.put(cache_key, buffer.getvalue())
+            self._cache_timings(cache_key, timings)
+        return self._archive_or_return(buffer, subdirectory), player, timings
+
+    def _stream_single_request(self, input_text, voice_id, model_id, player, cancel=None):
+        start_time = time.perf_counter()
+        first_chunk_time = None
+        pcm_audio = bytearray()
+        audio_stream = self.client.text_to_speech.convert_as_stream(
+            voice_id=voice_id,
+            text=input_text,
+            model_id=model_id,
+            output_format=self.STREAM_OUTPUT_FORMAT,
+        )
+        try:
+            for chunk in audio_stream:
+                if cancel:
+                    cancel.check()
+                if not chunk:
+                    continue
+                if first_chunk_time is None:
+                    first_chunk_time = time.perf_counter() - start_time
+                    metrics.observe("elevenlabs.stream.first_byte", first_chunk_time)
+                pcm_audio.extend(chunk)
+                if player:
+                    player.feed(chunk)
+        finally:
+            # Closing the stream drops the connection to ElevenLabs, rather than leaving it to download the rest
+            self._close(audio_stream)
+        # One continuous clip, so the sentence timings have to be worked out from the audio afterwards
+        return pcm_audio, None
+
+    # Synthesizes each group of sentences as its own request, all at once (up to max_concurrent_requests),
+    # then feeds them to the player in order. The first chunk plays as soon as it lands, while the rest are still being made.
+    def _stream_parallel_chunks(self, input_text, voice_id, model_id, player, cancel=None):
+        start_time = time.perf_counter()
+        chunks = group_sentences(split_sentences(input_text)) or [input_text]
+        futures = []
+        for i, chunk in enumerate(chunks):
+            # The surrounding text lets ElevenLabs keep the intonation flowing across chunk boundaries
+            previous_text = chunks[i - 1] if i > 0 else None
+            next_text = chunks[i + 1] if i + 1 < len(chunks) else None
+            futures.append(self._executor.submit(self._synthesize_pcm, chunk, voice_id, model_id, previous_text, next_text, cancel))
+
+        pcm_audio = bytearray()
+        durations = []
+        try:
+            for i, future in enumerate(futures):
+                chunk_audio = cancel.wait_for(future) if cancel else future.result()
+                if i == 0:
+                    metrics.observe("elevenlabs.stream.first_byte", time.perf_counter() - start_time)
+                # Keep every chunk sample-aligned, so an odd byte never shifts the rest of the audio
+                chunk_audio = chunk_audio[:len(chunk_audio) - len(chunk_audio) % 2]
+                pcm_audio.extend(chunk_audio)
+                durations.append(len(chunk_audio) / 2 / self.STREAM_SAMPLE_RATE)
+                if player:
+                    player.feed(chunk_audio)
+        finally:
+            for future in futures:
+                future.cancel()
+        metrics.increment("elevenlabs.parallel_chunks", len(chunks))
+        # Every chunk is whole sentences, so each chunk's length gives us its subtitle timing for free
+        return pcm_audio, timings_from_durations(chunks, durations)
+
+    def _synthesize_pcm(self, text, voice_id, model_id, previous_text=None, next_text=None, cancel=None):
+        request = {"voice_id": voice_id, "text": text, "model_id": model_id, "output_format": self.STREAM_OUTPUT_FORMAT}
+        if previous_text:
+            request["previous_text"] = previous_text
+        if next_text:
+            request["next_text"] = next_text
+        start_time = time.perf_counter()
+        try:
+            audio = self.client.text_to_speech.convert(**request)
+        except TypeError:
+            # Older versions of the SDK don't support previous_text / next_text
+            request.pop("previous_text", None)
+            request.pop("next_text", None)
+            audio = self.client.text_to_speech.convert(**request)
+        audio = self._read_audio(audio, cancel)
+        metrics.observe("elevenlabs.chunk_request", time.perf_counter() - start_time)
+        return audio
+
+    @classmethod
+    def _read_audio(cls, audio, cancel=None):
+        # The SDK hands back either raw bytes or an iterator of byte chunks. If the turn is cancelled, the rest is never downloaded
+        if isinstance(audio, bytes):
+            return audio
+        data = bytearray()
+        try:
+            for chunk in audio:
+                if cancel:
+                    cancel.check()
+                data.extend(chunk)
+        finally:
+            cls._close(audio)
+        return bytes(data)
+
+    @staticmethod
+    def _close(audio_stream):
+        close = getattr(audio_stream, "close", None)
+        if close:
+            close()
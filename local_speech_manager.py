@@ -2,22 +2,65 @@ import threading
 import queue
 import time
 import os
+import io
 import re
-from gtts import gTTS
+import functools
 import pygame.mixer
 from pydub import AudioSegment
 
+from tts_cache import TTSCache, get_tts_cache
+from text_chunking import split_sentences
+from subtitle_timing import timings_from_durations
+
+
+class _SpeechJob:
+    """
+    One call to speak() / stream_speech(). Workers drop each finished chunk in here,
+    and the consumer waits on the chunks in order.
+    """
+
+    def __init__(self, total, on_ready=None):
+        self.total = total
+        self.cancelled = False
+        self.on_ready = on_ready
+        self._results = {}
+        self._cond = threading.Condition()
+
+    def set_result(self, idx, result):
+        if self.on_ready is not None:
+            self.on_ready(idx, result)
+            return
+        with self._cond:
+            self._results[idx] = result
+            self._cond.notify_all()
+
+    def wait_for(self, idx):
+        with self._cond:
+            self._cond.wait_for(lambda: idx in self._results)
+            return self._results.pop(idx)
+
 
 class SpeechManager:
     """
     message_queue      ← Pushed with full text from external (Flask)
     process_queue()    ← Called repeatedly in the pygame main loop
-    speak()            ← Used internally, splits text into chunks and generates MP3s in parallel
+    speak()            ← Used internally, splits text into chunks and queues them on the TTS worker pool
+    stream_speech()    ← Generator version of speak(), yields chunk i as soon as it and every earlier chunk is ready
     """
 
-    def __init__(self, avatar_manager=None, chunk_size: int = 10, speed: float = 1.5):
+    # Used in the TTS cache key, so subclasses with a different synthesis backend never share entries
+    engine_name = "gtts"
+
+    def __init__(self, avatar_manager=None, chunk_size: int = 10, speed: float = 1.5, num_workers: int = 4, max_pending: int = 8, archive_dir=None, cache=None):
         self.message_queue: "queue.Queue[str]" = queue.Queue()
 
+        # Identical lines are only synthesized once. Pass cache=False to turn this off.
+        self.cache = get_tts_cache() if cache is None else cache
+
+        # Audio is kept in memory (BytesIO) by default. Set archive_dir (or the TTS_ARCHIVE_DIR env var)
+        # to also write every generated clip to disk, in which case file paths are returned instead.
+        self.archive_dir = archive_dir if archive_dir is not None else os.getenv("TTS_ARCHIVE_DIR")
+
         self.avatar_manager = avatar_manager
         self.chunk_size = chunk_size
         self.speed = speed
@@ -28,6 +71,15 @@ class SpeechManager:
         self._generated_cnt = 0            
         self._generating = False           
 
+        # Fixed-size TTS worker pool. The task queue is bounded, so a very long response
+        # just blocks the feeder thread instead of spawning a thread per chunk.
+        self._task_queue = queue.Queue(maxsize=max_pending)
+        self._workers = []
+        for worker_idx in range(num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"tts-worker-{worker_idx}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
         pygame.mixer.init()
 
     @property
@@ -38,22 +90,14 @@ class SpeechManager:
         if self.is_speaking:
             return
 
-        finished_idx = self._next_play_idx - 1
-        if finished_idx >= 0:
-            old_path = f"tts_{finished_idx}.mp3"
-            temp_old_path = f"temp_tts_{finished_idx}.mp3"
-            if os.path.exists(old_path):
-                os.remove(old_path)
-
-            if os.path.exists(temp_old_path):
-                os.remove(temp_old_path)
-
         with self._ready_lock:
-            path = self._ready_mp3.pop(self._next_play_idx, None)
+            audio = self._ready_mp3.pop(self._next_play_idx, None)
 
-        if path:
-            print(f"Playing audio: {path}")
-            pygame.mixer.Sound(path).play()
+        if audio:
+            print(f"Playing audio chunk {self._next_play_idx + 1} of {self._total_chunks}")
+            if hasattr(audio, "seek"):
+                audio.seek(0)
+            pygame.mixer.Sound(audio).play()
             self._next_play_idx += 1
             return
 
@@ -68,53 +112,111 @@ class SpeechManager:
     def text_to_audio(self, input_text, voice="default", save_as_wave=True, subdirectory="", model_id="gtts", agent_name=None, audio_number=None):
         """
         Compatibility method for the existing codebase.
-        Generates audio file and returns the path (to match ElevenLabs interface)
+        Generates the audio in memory and returns it as a BytesIO buffer.
+        If archiving is enabled the audio is also written to disk and the file path is returned (to match the old ElevenLabs interface)
         """
-        # Improved filename: agent_audio_number_datetime
-        timestamp = time.strftime('%Y%m%d_%H%M%S')
-        agent_str = agent_name if agent_name else "agent"
-        audio_num_str = str(audio_number) if audio_number is not None else "audio"
         ext = "wav" if save_as_wave else "mp3"
-        file_name = f"{agent_str}_audio_{audio_num_str}_{timestamp}.{ext}"
-            
-        tts_file = os.path.join(os.path.abspath(os.curdir), subdirectory, file_name)
         
         try:
-            # Use gTTS to generate the audio
-            if save_as_wave:
-                # Generate as MP3 first, then convert to WAV
-                temp_mp3 = tts_file.replace('.wav', '_temp.mp3')
-                gTTS(text=input_text, lang="en", tld="us").save(temp_mp3)
-                
-                # Convert MP3 to WAV using pydub
-                audio = AudioSegment.from_file(temp_mp3, format="mp3")
-                audio.export(tts_file, format="wav")
-                
-                
-                
-                # Clean up temp file
-                if os.path.exists(temp_mp3):
-                    os.remove(temp_mp3)
-            else:
-                # Direct MP3 generation
-                gTTS(text=input_text, lang="en", tld="us").save(tts_file)
-            
-            # speedup
-            if not save_as_wave:
-                print(f"[green]Speeding up audio {file_name} by {self.speed}x")
-                audio = AudioSegment.from_file(tts_file, format="mp3")
-                final = audio.speedup(playback_speed=self.speed)
-                final.export(tts_file, format="mp3")
-            print(f"[green]Local TTS (gTTS) saved: {file_name}")
-            return tts_file
-            
+            # speedup is only applied to mp3 output
+            buffer = self._render(input_text, voice, model_id, ext, 1.0 if save_as_wave else self.speed)
         except Exception as e:
             print(f"[red]TTS Error: {e}")
-            # Return a dummy file path to prevent crashes
-            return tts_file
+            return None
+        return self._archive_or_return(buffer, ext, subdirectory, agent_name, audio_number)
 
-    def speak(self, text: str):
-        """Split the entire text into chunks, generate MP3s in parallel, and reset the playback pipeline"""
+    def text_to_audio_with_timings(self, input_text, voice="default", save_as_wave=True, subdirectory="", model_id="gtts", agent_name=None, audio_number=None):
+        """
+        Same as text_to_audio, but also returns subtitle timings for each sentence, so nothing needs to be transcribed.
+        Each sentence is synthesized separately on the worker pool and then stitched together, so the timings come straight from each sentence's length.
+        Returns (audio, timings), or (None, None) if nothing could be generated.
+        Timings look like WhisperManager's: [{'text': 'here is my speech', 'start_time': 11.58, 'end_time': 14.74}, ...]
+        """
+        ext = "wav" if save_as_wave else "mp3"
+        speed = 1.0 if save_as_wave else self.speed
+        sentences = split_sentences(input_text) or [input_text]
+
+        job = _SpeechJob(len(sentences))
+        threading.Thread(target=self._submit_work, args=(job, [functools.partial(self._render_segment, sentence, voice, model_id, speed) for sentence in sentences]), daemon=True).start()
+        spoken_sentences = []
+        segments = []
+        for idx, sentence in enumerate(sentences):
+            segment = job.wait_for(idx)
+            if segment is None:
+                print(f"[red]TTS Error: couldn't generate audio for: {sentence}")
+                continue
+            spoken_sentences.append(sentence)
+            segments.append(segment)
+        if not segments:
+            return None, None
+
+        audio = sum(segments[1:], segments[0])
+        timings = timings_from_durations(spoken_sentences, [len(segment) / 1000 for segment in segments])
+        return self._archive_or_return(self._export(audio, ext), ext, subdirectory, agent_name, audio_number), timings
+
+    def _render_segment(self, text, voice, model_id, speed):
+        # wav in the cache, because decoding it back into an AudioSegment is nearly free
+        return AudioSegment.from_file(self._render(text, voice, model_id, "wav", speed), format="wav")
+
+    def _archive_or_return(self, buffer, ext, subdirectory="", agent_name=None, audio_number=None):
+        if not self.archive_dir:
+            print(f"[green]Local TTS ({self.engine_name}) generated {ext} audio in memory")
+            return buffer
+
+        # Improved filename: agent_audio_number_datetime
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+        agent_str = agent_name if agent_name else "agent"
+        audio_num_str = str(audio_number) if audio_number is not None else "audio"
+        file_name = f"{agent_str}_audio_{audio_num_str}_{timestamp}.{ext}"
+        tts_file = self._archive(buffer, file_name, subdirectory)
+        print(f"[green]Local TTS ({self.engine_name}) saved: {file_name}")
+        return tts_file
+
+    def _render(self, text, voice, model_id, ext, speed):
+        """Returns the finished audio as a BytesIO, from the cache if we've said this exact line before"""
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key(self.engine_name, voice, model_id, speed, text, ext)
+            buffer = self.cache.get_buffer(cache_key, f"tts.{ext}")
+            if buffer is not None:
+                return buffer
+
+        audio = self._synthesize(text, voice)
+        if speed != 1.0:
+            print(f"[green]Speeding up audio by {speed}x")
+            audio = audio.speedup(playback_speed=speed)
+        buffer = self._export(audio, ext)
+        if cache_key:
+            self.cache.put(cache_key, buffer.getvalue())
+        return buffer
+
+    def _synthesize(self, text, voice=None):
+        """Runs gTTS entirely in memory and returns the decoded AudioSegment"""
+        # Imported here, so the offline engine (a subclass) never loads gTTS and its HTTP stack
+        from gtts import gTTS
+        mp3_buffer = io.BytesIO()
+        gTTS(text=text, lang="en", tld="us").write_to_fp(mp3_buffer)
+        mp3_buffer.seek(0)
+        return AudioSegment.from_file(mp3_buffer, format="mp3")
+
+    def _export(self, audio, ext):
+        buffer = io.BytesIO()
+        audio.export(buffer, format=ext)
+        buffer.seek(0)
+        # Lets AudioManager.get_audio_length() work out the format, the same way it would from a file extension
+        buffer.name = f"tts.{ext}"
+        return buffer
+
+    def _archive(self, buffer, file_name, subdirectory=""):
+        directory = os.path.join(os.path.abspath(self.archive_dir), subdirectory)
+        os.makedirs(directory, exist_ok=True)
+        tts_file = os.path.join(directory, file_name)
+        with open(tts_file, "wb") as file:
+            file.write(buffer.getvalue())
+        return tts_file
+
+    def split_into_chunks(self, text: str):
+        """Split text into chunks that end on punctuation where possible. Chunks double in size so the first one is ready fast."""
         words = text.split()
         chunks = []
         i = 0
@@ -142,50 +244,89 @@ class SpeechManager:
 
             i = end
             size *= 2
+        return chunks
+
+    def speak(self, text: str):
+        """Split the entire text into chunks, generate MP3s on the worker pool, and reset the playback pipeline"""
+        chunks = self.split_into_chunks(text)
         
     # Reset pipeline
         self._ready_mp3.clear()
         self._next_play_idx = 0
         self._total_chunks = len(chunks)
         self._generated_cnt = 0
-        self._generating = True
+        self._generating = len(chunks) > 0
 
     # Parallel generation
-        for idx, chunk in enumerate(chunks):
-            threading.Thread(
-                target=self._tts_worker,
-                args=(idx, chunk),
-                daemon=True,
-            ).start()
-            time.sleep(0.1)  # Avoid overwhelming the system with threads
+        job = _SpeechJob(len(chunks), on_ready=self._on_chunk_ready)
+        threading.Thread(target=self._submit_job, args=(job, chunks), daemon=True).start()
+
+    def stream_speech(self, text: str):
+        """
+        Generator that yields the audio for each chunk of text, in order.
+        Chunk i is yielded as soon as it and all earlier chunks have been generated, so playback can start on the first chunk
+        while the rest are still being synthesized. Chunks that failed to generate are skipped.
+        Nothing in multi_agent_gpt.py uses this yet: the agent loop needs the whole clip up front for the subtitle timings,
+        so it calls text_to_audio_with_timings instead.
+        """
+        chunks = self.split_into_chunks(text)
+        job = _SpeechJob(len(chunks))
+        # Feed the bounded queue from a separate thread so the consumer can start yielding right away
+        threading.Thread(target=self._submit_job, args=(job, chunks), daemon=True).start()
+        try:
+            for idx in range(len(chunks)):
+                result = job.wait_for(idx)
+                if result is not None:
+                    yield result
+        finally:
+            # If the consumer stops early, the workers skip whatever hasn't been started yet
+            job.cancelled = True
+
+    def _submit_job(self, job, chunks):
+        self._submit_work(job, [functools.partial(self._tts_worker, idx, chunk) for idx, chunk in enumerate(chunks)])
+
+    def _submit_work(self, job, work_items):
+        for idx, work in enumerate(work_items):
+            # Blocks while the queue is full
+            self._task_queue.put((job, idx, work))
+
+    def _worker_loop(self):
+        while True:
+            job, idx, work = self._task_queue.get()
+            result = None
+            try:
+                if not job.cancelled:
+                    result = work()
+            except Exception as e:
+                print(f"[TTS ERROR] {e}")
+            finally:
+                job.set_result(idx, result)
+                self._task_queue.task_done()
+
+    def _on_chunk_ready(self, idx, path):
+        with self._ready_lock:
+            if path:
+                self._ready_mp3[idx] = path
+            self._generated_cnt += 1
+            if self._generated_cnt >= self._total_chunks:
+                self._generating = False
 
     def _tts_worker(self, idx: int, text: str, agent_name=None):
+        """Generates the audio for a single chunk and returns it (a BytesIO, or a path if archiving), or None if it failed"""
         try:
+            # Generate TTS audio for all chunks, with the speed-up applied
+            buffer = self._render(text, "default", self.engine_name, "mp3", self.speed)
+            print('created audio chunk', idx + 1)
+
+            if not self.archive_dir:
+                return buffer
             timestamp = time.strftime('%Y%m%d_%H%M%S')
             agent_str = agent_name if agent_name else "agent"
-            temp_path = f"{agent_str}_audio_{idx}_{timestamp}_temp.mp3"
-            path = f"{agent_str}_audio_{idx}_{timestamp}.mp3"
-            
-            # Generate TTS audio for all chunks
-            gTTS(text=text, lang="en", tld="us").save(temp_path)
-            
-            # Apply speed-up to all chunks
-            print(f"[green]Speeding up audio {temp_path} by {self.speed}x")
-            audio = AudioSegment.from_file(temp_path, format="mp3")
-            final = audio.speedup(playback_speed=self.speed)
-            final.export(path, format="mp3")
-            
-            print('created audio', idx + 1, 'of', self._total_chunks)
-            with self._ready_lock:
-                self._ready_mp3[idx] = path
+            return self._archive(buffer, f"{agent_str}_audio_{idx}_{timestamp}.mp3")
                 
         except Exception as e:
             print(f"[TTS ERROR] {e}")
-        finally:
-            with self._ready_lock:
-                self._generated_cnt += 1
-                if self._generated_cnt >= self._total_chunks:
-                    self._generating = False
+            return None
 
 
 # Compatibility alias for the main application
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and latency samples shared by every module.
+    The web app serves snapshot() on /metrics, so anything recorded here shows up in one place.
+    """
+
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        # Only the most recent max_samples observations are kept per name
+        self.timings = defaultdict(lambda: deque(maxlen=self._max_samples))
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.timings[name].append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        # with metrics.timer("openai.chat"): ...
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start_time)
+
+    def percentile(self, name, percent, default=None):
+        with self._lock:
+            samples = sorted(self.timings.get(name, ()))
+        if not samples:
+            return default
+        index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def snapshot(self):
+        with self._lock:
+            timings = {name: sorted(samples) for name, samples in self.timings.items() if samples}
+            snapshot = {"counters": dict(self.counters), "gauges": dict(self.gauges), "timings": {}}
+        for name, samples in timings.items():
+            snapshot["timings"][name] = {
+                "count": len(samples),
+                "mean": sum(samples) / len(samples),
+                "p50": samples[len(samples) // 2],
+                "p95": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+                "max": samples[-1],
+            }
+        return snapshot
+
+
+# Process-wide instance, import this rather than making your own
+metrics = Metrics()
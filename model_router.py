@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import threading
+from rich import print
+
+from metrics import metrics
+
+# What OpenAiManager asks for: chat_with_history (the agents' turns), chat (one-off questions) and analyze_image
+CALL_TYPES = ("conversation", "question", "image")
+
+
+class ModelRouter:
+    """
+    Decides which OpenAI model each request uses, per agent and per call type, and falls back to a faster model
+    when the configured one can't keep up, so the conversation keeps its pace instead of waiting on the slowest model.
+
+    Routes: the most specific match wins, agent + call type, then agent, then call type, then default_model.
+    Set them with set_route(), or with OPENAI_MODEL_ROUTES as JSON keyed by "agent:call_type" ("*" matches anything), e.g.
+        OPENAI_MODEL_ROUTES='{"OSWALD": "gpt-4.1-mini", "*:image": "gpt-4o", "VICTORIA:conversation": "gpt-4.1"}'
+    default_model / OPENAI_MODEL (gpt-4o) is used when nothing else matches.
+
+    Fallback to fallback_model / OPENAI_FALLBACK_MODEL (gpt-4o-mini):
+    - the routed model gets turn_sla / OPENAI_TURN_SLA_SECONDS (8s) to answer conversation and question calls. If it misses,
+      the request is sent again to the fallback model straight away, and that route goes to the fallback for the next cooldown seconds
+    - image calls ask for long answers (up to 4096 tokens), so they'd routinely miss that. They get image_sla / OPENAI_IMAGE_SLA_SECONDS
+      instead, which is unset by default: the routed model gets the whole deadline, and only an error sends it to the fallback
+    - for conversation calls, if is_behind is set and returns True (this turn won't be ready before the current speaker finishes),
+      the fallback model is used from the start. Questions and images aren't on the show's clock, so they always try the routed model first
+    """
+
+    def __init__(self, default_model=None, fallback_model=None, turn_sla=None, image_sla=None, cooldown=60.0, routes=None):
+        self.default_model = default_model or os.getenv("OPENAI_MODEL", "gpt-4o")
+        self.fallback_model = fallback_model or os.getenv("OPENAI_FALLBACK_MODEL", "gpt-4o-mini")
+        self.turn_sla = turn_sla if turn_sla is not None else float(os.getenv("OPENAI_TURN_SLA_SECONDS", "8"))
+        image_sla_env = os.getenv("OPENAI_IMAGE_SLA_SECONDS")
+        self.image_sla = image_sla if image_sla is not None else (float(image_sla_env) if image_sla_env else None)
+        self.cooldown = cooldown
+        # Optional callable, returns True when the next conversation turn is running late (e.g. PacingController.is_behind)
+        self.is_behind = None
+        self.routes = {}
+        self._missed_until = {}
+        self._lock = threading.Lock()
+        routes_json = os.getenv("OPENAI_MODEL_ROUTES")
+        for key, model in dict(json.loads(routes_json) if routes_json else {}, **(routes or {})).items():
+            agent, _, call_type = key.partition(":")
+            self.set_route(model, agent, call_type or "*")
+
+    def set_route(self, model, agent="*", call_type="*"):
+        if call_type not in CALL_TYPES + ("*",):
+            raise ValueError(f"Unknown call type {call_type}, expected one of {', '.join(CALL_TYPES)}")
+        self.routes[(agent, call_type)] = model
+
+    def model_for(self, agent, call_type):
+        """The configured model for this agent and call type, ignoring fallbacks"""
+        for key in ((agent, call_type), (agent, "*"), ("*", call_type)):
+            if key in self.routes:
+                return self.routes[key]
+        return self.default_model
+
+    def sla_for(self, call_type):
+        """Seconds the routed model gets before the request goes to the fallback model, or None for no limit but the deadline"""
+        return self.image_sla if call_type == "image" else self.turn_sla
+
+    def plan(self, agent, call_type):
+        """The models to try, in order. The request only goes to the second one if the first misses the turn SLA"""
+        model = self.model_for(agent, call_type)
+        if model == self.fallback_model:
+            return [model]
+        if call_type == "conversation" and self.is_behind is not None and self.is_behind():
+            metrics.increment("openai.fallbacks.behind")
+            return [self.fallback_model]
+        with self._lock:
+            cooling_down = time.monotonic() < self._missed_until.get((agent, call_type), 0)
+        if cooling_down:
+            metrics.increment("openai.fallbacks.cooldown")
+            return [self.fallback_model]
+        return [model, self.fallback_model]
+
+    def record_miss(self, agent, call_type, model):
+        with self._lock:
+            self._missed_until[(agent, call_type)] = time.monotonic() + self.cooldown
+        metrics.increment(f"openai.sla_misses.{model}")
+        sla = self.sla_for(call_type)
+        missed = f"the {sla:.0f}s {call_type} deadline" if sla is not None else f"a {call_type} request"
+        print(f"[yellow]{model} missed {missed} for {agent}, using {self.fallback_model} for the next {self.cooldown:.0f}s")
+
+
+# Process-wide instance, import this rather than making your own
+model_router = ModelRouter()
@@ -11,7 +11,7 @@
         # Acquire conversation lock
             # Get response from OpenAI
             # Add this new response to all other agents' chat histories
-        # Creates TTS with ElevenLabs
+        # Creates TTS with ElevenLabs (or a local voice), plus the subtitle timing of each sentence
         # Acquire speaking lock (so only 1 speaks at a time)
             # Pick another thread randomly, activate them
                 # Because this happens within the speaking lock, we are guaranteed that the other agents are inactive when this called.
@@ -25,6 +25,7 @@
 
     # If F7 is pressed:
         # Toggles "pause" flag - stops other agents from activating additional agents
+        # Barge-in: cancels whoever is speaking, and every turn being prepared (see turn_cancellation.py)
 
         # Record mic audio (until you press F8)
 
@@ -53,8 +54,11 @@
         # Turns off "pause" flag
         # Activates Agent 3
 
-from flask import Flask, render_template, session, request
-from flask_socketio import SocketIO, emit
+# Imported first, so it can time everything after it. Run with --profile-startup to see where startup time goes
+from startup_profile import startup_profile
+from flask import Flask, render_template, session, request, jsonify
+from flask_socketio import SocketIO, emit, join_room
+import os
 import threading
 import time
 import keyboard
@@ -63,10 +67,21 @@ import logging
 from rich import print
 
 from audio_player import AudioManager
-from eleven_labs import ElevenLabsManager
-from local_speech_manager import LocalSpeechManager
+# The speech backends are imported in get_speech_manager(), so only the one you're using gets loaded at startup
+import openai_chat
 from openai_chat import OpenAiManager
 from obs_websockets import OBSWebsocketsManager
+from metrics import metrics
+from broadcaster import Broadcaster
+from usage_tracker import usage_tracker
+from model_router import model_router
+from conversation_memory import ConversationMemory
+from pacing import pacing_controller, estimate_speech_seconds
+from turn_cancellation import turn_canceller, TurnCancelled
+from whisper_loader import WhisperLoader
+from process_workers import WhisperWorker, SpeechWorker
+from transcription_service import TranscriptionService, HUMAN_PRIORITY
+from streaming_asr import StreamingTranscriber
 from ai_prompts import *
 
 socketio = SocketIO
@@ -80,41 +95,134 @@ log.setLevel(logging.ERROR)
 def home():
     return render_template('index.html')
 
+# Counters, gauges and latency stats from every module, as JSON
+@app.route("/metrics")
+def metrics_report():
+    report = metrics.snapshot()
+    tts_cache = getattr(speech_manager, "cache", None)
+    if tts_cache:
+        report["tts_cache"] = tts_cache.stats()
+    # OpenAI token usage and cost, per agent / model / minute
+    report["usage"] = usage_tracker.snapshot()
+    # How far ahead of playback each turn was ready, and the answer lengths that were asked for
+    report["pacing"] = pacing_controller.snapshot()
+    return jsonify(report)
+
 @socketio.event
 def connect():
     print("[green]The server connected to client!")
+    # Let the overlay know whether we can transcribe the mic yet
+    emit('whisper_status', {'state': whisper_loader.state})
+
+# Clients join the room of the conversation they want to follow (the overlay uses ?room=..., default "main")
+@socketio.event
+def join(data):
+    join_room(data.get('room') or conversation_room)
+
+# Every event for this conversation goes to this room
+conversation_room = os.getenv("CONVERSATION_ROOM", "main")
+# Sends all the overlay events from a background task, so agent threads never wait on the clients
+broadcaster = Broadcaster(socketio, room=conversation_room).start()
 
-obswebsockets_manager = OBSWebsocketsManager()
+# Connects (and keeps reconnecting) in the background, so OBS not running yet doesn't hold up startup
+with startup_profile.step("OBS manager"):
+    obswebsockets_manager = OBSWebsocketsManager()
 audio_manager = AudioManager()
 
 # Speech managers - choose between local and ElevenLabs
 use_local_speech = True  # Set to False to use ElevenLabs instead
-
+# Which local engine to use: "offline" runs fully on this machine (piper or espeak-ng, see offline_speech_manager.py), "gtts" uses Google's online TTS
+local_speech_engine = "offline"
+
+# Run Whisper and TTS in their own worker processes, so model inference never makes the subtitles or hotkeys stutter.
+# Workers are restarted automatically if they crash. Streaming TTS (use_streaming_tts) isn't available in this mode.
+use_worker_processes = False
+
+# One warm instance per speech backend. Toggling with F6 just swaps between these, rather than reconnecting and reloading every time.
+speech_managers = {}
+speech_managers_lock = threading.Lock()
+
+def make_speech_manager(backend):
+    if use_worker_processes:
+        return SpeechWorker(backend)
+    if backend == "elevenlabs":
+        from eleven_labs import ElevenLabsManager
+        return ElevenLabsManager()
+    if backend == "offline":
+        from offline_speech_manager import OfflineSpeechManager
+        return OfflineSpeechManager()
+    from local_speech_manager import LocalSpeechManager
+    return LocalSpeechManager()
+
+def get_speech_manager(local):
+    global local_speech_engine
+    backend = local_speech_engine if local else "elevenlabs"
+    with speech_managers_lock:
+        if backend not in speech_managers:
+            try:
+                speech_managers[backend] = make_speech_manager(backend)
+            except Exception as e:
+                if backend != "offline":
+                    raise
+                # Usually espeak-ng isn't installed (and no piper voice is set up). gTTS needs nothing installed, so the show still starts
+                print(f"[yellow]Couldn't start the offline speech engine, falling back to gTTS: {e}")
+                local_speech_engine = backend = "gtts"
+                if backend not in speech_managers:
+                    speech_managers[backend] = make_speech_manager(backend)
+        return speech_managers[backend]
+
+# Load the other speech backend in the background at startup, so the first F6 toggle is instant.
+# Off by default, since for ElevenLabs that means importing its SDK and calling its API even if you never switch to it.
+warm_up_other_speech_backend = False
+
+def warm_up_speech_manager(local):
+    try:
+        get_speech_manager(local)
+    except Exception as e:
+        print(f"[yellow]Couldn't warm up the {'local' if local else 'ElevenLabs'} speech backend, F6 will try again: {e}")
+
+with startup_profile.step(f"speech manager ({local_speech_engine if use_local_speech else 'elevenlabs'})"):
+    speech_manager = get_speech_manager(use_local_speech)
 if use_local_speech:
-    speech_manager = LocalSpeechManager()
-    print("[green]Using local text-to-speech")
+    print(f"[green]Using local text-to-speech ({local_speech_engine})")
 else:
-    speech_manager = ElevenLabsManager()
     print("[green]Using ElevenLabs text-to-speech")
+# ElevenLabs only: stream each line and start playing it once the first audio arrives, instead of waiting for the full clip
+use_streaming_tts = False
 
-# Whisper manager - only loaded when needed
-whisper_manager = None
+# Whisper model - loads and warms up on a background thread from the moment the app starts, so it's ready by the time anyone talks.
+# Nothing on the agents' speaking path needs it, it's only used to transcribe the human's mic.
+whisper_loader = WhisperLoader(on_state_change=lambda state: broadcaster.emit('whisper_status', {'state': state}, coalesce_key='state'), manager_factory=WhisperWorker if use_worker_processes else None)
+with startup_profile.step("start loading Whisper (background)"):
+    whisper_loader.start()
+# Every transcription goes through this, so requests from different threads get batched together and the human's mic always goes first
+transcription_service = TranscriptionService(whisper_loader)
 
 speaking_lock = threading.Lock()
 conversation_lock = threading.Lock()
 
 agents_paused = False
+# Barge-in: when the human starts talking (num 7), whoever is speaking stops immediately, and any answers or audio still being
+# generated (or already made and waiting their turn) are thrown away. Set to False to let the current speaker finish instead.
+use_barge_in = True
 use_text_input = False  # Set to False to use Whisper audio input instead
+use_streaming_asr = False  # Transcribe the mic while you're still talking (and show it on the overlay), rather than after you stop
+
+# Which model each agent uses is set in model_router.py (or with OPENAI_MODEL_ROUTES), e.g. model_router.set_route("gpt-4.1-mini", agent="OSWALD")
+# When pacing.py predicts an agent's turn won't be ready before the current speaker finishes (even at the length it asked for),
+# get it from the faster fallback model. Questions and images always try the routed model first
+use_fast_model_when_behind = True
+if use_fast_model_when_behind:
+    model_router.is_behind = pacing_controller.is_behind
 
-def load_whisper_manager():
-    """Lazy load Whisper manager only when needed"""
-    global whisper_manager
-    if whisper_manager is None:
-        print("[yellow]Loading Whisper model for audio transcription...")
-        from whisper_openai import WhisperManager
-        whisper_manager = WhisperManager()
-        print("[green]Whisper model loaded successfully!")
-    return whisper_manager
+# Each request only carries the last few messages plus the older lines most relevant to them (see conversation_memory.py),
+# rather than the whole conversation, so prompts stay small however long the show goes on. The full history is still backed up.
+use_conversation_memory = True
+
+# Ask for shorter answers (fewer sentences, a max_tokens cap and stop sequences) when the next turn wouldn't otherwise be ready
+# before the current speaker finishes, so there's no dead air. See pacing.py. With False, every answer is up to 3 sentences.
+use_adaptive_response_length = True
+pacing_controller.adaptive = use_adaptive_response_length
 
 # Class that represents a single ChatGPT Agent and its information
 class Agent():
@@ -122,6 +230,8 @@ class Agent():
     def __init__(self, agent_name, agent_id, filter_name, all_agents, system_prompt, elevenlabs_voice):
         # Flag of whether this agent should begin speaking
         self.activated = False 
+        # The barge-in epoch it was activated in (see turn_cancellation.py). If the human barges in before the turn starts, it's dropped
+        self.activated_epoch = 0
         # Used to identify each agent in the conversation history
         self.name = agent_name 
         # an int used to ID this agent to the frontend code
@@ -137,80 +247,178 @@ class Agent():
         backup_file_name = f"backup_history_{agent_name}.txt"
         # Initialize the OpenAi manager with a system prompt and a file that you would like to save your conversation too
         # If the backup file isn't empty, then it will restore that backed up conversation for this agent
-        self.openai_manager = OpenAiManager(system_prompt, backup_file_name) 
+        self.openai_manager = OpenAiManager(system_prompt, backup_file_name, name=agent_name, memory=ConversationMemory() if use_conversation_memory else None)
         # Optional - tells the OpenAi manager not to print as much
         self.openai_manager.logging = False
 
+    def activate(self, epoch=None):
+        # epoch is the barge-in epoch this activation belongs to: now, unless the turn is being passed on from an earlier one
+        self.activated_epoch = turn_canceller.epoch if epoch is None else epoch
+        self.activated = True
+
+    def pass_turn(self, epoch):
+        # Hand the conversation to another agent at random, unless we're "paused"
+        if not agents_paused:
+            random_agent: Agent = random.choice([agent for agent in self.all_agents if agent is not self])
+            random_agent.activate(epoch)
+
     def run(self):
         while True:
             # Wait until we've been activated
             if not self.activated:
                 time.sleep(0.1)
                 continue
-                
+
             self.activated = False
-            print(f"[italic purple] {self.name} has STARTED speaking.")
-            
-            # This lock isn't necessary in theory, but for safety we will require this lock whenever updating any agent's convo history
+            # Everything this turn does gets cancelled at once if the human barges in
+            with turn_canceller.new_turn(self.activated_epoch) as turn:
+                try:
+                    self.take_turn(turn)
+                except TurnCancelled:
+                    print(f"[italic red] {self.name} was interrupted.")
+                    broadcaster.emit('clear_agent', {'agent_id': self.agent_id})
+                    obswebsockets_manager.set_filter_visibility("Line In", self.filter_name, False)
+
+    def take_turn(self, turn):
+        # Activated before the last barge-in, so this turn is already out of date
+        turn.check()
+        print(f"[italic purple] {self.name} has STARTED speaking.")
+
+        # If we're over the OpenAI tokens-per-minute budget, wait here rather than while holding the lock every agent needs
+        usage_tracker.wait_for_budget(turn)
+
+        # This lock isn't necessary in theory, but for safety we will require this lock whenever updating any agent's convo history
+        with conversation_lock:
+            # How long an answer we can afford, given how much of the current speaker's line is left
+            plan = pacing_controller.plan_turn()
+            generation_start = time.perf_counter()
+            # Generate a response to the conversation
+            openai_answer = self.openai_manager.chat_with_history(f"Okay what is your response? Try to be as chaotic and bizarre and adult-humor oriented as possible. {plan['instruction']}",
+                                                                  cancel=turn, max_tokens=plan["max_tokens"], stop=plan["stop"])
+            generation_seconds = time.perf_counter() - generation_start
+            if openai_answer is None:
+                turn.check()
+                # ChatGPT failed or missed its deadline, so pass the turn on rather than stalling everyone
+                print(f"[red]{self.name} didn't get an answer from ChatGPT, skipping this turn.")
+                self.pass_turn(turn.epoch)
+                return
+            openai_answer = openai_answer.replace("*", "")
+            print(f'[magenta]Got the following response:\n{openai_answer}')
+            usage = self.openai_manager.last_usage
+            answer_tokens = usage.completion_tokens if usage and usage.completion_tokens else len(openai_answer) // 4
+
+        # Streamed ElevenLabs audio starts playing as soon as the first bytes arrive, so it's generated once it's our turn to speak.
+        # Otherwise the audio and subtitles are created now, so they're ready the instant the current speaker finishes.
+        streaming = use_streaming_tts and hasattr(speech_manager, "stream_to_audio")
+        if not streaming:
+            # Create audio response, along with the timing of each sentence for the subtitles.
+            # We already know the text, so the timings come from the speech manager rather than transcribing our own audio with Whisper.
+            # ElevenLabs closes its request part way if the turn is cancelled. The local engines can't be stopped, so they finish in the background
+            cancellable = {"cancel": turn} if hasattr(speech_manager, "stream_to_audio") else {}
+            try:
+                speech_start = time.perf_counter()
+                tts_file, audio_and_timestamps = turn.run(speech_manager.text_to_audio_with_timings, openai_answer, self.voice, False, **cancellable)
+                speech_seconds = time.perf_counter() - speech_start
+            except TurnCancelled:
+                self.discard_answer()
+                raise
+            if tts_file is None:
+                # Don't let one failed line end the whole conversation, just hand the turn to someone else
+                print(f"[red]{self.name} couldn't generate any audio, skipping this turn.")
+                self.discard_answer()
+                self.pass_turn(turn.epoch)
+                return
+        # Ready to speak (streamed audio is made while it plays, so for that only the answer has to be ready)
+        pacing_controller.turn_ready(plan, answer_tokens, generation_seconds, None if streaming else speech_seconds)
+
+        # Wait here until the current speaker is finished
+        with speaking_lock:
+            # The human barged in while we were waiting, so this answer never gets heard
+            if turn.cancelled:
+                self.discard_answer()
+                raise TurnCancelled()
+
+            # Add your new response into everyone else's chat history, then have them save their chat history
+            # This agent's responses are marked as "assistant" role to itself, so everyone elses messages are "user" role.
+            # Only done now we know it's going to be heard, and before the next agent is activated so they can reply to it.
             with conversation_lock:
-                # Generate a response to the conversation
-                openai_answer = self.openai_manager.chat_with_history("Okay what is your response? Try to be as chaotic and bizarre and adult-humor oriented as possible. Again, 3 sentences maximum.")
-                openai_answer = openai_answer.replace("*", "")
-                print(f'[magenta]Got the following response:\n{openai_answer}')
-
-                # Add your new response into everyone else's chat history, then have them save their chat history
-                # This agent's responses are marked as "assistant" role to itself, so everyone elses messages are "user" role.
                 for agent in self.all_agents:
                     if agent is not self:
                         agent.openai_manager.chat_history.append({"role": "user", "content": f"[{self.name}] {openai_answer}"})
                         agent.openai_manager.save_chat_to_backup()
 
-            # Create audio response
-            tts_file = speech_manager.text_to_audio(openai_answer, self.voice, False)
+            # Let the next speaker know how long they've got to get their answer ready
+            clip_seconds = audio_and_timestamps[-1]['end_time'] if not streaming and audio_and_timestamps else estimate_speech_seconds(openai_answer)
+            pacing_controller.clip_started(clip_seconds)
 
-            # Process the audio to get subtitles
-            whisper_mgr = load_whisper_manager()
-            audio_and_timestamps = whisper_mgr.audio_to_text(tts_file, "sentence")
+            # If we're "paused", then simply finish speaking without activating another agent
+            # Otherwise, pick another agent randomly, then activate it
+            self.pass_turn(turn.epoch)
 
-            # Wait here until the current speaker is finished
-            with speaking_lock:
+            # Activate move filter on the image
+            obswebsockets_manager.set_filter_visibility("Line In", self.filter_name, True)
 
-                # If we're "paused", then simply finish speaking without activating another agent
-                # Otherwise, pick another agent randomly, then activate it
-                if not agents_paused:
-                    other_agents = [agent for agent in self.all_agents if agent is not self]
-                    random_agent: Agent = random.choice(other_agents)
-                    random_agent.activated = True
-
-                # Activate move filter on the image
-                obswebsockets_manager.set_filter_visibility("Line In", self.filter_name, True)
-            
-                # Play the TTS audio (without pausing)
-                audio_manager.play_audio(tts_file, False, False, True)
-
-                # While the audio is playing, display each sentence on the front-end
-                # Each dictionary will look like: {'text': 'here is my speech', 'start_time': 11.58, 'end_time': 14.74}
-                socketio.emit('start_agent', {'agent_id': self.agent_id})
+            if streaming:
+                broadcaster.emit('start_agent', {'agent_id': self.agent_id})
                 try:
-                    for i in range(len(audio_and_timestamps)):
-                        current_sentence = audio_and_timestamps[i]
-                        duration = current_sentence['end_time'] - current_sentence['start_time']
-                        socketio.emit('agent_message', {'agent_id': self.agent_id, 'text': f"{current_sentence['text']}"})
-                        time.sleep(duration)
-                        # If this is not the final sentence, sleep for the gap of time inbetween this sentence and the next one starting
-                        if i < (len(audio_and_timestamps) - 1):
-                            time_between_sentences = audio_and_timestamps[i+1]['start_time'] - current_sentence['end_time']
-                            time.sleep(time_between_sentences)
-                except Exception:
-                    print(f"[magenta] Whoopsie! There was a problem and I don't know why. This was the current_sentence it broke on: {current_sentence}")
-                socketio.emit('clear_agent', {'agent_id': self.agent_id})
-            
-                time.sleep(1) # Wait one second before the next person talks, otherwise their audio gets cut off
-
-                # Turn off the filter in OBS
-                obswebsockets_manager.set_filter_visibility("Line In", self.filter_name, False)
-
-            print(f"[italic purple] {self.name} has FINISHED speaking.")        
+                    # Playback starts as soon as the pre-roll has arrived, this returns once the whole clip has downloaded
+                    tts_file, player, audio_and_timestamps = speech_manager.stream_to_audio(openai_answer, self.voice, cancel=turn)
+                    # The audio has been playing for a while already, so pick up the subtitles from where it's at
+                    self.show_subtitles(audio_and_timestamps, player.position, turn)
+                    player.wait()
+                except TurnCancelled:
+                    raise
+                except Exception as e:
+                    print(f"[red]{self.name} had a problem streaming audio: {e}")
+            else:
+                # Play the TTS audio (without pausing)
+                channel = audio_manager.play_audio(tts_file, False, False, True)
+                if channel is not None:
+                    turn.on_cancel(channel.stop)
+                broadcaster.emit('start_agent', {'agent_id': self.agent_id})
+                self.show_subtitles(audio_and_timestamps, turn=turn)
+            broadcaster.emit('clear_agent', {'agent_id': self.agent_id})
+
+            turn.sleep(1) # Wait one second before the next person talks, otherwise their audio gets cut off
+
+            # Turn off the filter in OBS
+            obswebsockets_manager.set_filter_visibility("Line In", self.filter_name, False)
+
+        print(f"[italic purple] {self.name} has FINISHED speaking.")
+
+    def discard_answer(self):
+        # Takes our latest answer back out of our own history, for when it never got spoken (nobody else has it yet)
+        with conversation_lock:
+            history = self.openai_manager.chat_history
+            for i in range(len(history) - 1, 0, -1):
+                if history[i].get("role") == "assistant":
+                    history.pop(i)
+                    self.openai_manager.save_chat_to_backup()
+                    break
+
+    def show_subtitles(self, audio_and_timestamps, elapsed=0.0, turn=None):
+        # While the audio is playing, display each sentence on the front-end
+        # Each dictionary will look like: {'text': 'here is my speech', 'start_time': 11.58, 'end_time': 14.74}
+        # elapsed is how many seconds of the audio have already played, any sentences before that point are skipped
+        # With the turn's CancelToken, this stops (with TurnCancelled) the moment the turn is cancelled
+        sleep = turn.sleep if turn else time.sleep
+        current_sentence = None
+        try:
+            for i in range(len(audio_and_timestamps)):
+                current_sentence = audio_and_timestamps[i]
+                if current_sentence['end_time'] <= elapsed:
+                    continue
+                duration = current_sentence['end_time'] - max(current_sentence['start_time'], elapsed)
+                broadcaster.emit('agent_message', {'agent_id': self.agent_id, 'text': f"{current_sentence['text']}"}, coalesce_key=self.agent_id)
+                sleep(duration)
+                # If this is not the final sentence, sleep for the gap of time inbetween this sentence and the next one starting
+                if i < (len(audio_and_timestamps) - 1):
+                    time_between_sentences = audio_and_timestamps[i+1]['start_time'] - current_sentence['end_time']
+                    sleep(time_between_sentences)
+        except TurnCancelled:
+            raise
+        except Exception:
+            print(f"[magenta] Whoopsie! There was a problem and I don't know why. This was the current_sentence it broke on: {current_sentence}")
 
 
 # Class that handles human input, this thread is how you can manually activate or pause the other agents
@@ -229,7 +437,14 @@ class Human():
 
                 # Toggles "pause" flag - stops other agents from activating additional agents
                 agents_paused = True
-                print(f"[italic red] Agents have been paused")
+                if use_barge_in:
+                    # Cut off whoever is talking, and drop every turn that's being prepared or is waiting to speak
+                    start_time = time.perf_counter()
+                    cancelled = turn_canceller.cancel_all()
+                    pacing_controller.clip_stopped()
+                    print(f"[italic red] Agents have been interrupted ({cancelled} turns cancelled in {(time.perf_counter() - start_time) * 1000:.0f}ms)")
+                else:
+                    print(f"[italic red] Agents have been paused")
 
                 if use_text_input:
                     # Text input mode
@@ -245,18 +460,41 @@ class Human():
                 else:
                     # Audio input mode (original Whisper functionality)
                     print(f"[italic green] {self.name} has STARTED speaking.")
-                    mic_audio = audio_manager.record_audio(end_recording_key='num 8')
-
-                    with conversation_lock:
-                        # Transcribe mic audio into text with Whisper
-                        whisper_mgr = load_whisper_manager()
-                        transcribed_audio = whisper_mgr.audio_to_text(mic_audio)
-                        print(f"[teal]Got the following audio from {self.name}:\n{transcribed_audio}")
-
-                        # Add user's response into all agents chat history
-                        for agent in self.all_agents:
-                            agent.openai_manager.chat_history.append({"role": "user", "content": f"[{self.name}] {transcribed_audio}"})
-                            agent.openai_manager.save_chat_to_backup()
+                    # If recording or transcribing fails, this one message is skipped. Letting the error through would end this thread,
+                    # and with it every hotkey for the rest of the show
+                    recorded = False
+                    try:
+                        if use_streaming_asr:
+                            # Partial transcripts go to the overlay while you talk, so there's only a little left to transcribe once you stop
+                            transcriber = StreamingTranscriber(transcription_service, on_partial=lambda stable, unstable: broadcaster.emit('human_partial', {'stable': stable, 'unstable': unstable}, coalesce_key='human'))
+                            audio_manager.stream_microphone(transcriber.feed, end_recording_key='num 8', samplerate=StreamingTranscriber.SAMPLE_RATE)
+                        else:
+                            mic_audio = audio_manager.record_audio(end_recording_key='num 8')
+                        # Wait for the model before taking the lock, so if it's somehow still loading the agents aren't held up waiting on it
+                        whisper_loader.get()
+                        recorded = True
+                    except Exception as e:
+                        print(f"[red]Couldn't record or transcribe what {self.name} said, skipping it: {e}")
+
+                    if recorded:
+                        with conversation_lock:
+                            # Transcribe mic audio into text with Whisper
+                            try:
+                                if use_streaming_asr:
+                                    transcribed_audio = transcriber.finish()
+                                    broadcaster.emit('human_final', {'text': transcribed_audio})
+                                else:
+                                    transcribed_audio = transcription_service.transcribe(mic_audio, priority=HUMAN_PRIORITY)
+                            except Exception as e:
+                                print(f"[red]Couldn't transcribe what {self.name} said, skipping it: {e}")
+                                transcribed_audio = None
+                            if transcribed_audio is not None:
+                                print(f"[teal]Got the following audio from {self.name}:\n{transcribed_audio}")
+
+                                # Add user's response into all agents chat history
+                                for agent in self.all_agents:
+                                    agent.openai_manager.chat_history.append({"role": "user", "content": f"[{self.name}] {transcribed_audio}"})
+                                    agent.openai_manager.save_chat_to_backup()
                 
                 print(f"[italic magenta] {self.name} has FINISHED speaking.")
 
@@ -264,7 +502,7 @@ class Human():
                 agents_paused = False
                 random_agent = random.randint(0, len(self.all_agents)-1)
                 print(f"[cyan]Activating Agent {random_agent+1}")
-                self.all_agents[random_agent].activated = True
+                self.all_agents[random_agent].activate()
 
             
             # "Pause" the other agents.
@@ -278,21 +516,21 @@ class Human():
             if keyboard.is_pressed('num 1'):
                 print("[cyan]Activating Agent 1")
                 agents_paused = False
-                self.all_agents[0].activated = True
+                self.all_agents[0].activate()
                 time.sleep(1) # Wait for a bit to ensure you don't press this twice in a row
             
             # Activate Agent 2
             if keyboard.is_pressed('num 2'):
                 print("[cyan]Activating Agent 2")
                 agents_paused = False
-                self.all_agents[1].activated = True
+                self.all_agents[1].activate()
                 time.sleep(1) # Wait for a bit to ensure you don't press this twice in a row
             
             # Activate Agent 3
             if keyboard.is_pressed('num 3'):
                 print("[cyan]Activating Agent 3")
                 agents_paused = False
-                self.all_agents[2].activated = True
+                self.all_agents[2].activate()
                 time.sleep(1) # Wait for a bit to ensure you don't press this twice in a row
             
             # Toggle between text and audio input
@@ -305,13 +543,16 @@ class Human():
             # Toggle between local and ElevenLabs speech
             if keyboard.is_pressed('f6'):
                 global use_local_speech, speech_manager
-                use_local_speech = not use_local_speech
-                if use_local_speech:
-                    speech_manager = LocalSpeechManager()
-                    print(f"[yellow]Switched to LOCAL text-to-speech")
+                try:
+                    speech_manager = get_speech_manager(not use_local_speech)
+                except Exception as e:
+                    print(f"[red]Couldn't start the {'ELEVENLABS' if use_local_speech else 'LOCAL'} speech backend, staying on the current one: {e}")
                 else:
-                    speech_manager = ElevenLabsManager()
-                    print(f"[yellow]Switched to ELEVENLABS text-to-speech")
+                    use_local_speech = not use_local_speech
+                    if use_local_speech:
+                        print(f"[yellow]Switched to LOCAL text-to-speech")
+                    else:
+                        print(f"[yellow]Switched to ELEVENLABS text-to-speech")
                 time.sleep(1) # Wait for a bit to ensure you don't press this twice in a row
             
             time.sleep(0.05)
@@ -325,29 +566,30 @@ if __name__ == '__main__':
 
     all_agents = []
 
-    # Agent 1
-    agent1 = Agent("OSWALD", 1, "Audio Move - Wario Pepper", all_agents, VIDEOGAME_AGENT_1, "OSWALD")
-    agent1_thread = threading.Thread(target=start_bot, args=(agent1,))
-    agent1_thread.start()
+    with startup_profile.step("create agents"):
+        # Agent 1
+        agent1 = Agent("OSWALD", 1, "Audio Move - Wario Pepper", all_agents, VIDEOGAME_AGENT_1, "OSWALD")
+        agent1_thread = threading.Thread(target=start_bot, args=(agent1,))
+        agent1_thread.start()
 
-    # Agent 2
-    agent2 = Agent("TONY KING", 2, "Audio Move - Waluigi Pepper", all_agents, VIDEOGAME_AGENT_2, "TONY KING")
-    agent2_thread = threading.Thread(target=start_bot, args=(agent2,))
-    agent2_thread.start()
+        # Agent 2
+        agent2 = Agent("TONY KING", 2, "Audio Move - Waluigi Pepper", all_agents, VIDEOGAME_AGENT_2, "TONY KING")
+        agent2_thread = threading.Thread(target=start_bot, args=(agent2,))
+        agent2_thread.start()
 
-    # Agent 3
-    agent3 = Agent("VICTORIA", 3, "Audio Move - Gamer Pepper", all_agents, VIDEOGAME_AGENT_3, "VICTORIA")
-    agent3_thread = threading.Thread(target=start_bot, args=(agent3,))
-    agent3_thread.start()
+        # Agent 3
+        agent3 = Agent("VICTORIA", 3, "Audio Move - Gamer Pepper", all_agents, VIDEOGAME_AGENT_3, "VICTORIA")
+        agent3_thread = threading.Thread(target=start_bot, args=(agent3,))
+        agent3_thread.start()
 
-    all_agents.append(agent1)
-    all_agents.append(agent2)
-    all_agents.append(agent3)
+        all_agents.append(agent1)
+        all_agents.append(agent2)
+        all_agents.append(agent3)
 
-    # Human thread
-    human = Human("DOUGDOUG", all_agents)
-    human_thread = threading.Thread(target=start_bot, args=(human,))
-    human_thread.start()
+        # Human thread
+        human = Human("DOUGDOUG", all_agents)
+        human_thread = threading.Thread(target=start_bot, args=(human,))
+        human_thread.start()
 
     input_mode = "TEXT INPUT" if use_text_input else "AUDIO INPUT (Whisper)"
     speech_mode = "LOCAL TTS" if use_local_speech else "ELEVENLABS TTS"
@@ -361,6 +603,17 @@ if __name__ == '__main__':
     print(f"[white]  F5 - Toggle between text/audio input modes")
     print(f"[white]  F6 - Toggle between local/ElevenLabs speech")
 
+    if startup_profile.enabled:
+        startup_profile.report()
+        # The agent threads never finish, so leave straight away. That way the profile can be run over and over to compare
+        os._exit(0)
+
+    # Now that we're ready, load the rest in the background so the first turn doesn't wait on it: the OpenAI SDK and tokenizer,
+    # and the other speech backend if warm_up_other_speech_backend is on
+    threading.Thread(target=openai_chat.prewarm, daemon=True).start()
+    if warm_up_other_speech_backend:
+        threading.Thread(target=warm_up_speech_manager, args=(not use_local_speech,), daemon=True).start()
+
     socketio.run(app)
 
     agent1_thread.join()
@@ -1,63 +1,208 @@
+import json
 import time
-from obswebsocket import obsws, requests  # noqa: E402
+import base64
+import random
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import Future
+import websocket
+from rich import print
+
+from metrics import metrics
 from websockets_auth import WEBSOCKET_HOST, WEBSOCKET_PORT, WEBSOCKET_PASSWORD
 
+# obs-websocket v5 opcodes, see https://github.com/obsproject/obs-websocket/blob/master/docs/generated/protocol.md
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_EVENT = 5
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# EventSubscription bits for the events that can make a cached sceneItemId wrong
+EVENTS_SCENES = 1 << 2
+EVENTS_INPUTS = 1 << 3
+EVENTS_SCENE_ITEMS = 1 << 7
+
+# RequestStatus code OBS answers with when a scene/source/scene item doesn't exist
+RESOURCE_NOT_FOUND = 600
+
 ##########################################################
 ##########################################################
 
+class OBSRequestError(RuntimeError):
+    """OBS answered a request with a failure status"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class _Command:
+    def __init__(self, request_type, request_data, future=None, scene_item=None):
+        self.request_type = request_type
+        self.request_data = request_data
+        # Set for blocking calls, fire-and-forget commands don't have one
+        self.future = future
+        # (scene name, source name) for requests that address a scene item, whose sceneItemId is filled in just before sending
+        self.scene_item = scene_item
+        self.retried = False
+
+
+def _merge(old, new):
+    # Later commands win, but a partial update (e.g. just scaleX of a transform) keeps the rest of the earlier one
+    merged = dict(old)
+    for key, value in new.items():
+        merged[key] = _merge(old[key], value) if isinstance(value, dict) and isinstance(old.get(key), dict) else value
+    return merged
+
+
 class OBSWebsocketsManager:
-    ws = None
-    
-    def __init__(self):
-        # Connect to websockets
-        self.ws = obsws(WEBSOCKET_HOST, WEBSOCKET_PORT, WEBSOCKET_PASSWORD)
-        self.ws.connect()
-        print("Connected to OBS Websockets!\n")
+    """
+    Talks to OBS over obs-websocket v5, entirely on background threads, so nothing on the speaking path ever waits for OBS.
+
+    The setters (set_filter_visibility, set_scene, set_text...) are fire-and-forget: they put a command on a queue and return
+    straight away. Commands for the same thing are coalesced while they wait, so a filter toggled on and off before OBS
+    got the first one only sends the final state, and a command that wouldn't change anything isn't sent at all.
+    The getters block until OBS answers (at most request_timeout seconds) and return None if it can't.
+
+    Everything that's waiting when the sender gets to it goes out as one RequestBatch, so a whole visual cue costs a single
+    round trip. Wrap the calls in `with obswebsockets_manager.batch():` to make sure they're sent together.
+    The sceneItemIds that scene item requests need are cached per scene, and forgotten when OBS says that scene's items changed.
+
+    The connection is made in the background and retried with a backoff whenever it drops. If OBS isn't running,
+    everything quietly does nothing, so the app works fine without it.
+    """
+
+    def __init__(self, host=WEBSOCKET_HOST, port=WEBSOCKET_PORT, password=WEBSOCKET_PASSWORD, request_timeout=2.0, max_backoff=30.0):
+        self.url = f"ws://{host}:{port}"
+        self.password = password
+        self.request_timeout = request_timeout
+        self.max_backoff = max_backoff
+        self.connected = False
+        self._ws = None
+        self._stopping = False
+        self._ids = itertools.count()
+        # Commands waiting to be sent, by coalescing key
+        self._commands = OrderedDict()
+        self._condition = threading.Condition()
+        # Requests sent to OBS that haven't been answered yet, by requestId
+        self._in_flight = {}
+        self._in_flight_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        # What we last sent OBS for each coalescing key (forgotten again if it failed), so commands that wouldn't change anything can be skipped.
+        # It's recorded when the command is sent rather than when OBS answers, so a command can't be compared against an older state
+        # while the one before it is still in flight.
+        self._applied = {}
+        # (scene name, source name) -> sceneItemId
+        self._scene_item_ids = {}
+        self._scene_item_ids_lock = threading.Lock()
+        # While above 0, the sender waits so everything queued meanwhile goes out in one batch
+        self._holds = 0
+        threading.Thread(target=self._connection_loop, name="obs-websockets", daemon=True).start()
+        threading.Thread(target=self._send_loop, name="obs-websockets-sender", daemon=True).start()
 
     def disconnect(self):
-        self.ws.disconnect()
+        self._stopping = True
+        with self._condition:
+            self._condition.notify_all()
+        if self._ws is not None:
+            self._ws.close()
+
+    # Anything queued inside this block is sent to OBS as a single RequestBatch when the block ends, e.g.
+    #     with obswebsockets_manager.batch():
+    #         obswebsockets_manager.set_filter_visibility("Line In", "Move Oswald", True)
+    #         obswebsockets_manager.set_source_visibility("Scene", "Oswald", True)
+    @contextmanager
+    def batch(self):
+        with self._condition:
+            self._holds += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._holds -= 1
+                self._condition.notify_all()
+
+    # Queues a request without waiting for the answer. Commands with the same coalesce_key replace each other while they wait.
+    def send(self, request_type, request_data=None, coalesce_key=None, scene_item=None):
+        if not self.connected:
+            metrics.increment("obs.dropped")
+            return
+        request_data = request_data or {}
+        if coalesce_key is None:
+            coalesce_key = ("unique", next(self._ids))
+        with self._condition:
+            pending = self._commands.get(coalesce_key)
+            if pending is not None:
+                pending.request_data = _merge(pending.request_data, request_data)
+                metrics.increment("obs.coalesced")
+            else:
+                self._commands[coalesce_key] = _Command(request_type, request_data, scene_item=scene_item)
+            metrics.set_gauge("obs.queue_length", len(self._commands))
+            self._condition.notify()
+
+    # Sends a request and waits for the answer. Returns OBS's responseData, or None if OBS isn't available or the request failed.
+    def call(self, request_type, request_data=None, scene_item=None, timeout=None):
+        if not self.connected:
+            return None
+        future = Future()
+        with self._condition:
+            self._commands[("unique", next(self._ids))] = _Command(request_type, request_data or {}, future, scene_item)
+            self._condition.notify()
+        try:
+            return future.result(timeout or self.request_timeout)
+        except Exception as e:
+            print(f"[yellow]OBS {request_type} failed: {e}")
+            return None
 
     # Set the current scene
     def set_scene(self, new_scene):
-        self.ws.call(requests.SetCurrentProgramScene(sceneName=new_scene))
+        self.send("SetCurrentProgramScene", {"sceneName": new_scene}, coalesce_key=("scene",))
 
     # Set the visibility of any source's filters
     def set_filter_visibility(self, source_name, filter_name, filter_enabled=True):
-        self.ws.call(requests.SetSourceFilterEnabled(sourceName=source_name, filterName=filter_name, filterEnabled=filter_enabled))
+        self.send("SetSourceFilterEnabled", {"sourceName": source_name, "filterName": filter_name, "filterEnabled": filter_enabled},
+                  coalesce_key=("filter", source_name, filter_name))
 
     # Set the visibility of any source
     def set_source_visibility(self, scene_name, source_name, source_visible=True):
-        response = self.ws.call(requests.GetSceneItemId(sceneName=scene_name, sourceName=source_name))
-        myItemID = response.datain['sceneItemId']
-        self.ws.call(requests.SetSceneItemEnabled(sceneName=scene_name, sceneItemId=myItemID, sceneItemEnabled=source_visible))
+        self.send("SetSceneItemEnabled", {"sceneName": scene_name, "sceneItemEnabled": source_visible},
+                  coalesce_key=("visible", scene_name, source_name), scene_item=(scene_name, source_name))
 
     # Returns the current text of a text source
     def get_text(self, source_name):
-        response = self.ws.call(requests.GetInputSettings(inputName=source_name))
-        return response.datain["inputSettings"]["text"]
+        response = self.call("GetInputSettings", {"inputName": source_name})
+        return response["inputSettings"].get("text") if response else None
 
     # Returns the text of a text source
     def set_text(self, source_name, new_text):
-        self.ws.call(requests.SetInputSettings(inputName=source_name, inputSettings = {'text': new_text}))
+        self.send("SetInputSettings", {"inputName": source_name, "inputSettings": {'text': new_text}}, coalesce_key=("settings", source_name))
 
     def get_source_transform(self, scene_name, source_name):
-        response = self.ws.call(requests.GetSceneItemId(sceneName=scene_name, sourceName=source_name))
-        myItemID = response.datain['sceneItemId']
-        response = self.ws.call(requests.GetSceneItemTransform(sceneName=scene_name, sceneItemId=myItemID))
+        response = self.call("GetSceneItemTransform", {"sceneName": scene_name}, scene_item=(scene_name, source_name))
+        if response is None:
+            return None
+        scene_item_transform = response["sceneItemTransform"]
         transform = {}
-        transform["positionX"] = response.datain["sceneItemTransform"]["positionX"]
-        transform["positionY"] = response.datain["sceneItemTransform"]["positionY"]
-        transform["scaleX"] = response.datain["sceneItemTransform"]["scaleX"]
-        transform["scaleY"] = response.datain["sceneItemTransform"]["scaleY"]
-        transform["rotation"] = response.datain["sceneItemTransform"]["rotation"]
-        transform["sourceWidth"] = response.datain["sceneItemTransform"]["sourceWidth"] # original width of the source
-        transform["sourceHeight"] = response.datain["sceneItemTransform"]["sourceHeight"] # original width of the source
-        transform["width"] = response.datain["sceneItemTransform"]["width"] # current width of the source after scaling, not including cropping. If the source has been flipped horizontally, this number will be negative.
-        transform["height"] = response.datain["sceneItemTransform"]["height"] # current height of the source after scaling, not including cropping. If the source has been flipped vertically, this number will be negative.
-        transform["cropLeft"] = response.datain["sceneItemTransform"]["cropLeft"] # the amount cropped off the *original source width*. This is NOT scaled, must multiply by scaleX to get current # of cropped pixels
-        transform["cropRight"] = response.datain["sceneItemTransform"]["cropRight"] # the amount cropped off the *original source width*. This is NOT scaled, must multiply by scaleX to get current # of cropped pixels
-        transform["cropTop"] = response.datain["sceneItemTransform"]["cropTop"] # the amount cropped off the *original source height*. This is NOT scaled, must multiply by scaleY to get current # of cropped pixels
-        transform["cropBottom"] = response.datain["sceneItemTransform"]["cropBottom"] # the amount cropped off the *original source height*. This is NOT scaled, must multiply by scaleY to get current # of cropped pixels
+        transform["positionX"] = scene_item_transform["positionX"]
+        transform["positionY"] = scene_item_transform["positionY"]
+        transform["scaleX"] = scene_item_transform["scaleX"]
+        transform["scaleY"] = scene_item_transform["scaleY"]
+        transform["rotation"] = scene_item_transform["rotation"]
+        transform["sourceWidth"] = scene_item_transform["sourceWidth"] # original width of the source
+        transform["sourceHeight"] = scene_item_transform["sourceHeight"] # original width of the source
+        transform["width"] = scene_item_transform["width"] # current width of the source after scaling, not including cropping. If the source has been flipped horizontally, this number will be negative.
+        transform["height"] = scene_item_transform["height"] # current height of the source after scaling, not including cropping. If the source has been flipped vertically, this number will be negative.
+        transform["cropLeft"] = scene_item_transform["cropLeft"] # the amount cropped off the *original source width*. This is NOT scaled, must multiply by scaleX to get current # of cropped pixels
+        transform["cropRight"] = scene_item_transform["cropRight"] # the amount cropped off the *original source width*. This is NOT scaled, must multiply by scaleX to get current # of cropped pixels
+        transform["cropTop"] = scene_item_transform["cropTop"] # the amount cropped off the *original source height*. This is NOT scaled, must multiply by scaleY to get current # of cropped pixels
+        transform["cropBottom"] = scene_item_transform["cropBottom"] # the amount cropped off the *original source height*. This is NOT scaled, must multiply by scaleY to get current # of cropped pixels
         return transform
 
     # The transform should be a dictionary containing any of the following keys with corresponding values
@@ -66,24 +211,267 @@ class OBSWebsocketsManager:
     # Note: there are other transform settings, like alignment, etc, but these feel like the main useful ones.
     # Use get_source_transform to see the full list
     def set_source_transform(self, scene_name, source_name, new_transform):
-        response = self.ws.call(requests.GetSceneItemId(sceneName=scene_name, sourceName=source_name))
-        myItemID = response.datain['sceneItemId']
-        self.ws.call(requests.SetSceneItemTransform(sceneName=scene_name, sceneItemId=myItemID, sceneItemTransform=new_transform))
+        self.send("SetSceneItemTransform", {"sceneName": scene_name, "sceneItemTransform": new_transform},
+                  coalesce_key=("transform", scene_name, source_name), scene_item=(scene_name, source_name))
 
     # Note: an input, like a text box, is a type of source. This will get *input-specific settings*, not the broader source settings like transform and scale
     # For a text source, this will return settings like its font, color, etc
     def get_input_settings(self, input_name):
-        return self.ws.call(requests.GetInputSettings(inputName=input_name))
+        return self.call("GetInputSettings", {"inputName": input_name})
 
     # Get list of all the input types
     def get_input_kind_list(self):
-        return self.ws.call(requests.GetInputKindList())
+        return self.call("GetInputKindList")
 
     # Get list of all items in a certain scene
     def get_scene_items(self, scene_name):
-        return self.ws.call(requests.GetSceneItemList(sceneName=scene_name))
-    
+        return self.call("GetSceneItemList", {"sceneName": scene_name})
+
     # Immediately ends the stream. Use with caution.
     def stop_stream(self):
-        return self.ws.call(requests.StopStream())
+        return self.call("StopStream")
+
+    def _request(self, request_type, request_data):
+        # Sends one request straight away, returns a Future for its responseData
+        request_id = str(next(self._ids))
+        future = Future()
+        future.sent_at = time.perf_counter()
+        message = {"op": OP_REQUEST, "d": {"requestType": request_type, "requestId": request_id, "requestData": request_data}}
+        self._send_message(request_id, future, message)
+        return future
+
+    def _request_batch(self, requests):
+        # Sends [(requestType, requestData), ...] as one RequestBatch, returns a Future per request.
+        # OBS runs them in order, and a failed request doesn't stop the rest.
+        request_id = str(next(self._ids))
+        futures = [Future() for _ in requests]
+        for future in futures:
+            future.sent_at = time.perf_counter()
+        message = {"op": OP_REQUEST_BATCH, "d": {
+            "requestId": request_id,
+            "haltOnFailure": False,
+            "executionType": 0, # SerialRealtime
+            "requests": [{"requestType": request_type, "requestData": request_data} for request_type, request_data in requests],
+        }}
+        self._send_message(request_id, futures, message)
+        metrics.increment("obs.batches")
+        return futures
+
+    def _send_message(self, request_id, futures, message):
+        with self._in_flight_lock:
+            self._in_flight[request_id] = futures
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps(message))
+        except Exception as e:
+            with self._in_flight_lock:
+                self._in_flight.pop(request_id, None)
+            for future in futures if isinstance(futures, list) else [futures]:
+                future.set_exception(e)
+
+    def _send_loop(self):
+        while not self._stopping:
+            with self._condition:
+                while not (self._commands and self.connected and self._holds == 0) and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                # Take everything that's waiting, it all goes out together
+                commands = list(self._commands.items())
+                self._commands.clear()
+                metrics.set_gauge("obs.queue_length", 0)
+
+            to_send = []
+            for coalesce_key, command in commands:
+                if command.future is None and not command.retried and self._applied.get(coalesce_key) == command.request_data:
+                    # OBS is already in this state
+                    metrics.increment("obs.skipped")
+                    continue
+                if command.future is None and coalesce_key[0] != "unique":
+                    self._applied[coalesce_key] = command.request_data
+                to_send.append((coalesce_key, command))
+            if not to_send:
+                continue
+
+            self._look_up_scene_item_ids([command.scene_item for _, command in to_send if command.scene_item])
+            ready = []
+            for coalesce_key, command in to_send:
+                request_data = command.request_data
+                if command.scene_item:
+                    with self._scene_item_ids_lock:
+                        scene_item_id = self._scene_item_ids.get(command.scene_item)
+                    if scene_item_id is None:
+                        self._on_response(None, coalesce_key, command, OBSRequestError(f"Couldn't find {command.scene_item[1]} in scene {command.scene_item[0]}", RESOURCE_NOT_FOUND))
+                        continue
+                    request_data = dict(request_data, sceneItemId=scene_item_id)
+                ready.append((coalesce_key, command, request_data))
+            if not ready:
+                continue
+
+            if len(ready) == 1:
+                futures = [self._request(ready[0][1].request_type, ready[0][2])]
+            else:
+                futures = self._request_batch([(command.request_type, request_data) for _, command, request_data in ready])
+            for future, (coalesce_key, command, _) in zip(futures, ready):
+                future.add_done_callback(lambda done, key=coalesce_key, command=command: self._on_response(done, key, command))
+
+    def _look_up_scene_item_ids(self, scene_items):
+        # Fetches the sceneItemIds we don't have cached yet, all in one round trip
+        with self._scene_item_ids_lock:
+            missing = list(dict.fromkeys(scene_item for scene_item in scene_items if scene_item not in self._scene_item_ids))
+        if not missing:
+            return
+        requests = [("GetSceneItemId", {"sceneName": scene_name, "sourceName": source_name}) for scene_name, source_name in missing]
+        futures = [self._request(*requests[0])] if len(requests) == 1 else self._request_batch(requests)
+        for scene_item, future in zip(missing, futures):
+            try:
+                scene_item_id = future.result(self.request_timeout)["sceneItemId"]
+            except Exception as e:
+                print(f"[yellow]Couldn't look up {scene_item[1]} in OBS scene {scene_item[0]}: {e}")
+                continue
+            with self._scene_item_ids_lock:
+                self._scene_item_ids[scene_item] = scene_item_id
+        metrics.increment("obs.scene_item_lookups", len(missing))
+
+    def _forget_scene_items(self, scene_name=None, source_name=None):
+        with self._scene_item_ids_lock:
+            for scene_item in list(self._scene_item_ids):
+                if scene_item[0] == scene_name or scene_item[1] == source_name:
+                    del self._scene_item_ids[scene_item]
+
+    def _on_response(self, future, coalesce_key, command, error=None):
+        if future is not None:
+            error = future.exception()
+        if error is not None and self._applied.get(coalesce_key) is command.request_data:
+            # We don't know what state OBS is in now
+            del self._applied[coalesce_key]
+        if isinstance(error, OBSRequestError) and error.code == RESOURCE_NOT_FOUND and command.scene_item and not command.retried:
+            # The cached sceneItemId may be stale (e.g. the item was recreated while we weren't subscribed), so look it up again once
+            with self._scene_item_ids_lock:
+                self._scene_item_ids.pop(command.scene_item, None)
+            command.retried = True
+            with self._condition:
+                if coalesce_key not in self._commands:
+                    self._commands[coalesce_key] = command
+                    self._condition.notify()
+                    return
+        if command.future is not None:
+            if error is not None:
+                command.future.set_exception(error)
+            else:
+                command.future.set_result(future.result())
+        elif error is not None:
+            print(f"[yellow]OBS {command.request_type} failed: {error}")
+
+    def _connection_loop(self):
+        backoff = 1.0
+        while not self._stopping:
+            try:
+                self._connect()
+            except Exception as e:
+                if backoff == 1.0:
+                    print(f"[yellow]Couldn't connect to OBS ({e}), will keep trying in the background")
+                # Jittered, so a restarted OBS isn't hit by everything at once
+                time.sleep(backoff * random.uniform(0.5, 1.0))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = 1.0
+            try:
+                self._receive_loop()
+            except Exception as e:
+                if not self._stopping:
+                    print(f"[yellow]Lost the connection to OBS ({e}), reconnecting")
+            self._on_disconnect()
+
+    def _connect(self):
+        ws = websocket.create_connection(self.url, timeout=self.request_timeout, subprotocols=["obswebsocket.json"])
+        try:
+            hello = json.loads(ws.recv())["d"]
+            # Only the events that tell us a cached sceneItemId might be wrong
+            identify = {"rpcVersion": 1, "eventSubscriptions": EVENTS_SCENES | EVENTS_INPUTS | EVENTS_SCENE_ITEMS}
+            authentication = hello.get("authentication")
+            if authentication:
+                secret = base64.b64encode(hashlib.sha256((self.password + authentication["salt"]).encode("utf-8")).digest()).decode("utf-8")
+                identify["authentication"] = base64.b64encode(hashlib.sha256((secret + authentication["challenge"]).encode("utf-8")).digest()).decode("utf-8")
+            ws.send(json.dumps({"op": OP_IDENTIFY, "d": identify}))
+            identified = json.loads(ws.recv())
+            if identified.get("op") != OP_IDENTIFIED:
+                raise ConnectionError(f"OBS didn't accept our identify message: {identified}")
+        except Exception:
+            ws.close()
+            raise
+        ws.settimeout(None)
+        self._ws = ws
+        # OBS may have been changed while we were away, so don't assume anything about its state
+        self._applied.clear()
+        with self._scene_item_ids_lock:
+            self._scene_item_ids.clear()
+        with self._condition:
+            self.connected = True
+            self._condition.notify_all()
+        metrics.set_gauge("obs.connected", 1)
+        metrics.increment("obs.connects")
+        print("[green]Connected to OBS Websockets!\n")
+
+    def _receive_loop(self):
+        while not self._stopping:
+            text = self._ws.recv()
+            if not text:
+                raise ConnectionError("OBS closed the connection")
+            message = json.loads(text)
+            if message["op"] == OP_REQUEST_RESPONSE:
+                with self._in_flight_lock:
+                    future = self._in_flight.pop(message["d"]["requestId"], None)
+                if future is not None:
+                    metrics.observe("obs.request", time.perf_counter() - future.sent_at)
+                    self._resolve(future, message["d"])
+            elif message["op"] == OP_REQUEST_BATCH_RESPONSE:
+                with self._in_flight_lock:
+                    futures = self._in_flight.pop(message["d"]["requestId"], None)
+                if futures is not None:
+                    metrics.observe("obs.batch", time.perf_counter() - futures[0].sent_at)
+                    results = message["d"]["results"]
+                    for future, result in zip(futures, results):
+                        self._resolve(future, result)
+                    for future in futures[len(results):]:
+                        future.set_exception(OBSRequestError("OBS didn't run this request (an earlier one in the batch failed)"))
+            elif message["op"] == OP_EVENT:
+                self._handle_event(message["d"]["eventType"], message["d"].get("eventData") or {})
+
+    def _resolve(self, future, response):
+        status = response["requestStatus"]
+        if status["result"]:
+            future.set_result(response.get("responseData") or {})
+        else:
+            future.set_exception(OBSRequestError(f"{response['requestType']} failed with code {status['code']}: {status.get('comment', '')}", status["code"]))
+
+    def _handle_event(self, event_type, event_data):
+        # Drop cached sceneItemIds for anything whose items or names changed
+        if event_type in ("SceneItemCreated", "SceneItemRemoved", "SceneItemListReindexed", "SceneRemoved"):
+            self._forget_scene_items(scene_name=event_data.get("sceneName"))
+        elif event_type == "SceneNameChanged":
+            self._forget_scene_items(scene_name=event_data.get("oldSceneName"))
+        elif event_type == "InputNameChanged":
+            self._forget_scene_items(source_name=event_data.get("oldInputName"))
+        else:
+            return
+        metrics.increment("obs.scene_item_invalidations")
 
+    def _on_disconnect(self):
+        with self._condition:
+            self.connected = False
+            # Anything still waiting would be applied to an OBS that may have changed since, so drop it
+            dropped = list(self._commands.values())
+            self._commands.clear()
+        metrics.set_gauge("obs.connected", 0)
+        if self._ws is not None:
+            self._ws.close()
+        with self._in_flight_lock:
+            in_flight = list(self._in_flight.values())
+            self._in_flight.clear()
+        for futures in in_flight:
+            for future in futures if isinstance(futures, list) else [futures]:
+                future.set_exception(ConnectionError("The connection to OBS was lost"))
+        for command in dropped:
+            if command.future is not None:
+                command.future.set_exception(ConnectionError("The connection to OBS was lost"))
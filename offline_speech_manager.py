@@ -0,0 +1,112 @@
+import os
+import io
+import time
+import zlib
+import shutil
+import threading
+import subprocess
+from pydub import AudioSegment
+from rich import print
+
+from local_speech_manager import SpeechManager
+from text_chunking import split_sentences
+
+
+class OfflineSpeechManager(SpeechManager):
+    """
+    Text-to-speech that runs entirely on this machine, no network needed.
+    Same interface as SpeechManager / ElevenLabsManager (text_to_audio, speak, stream_speech), plus stream_sentences().
+
+    Two engines are supported:
+    - piper: neural voices, much nicer sounding. pip install piper-tts, download a voice (.onnx + .onnx.json)
+      and point PIPER_MODEL at the .onnx file.
+    - espeak: robotic but tiny, and available on almost every OS (apt install espeak-ng / brew install espeak-ng).
+    By default piper is used if PIPER_MODEL is set, otherwise espeak. Override with OFFLINE_TTS_ENGINE=piper|espeak.
+
+    The model is loaded and warmed up in __init__, so create this at startup rather than on the first line of dialogue.
+    """
+
+    engine_name = "offline"
+
+    # espeak voice variants handed out to agents that don't have an entry in voice_map, so each agent sounds different
+    ESPEAK_VARIANTS = ["en-us+m3", "en-us+f3", "en-us+m7", "en-us+f4", "en-us+m1", "en-us+f2"]
+
+    def __init__(self, engine=None, model_path=None, voice_map=None, words_per_minute=190, speed: float = 1.0, **kwargs):
+        self.model_path = model_path or os.getenv("PIPER_MODEL")
+        self.engine = engine or os.getenv("OFFLINE_TTS_ENGINE") or ("piper" if self.model_path else "espeak")
+        # Agent voice name -> espeak voice (e.g. "en-us+m3") or piper speaker id
+        self.voice_map = voice_map or {}
+        self.words_per_minute = words_per_minute
+        self._piper_voice = None
+        self._espeak_binary = None
+        # Piper runs one onnx session, so only one synthesis at a time
+        self._engine_lock = threading.Lock()
+        self._load_engine()
+        super().__init__(speed=speed, **kwargs)
+        self.engine_name = f"offline-{self.engine}"
+        self._warm_up()
+
+    def _load_engine(self):
+        start_time = time.perf_counter()
+        if self.engine == "piper":
+            if not self.model_path:
+                raise ValueError("The piper engine needs a voice model. Set PIPER_MODEL to the path of a .onnx voice file.")
+            from piper.voice import PiperVoice
+            self._piper_voice = PiperVoice.load(self.model_path)
+        elif self.engine == "espeak":
+            self._espeak_binary = shutil.which("espeak-ng") or shutil.which("espeak")
+            if self._espeak_binary is None:
+                raise RuntimeError("Couldn't find espeak-ng or espeak on the PATH. Install it, or use the piper engine.")
+        else:
+            raise ValueError(f"Unknown offline TTS engine '{self.engine}'. Use 'piper' or 'espeak'.")
+        print(f"[green]Loaded offline TTS engine ({self.engine}) in {time.perf_counter() - start_time:.2f}s")
+
+    def _warm_up(self):
+        # The first synthesis pays for onnx session setup / espeak data loading, so get it out of the way now
+        start_time = time.perf_counter()
+        self._synthesize("Ready.")
+        print(f"[green]Offline TTS warm-up took {time.perf_counter() - start_time:.2f}s")
+
+    def _synthesize(self, text, voice=None):
+        """Synthesizes text with the local engine and returns the decoded AudioSegment"""
+        if self.engine == "piper":
+            raw_audio = b"".join(self._piper_stream(text, voice))
+            return self._piper_segment(raw_audio)
+        return AudioSegment.from_file(io.BytesIO(self._espeak_wav(text, voice)), format="wav")
+
+    def stream_sentences(self, text, voice=None, ext="wav"):
+        """
+        Generator that yields one BytesIO per sentence, as soon as each sentence is synthesized.
+        Playback of the first sentence can start while the rest of the text is still being generated.
+        """
+        if self.engine == "piper":
+            for raw_audio in self._piper_stream(text, voice):
+                yield self._export(self._piper_segment(raw_audio), ext)
+            return
+        for sentence in split_sentences(text):
+            yield self._export(AudioSegment.from_file(io.BytesIO(self._espeak_wav(sentence, voice)), format="wav"), ext)
+
+    def _piper_stream(self, text, voice=None):
+        speaker_id = self.voice_map.get(voice)
+        for sentence in split_sentences(text) or [text]:
+            # The lock is only held while a sentence is synthesized, never across a yield, so a slow (or abandoned)
+            # consumer of this generator can't hold up every other synthesis
+            with self._engine_lock:
+                # synthesize_stream_raw yields 16-bit mono PCM
+                raw_audio = b"".join(self._piper_voice.synthesize_stream_raw(sentence, speaker_id=speaker_id))
+            yield raw_audio
+
+    def _piper_segment(self, raw_audio):
+        return AudioSegment(data=raw_audio, sample_width=2, frame_rate=self._piper_voice.config.sample_rate, channels=1)
+
+    def _espeak_wav(self, text, voice=None):
+        espeak_voice = self.voice_map.get(voice)
+        if espeak_voice is None:
+            # crc32 rather than hash() so an agent keeps the same voice across runs
+            espeak_voice = self.ESPEAK_VARIANTS[zlib.crc32(str(voice).encode("utf-8")) % len(self.ESPEAK_VARIANTS)]
+        result = subprocess.run(
+            [self._espeak_binary, "--stdout", "-v", espeak_voice, "-s", str(self.words_per_minute), text],
+            capture_output=True,
+            check=True,
+        )
+        return result.stdout
@@ -1,29 +1,207 @@
-from openai import OpenAI
-import tiktoken
 import os
 from rich import print
 import base64
 import time
 import json
+import random
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 
+from metrics import metrics
+from usage_tracker import usage_tracker
+from model_router import model_router
+from turn_cancellation import TurnCancelled
+from pacing import trim_to_sentences
+
 # Load environment variables from .env file
 load_dotenv()
 
+
+# The OpenAI SDK takes over half a second to import, so it (and tiktoken) are only loaded when first needed,
+# or ahead of time on a background thread by prewarm() once the app is up.
+
+# One client per process (per base_url), shared by every agent, so they all reuse the same connection pool
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url=None):
+    with _clients_lock:
+        if base_url not in _clients:
+            from openai import OpenAI
+            # We do our own retries (see OpenAiManager._send_with_retries), so the client's are turned off
+            _clients[base_url] = OpenAI(api_key=os.environ['OPENAI_API_KEY'], base_url=base_url, max_retries=0)
+        return _clients[base_url]
+
+
+# Requests run here rather than on the caller's thread, so the caller can give up on one at its deadline (or hedge it)
+_request_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="openai")
+
+
+class OpenAiDeadlineExceeded(TimeoutError):
+    pass
+
+
+class _Attempt:
+    """
+    One request to OpenAI. Requests are streamed, so one that's no longer wanted (its turn was cancelled, it ran past its deadline,
+    or a hedged copy answered first) can be closed part way, which drops the connection and OpenAI stops generating the answer.
+    A request that's abandoned before OpenAI has even sent the response headers is closed as soon as they arrive.
+    """
+
+    def __init__(self):
+        self.closed = False
+        # Content chunks received so far, about one token each
+        self.received = 0
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def opened(self, stream):
+        # Returns False (having closed the stream) if the attempt was abandoned before the response started
+        with self._lock:
+            self._stream = stream
+            if not self.closed:
+                return True
+        stream.close()
+        return False
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            stream = self._stream
+        if stream is not None:
+            stream.close()
+
+
+class _AttemptAbandoned(Exception):
+    # We closed the attempt ourselves
+    pass
+
+
+class _StreamEndedEarly(ConnectionError):
+    # The connection closed before the answer was finished, without us closing it
+    pass
+
+
+class _EstimatedUsage:
+    # Stands in for completion.usage on an attempt we closed part way, which never gets a usage block from OpenAI
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+def _collect_stream(stream, attempt):
+    """Reads a streamed chat completion to the end and returns it as a ChatCompletion, like a non-streamed request would have"""
+    from openai.types.chat import ChatCompletion
+    completion = {"id": None, "created": 0, "model": None, "object": "chat.completion", "usage": None}
+    role, content, finish_reason = "assistant", [], None
+    for chunk in stream:
+        completion.update(id=chunk.id, created=chunk.created, model=chunk.model)
+        if chunk.usage is not None:
+            completion["usage"] = chunk.usage.model_dump()
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+            role = choice.delta.role or role
+            if choice.delta.content:
+                content.append(choice.delta.content)
+                attempt.received += 1
+            finish_reason = choice.finish_reason or finish_reason
+    if finish_reason is None:
+        raise _StreamEndedEarly("The answer stream ended before the answer was finished")
+    completion["choices"] = [{"index": 0, "message": {"role": role, "content": "".join(content)}, "finish_reason": finish_reason}]
+    return ChatCompletion.model_validate(completion)
+
+
+def _is_retryable(error):
+    # Timeouts, dropped connections, rate limits and OpenAI's own 5xx errors are worth another go. Bad requests, auth errors etc. aren't
+    import openai
+    if isinstance(error, (openai.APIConnectionError, _StreamEndedEarly)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return False  # Also a 429, but it won't go away by waiting
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_for_model(model):
+    """The tiktoken encoding for this model, shared by every manager. Models tiktoken doesn't know yet get o200k_base, which the gpt-4o and gpt-4.1 families all use"""
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def prewarm():
+    """Imports the SDK, creates the shared client and loads the default model's tokenizer, so the first turn doesn't have to"""
+    start_time = time.perf_counter()
+    get_client()
+    try:
+        encoder_for_model(model_router.default_model)
+    except Exception as e:
+        print(f"[yellow]Couldn't load the tokenizer for {model_router.default_model} yet: {e}")
+    metrics.observe("openai.prewarm", time.perf_counter() - start_time)
+
+
+def image_to_data_url(image_path):
+    """Reads a local image and returns it as a base64 data URL, which is how local images are sent to the vision models"""
+    with open(image_path, "rb") as image_file:
+        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
+    return f"data:image/jpeg;base64,{base64_image}"
+
+
 class OpenAiManager:
     
-    def __init__(self, system_prompt=None, chat_history_backup=None):
+    def __init__(self, system_prompt=None, chat_history_backup=None, name="default", deadline=None, max_retries=None, hedge=None, base_url=None, memory=None):
         """
         Optionally provide a chat_history_backup txt file and a system_prompt string.
         If the backup file is provided, we load the chat history from it.
         If the backup file already exists, then we don't add the system prompt into the convo history, because we assume that it already has a system prompt in it.
         Alternatively you manually add new system prompts into the chat history at any point. 
+        name is who token usage and cost get recorded under (see usage_tracker.py), e.g. the agent's name.
+
+        Every request has a deadline (seconds, OPENAI_DEADLINE_SECONDS, default 30) covering all of its attempts.
+        Timeouts, rate limits and server errors are retried up to max_retries times (OPENAI_MAX_RETRIES, default 3) with jittered exponential backoff.
+        With hedge=True (OPENAI_HEDGE=1), if a request is taking longer than this model's p95 a second identical request is sent,
+        and whichever answers first is used (the other one is closed). That costs a few extra requests, in exchange for cutting off the slow tail.
+        base_url points the client at another server, e.g. the local stand-in in benchmarks/standins.py.
+        Which model each request goes to (and when to fall back to a faster one) is up to model_router, see model_router.py.
+        chat_with_history can be given a CancelToken (see turn_cancellation.py). Cancelling it closes the request, so OpenAI stops generating the answer.
+        memory is an optional ConversationMemory (see conversation_memory.py). With one, chat_with_history only sends the recent messages
+        plus the older ones most relevant to them, rather than the whole history. OPENAI_MEMORY=1 turns it on with the default settings.
         """
 
-        self.client = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+        # The client itself is shared and created on first use (see get_client), but a missing key should still fail right away
+        if not os.getenv('OPENAI_API_KEY'):
+            raise KeyError("OPENAI_API_KEY isn't set, see the README")
+        self.base_url = base_url
+        self.name = name
+        self.deadline = deadline if deadline is not None else float(os.getenv("OPENAI_DEADLINE_SECONDS", "30"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+        self.hedge = hedge if hedge is not None else os.getenv("OPENAI_HEDGE", "0") == "1"
+        self.hedge_after = 3.0 # Seconds before hedging until we have enough latency samples to know the p95
+        self.max_backoff = 8.0
         self.logging = True # Determines whether the module should print out its results
-        self.tiktoken_encoder = None # Used to calculate the token count in messages
         self.chat_history = []
+        # The token usage OpenAI reported for the last chat_with_history answer
+        self.last_usage = None
+        if memory is None and os.getenv("OPENAI_MEMORY", "0") == "1":
+            from conversation_memory import ConversationMemory
+            memory = ConversationMemory()
+        self.memory = memory
 
         # If a backup file is provided, we will save our chat history to that file after every call
         self.chat_history_backup = chat_history_backup
@@ -37,14 +215,18 @@ class OpenAiManager:
             # If we were provided a system_prompt, add it into the chat history as the first message.
             self.chat_history.append(system_prompt)
 
+    @property
+    def client(self):
+        return get_client(self.base_url)
+
     # Write our current chat history to the txt file
     def save_chat_to_backup(self):
         if self.chat_history_backup:
             with open(self.chat_history_backup, 'w') as file:
                 json.dump(self.chat_history, file)
 
-    def num_tokens_from_messages(self, messages, model='gpt-4o'):
-        """Returns the number of tokens used by a list of messages.
+    def num_tokens_from_messages(self, messages, model=None):
+        """Returns the number of tokens used by a list of messages, with the tokenizer of model (by default, the model this agent's conversation is routed to).
         The code below is an adaptation of this text-only version: https://platform.openai.com/docs/guides/chat/managing-tokens 
 
         Note that image tokens are calculated differently from text.
@@ -61,27 +243,27 @@ class OpenAiManager:
             'content' = [{'type': 'text', 'text': 'Okay now please compare the previous image I sent you with this new image!'}, {'type': 'image_url', 'image_url': {'url': 'https://i.gyazo.com/8ec349446dbb538727e515f2b964224c.png', 'detail': 'high'}}]
         """
         try:
-            if self.tiktoken_encoder == None:
-                self.tiktoken_encoder = tiktoken.encoding_for_model(model) # We store this value so we don't have to check again every time
+            model = model or model_router.model_for(self.name, "conversation")
+            tiktoken_encoder = encoder_for_model(model)
             num_tokens = 0
             for message in messages:
                 num_tokens += 4  # every message follows <im_start>{role/name}\n{content}<im_end>\n
                 for key, value in message.items():
                     if key == 'role':
-                        num_tokens += len(self.tiktoken_encoder.encode(value))
+                        num_tokens += len(tiktoken_encoder.encode(value))
                     elif key == 'content':
                         # In the case that value is just a string, simply get its token value and move on
                         if isinstance(value, str):
-                            num_tokens += len(self.tiktoken_encoder.encode(value))
+                            num_tokens += len(tiktoken_encoder.encode(value))
                             continue
 
                         # In this case the 'content' variables value is an array of dictionaries
                         for message_data in value:
                             for content_key, content_value in message_data.items():
                                 if content_key == 'type':
-                                    num_tokens += len(self.tiktoken_encoder.encode(content_value))
+                                    num_tokens += len(tiktoken_encoder.encode(content_value))
                                 elif content_key == 'text': 
-                                    num_tokens += len(self.tiktoken_encoder.encode(content_value))
+                                    num_tokens += len(tiktoken_encoder.encode(content_value))
                                 elif content_key == "image_url":
                                     num_tokens += 1105 # Assumes the image is 1920x1080 and that detail is set to high               
             num_tokens += 2  # every reply is primed with <im_start>assistant
@@ -98,15 +280,12 @@ class OpenAiManager:
 
         # Check that the prompt is under the token context limit
         chat_question = [{"role": "user", "content": prompt}]
-        if self.num_tokens_from_messages(chat_question) > 128000:
+        if self.num_tokens_from_messages(chat_question, model_router.model_for(self.name, "question")) > 128000:
             print("The length of this chat question is too large for the GPT model")
             return
 
         print("[yellow]\nAsking ChatGPT a question...")
-        completion = self.client.chat.completions.create(
-          model="gpt-4o",
-          messages=chat_question
-        )
+        completion = self._create_completion("question", chat_question)
 
         # Process the answer
         openai_answer = completion.choices[0].message.content
@@ -124,9 +303,7 @@ class OpenAiManager:
         # If this is a local image, encode it into base64. Otherwise just use the provided URL.
         if local_image:
             try:
-                with open(image_path, "rb") as image_file:
-                    base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-                    url = f"data:image/jpeg;base64,{base64_image}"
+                url = image_to_data_url(image_path)
             except:
                 print("[red]ERROR: COULD NOT BASE64 ENCODE THE IMAGE. PANIC!!")
                 return None
@@ -134,9 +311,9 @@ class OpenAiManager:
             url = image_path # The provided image path is a URL
         if self.logging:
             print("[yellow]\nAsking ChatGPT to analyze image...")
-        completion = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        completion = self._create_completion(
+            "image",
+            [
                 {
                 "role": "user",
                 "content": [
@@ -161,7 +338,9 @@ class OpenAiManager:
 
     # Asks a question that includes the full conversation history
     # Can include a mix of text and images
-    def chat_with_history(self, prompt="", image_path="", local_image=True):
+    # Pass a CancelToken as cancel to be able to abandon the request part way (it returns None, and the prompt isn't kept)
+    # max_tokens and stop are passed on to OpenAI. An answer cut off by max_tokens is trimmed back to its last full sentence.
+    def chat_with_history(self, prompt="", image_path="", local_image=True, cancel=None, max_tokens=None, stop=None):
         
         # If we received a prompt, add it into our chat history.
         # Prompts are technically optional because the Ai can just continue the conversation from where it left off.
@@ -178,9 +357,7 @@ class OpenAiManager:
                 # If this is a local image, we encode it into base64. Otherwise just use the provided URL.
                 if local_image:
                     try:
-                        with open(image_path, "rb") as image_file:
-                            base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-                            url = f"data:image/jpeg;base64,{base64_image}"
+                        url = image_to_data_url(image_path)
                     except:
                         print("[red]ERROR: COULD NOT BASE64 ENCODE THE IMAGE. PANIC!!")
                         return None
@@ -198,30 +375,202 @@ class OpenAiManager:
             # Add the new message into our chat history
             self.chat_history.append(new_chat_message)
 
-        # Check total token limit. Remove old messages as needed
-        if self.logging:
-            print(f"[coral]Chat History has a current token length of {self.num_tokens_from_messages(self.chat_history)}")
-        while self.num_tokens_from_messages(self.chat_history) > 128000:
-            self.chat_history.pop(1) # We skip the 1st message since it's the system message
+        # Planned once, so the tokens are counted with the tokenizer of the model the request is actually going to
+        models = model_router.plan(self.name, "conversation")
+        if self.memory is not None:
+            # Only the recent messages and the relevant older ones get sent, so the full history never needs trimming
+            messages = self.memory.build_messages(self.chat_history, self.name)
+            num_tokens = self.num_tokens_from_messages(messages, models[0])
+            metrics.set_gauge(f"memory.prompt_tokens.{self.name}", num_tokens)
             if self.logging:
-                print(f"Popped a message! New token length is: {self.num_tokens_from_messages(self.chat_history)}")
+                print(f"[coral]Sending {len(messages)} of {len(self.chat_history)} messages, {num_tokens} tokens")
+        else:
+            # Check total token limit. Remove old messages as needed
+            num_tokens = self.num_tokens_from_messages(self.chat_history, models[0])
+            if self.logging:
+                print(f"[coral]Chat History has a current token length of {num_tokens}")
+            while num_tokens > 128000:
+                self.chat_history.pop(1) # We skip the 1st message since it's the system message
+                num_tokens = self.num_tokens_from_messages(self.chat_history, models[0])
+                if self.logging:
+                    print(f"Popped a message! New token length is: {num_tokens}")
+            messages = self.chat_history
 
         if self.logging:
             print("[yellow]\nAsking ChatGPT a question...")
-        completion = self.client.chat.completions.create(
-          model="gpt-4o",
-          messages=self.chat_history
-        )
+        try:
+            limits = {key: value for key, value in (("max_tokens", max_tokens), ("stop", stop)) if value}
+            completion = self._create_completion("conversation", messages, estimated_prompt_tokens=num_tokens, cancel=cancel, models=models, **limits)
+        except Exception as e:
+            if isinstance(e, TurnCancelled):
+                metrics.increment("openai.cancelled")
+            else:
+                print(f"[red]ERROR: ChatGPT didn't answer ({e.__class__.__name__}: {e})")
+            # Take the unanswered prompt back out, so asking again doesn't send it twice
+            if prompt is not None and prompt != "":
+                self.chat_history.pop()
+            return None
+
+        self.last_usage = completion.usage
+        openai_answer = completion.choices[0].message.content
+        if completion.choices[0].finish_reason == "length":
+            metrics.increment("openai.truncated")
+            openai_answer = trim_to_sentences(openai_answer)
 
         # Add this answer to our chat history
-        self.chat_history.append({"role": completion.choices[0].message.role, "content": completion.choices[0].message.content})
+        self.chat_history.append({"role": completion.choices[0].message.role, "content": openai_answer})
 
         # If a backup file was provided, write out convo history to the txt file
         self.save_chat_to_backup()
 
         # Return answer
-        openai_answer = completion.choices[0].message.content
         if self.logging:
             print(f"[green]\n{openai_answer}\n")
         return openai_answer
     
+
+    # Every request goes through here, so it's routed to the right model, the usage budgets are applied and the usage OpenAI reports gets recorded.
+    # call_type is one of model_router.CALL_TYPES. Pass model to skip the routing and use exactly that model,
+    # or models if you already have the plan from model_router.plan() (estimated_prompt_tokens should be counted for its first model).
+    def _create_completion(self, call_type, messages, estimated_prompt_tokens=None, model=None, cancel=None, models=None, **kwargs):
+        models = [model] if model else models or model_router.plan(self.name, call_type)
+        # Token counts per tokenizer, since a fallback or a budget downgrade can send the request to a model with a different one
+        estimates = {}
+        if estimated_prompt_tokens is not None:
+            try:
+                estimates[encoder_for_model(models[0]).name] = estimated_prompt_tokens
+            except Exception:
+                pass
+        # Any wait for the tokens-per-minute budget comes before the deadline starts, and ends early if the turn is cancelled
+        usage_tracker.wait_for_budget(cancel)
+        deadline = time.monotonic() + self.deadline
+        sla = model_router.sla_for(call_type)
+        with metrics.timer("openai.chat"):
+            for index, routed_model in enumerate(models):
+                is_last = index == len(models) - 1
+                remaining = deadline - time.monotonic()
+                # Only the last model gets whatever's left of the deadline, the ones before it get this call type's SLA (if it has one)
+                timeout = remaining if is_last or sla is None else min(sla, remaining)
+                request = dict(model=usage_tracker.choose_model(self.name, routed_model), messages=messages, **kwargs)
+                metrics.increment(f"openai.routed.{request['model']}")
+                estimated_prompt_tokens = self._estimate_tokens(messages, request["model"], estimates)
+                try:
+                    return self._send_with_retries(request, estimated_prompt_tokens, timeout, cancel)
+                except Exception as e:
+                    if is_last or not (isinstance(e, OpenAiDeadlineExceeded) or _is_retryable(e)):
+                        raise
+                    model_router.record_miss(self.name, call_type, routed_model)
+
+    def _estimate_tokens(self, messages, model, estimates):
+        # The prompt's size with model's tokenizer, only counted once per tokenizer. None if tiktoken can't count it
+        try:
+            encoding = encoder_for_model(model).name
+            if encoding not in estimates:
+                estimates[encoding] = self.num_tokens_from_messages(messages, model)
+            return estimates[encoding]
+        except Exception:
+            return None
+
+    def _send_with_retries(self, request, estimated_prompt_tokens, timeout, cancel=None):
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            try:
+                return self._send_hedged(request, estimated_prompt_tokens, deadline, cancel)
+            except TurnCancelled:
+                raise
+            except Exception as e:
+                remaining = deadline - time.monotonic()
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    if isinstance(e, OpenAiDeadlineExceeded):
+                        metrics.increment("openai.deadline_exceeded")
+                    raise
+                # Full jitter, so agents that failed together don't all come back at the same moment
+                delay = random.uniform(0, min(self.max_backoff, 0.5 * 2 ** attempt))
+                delay = max(delay, _retry_after(e) or 0)
+                # Also the HTTP timeout going off at the deadline (it's set to the time left), just before the wait for it did
+                if delay >= remaining:
+                    metrics.increment("openai.deadline_exceeded")
+                    raise OpenAiDeadlineExceeded(f"No time left to retry before the {timeout:.1f}s deadline: {e}") from e
+                attempt += 1
+                metrics.increment("openai.retries")
+                print(f"[yellow]OpenAI request failed ({e.__class__.__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                if cancel:
+                    cancel.sleep(delay)
+                else:
+                    time.sleep(delay)
+
+    def _send_hedged(self, request, estimated_prompt_tokens, deadline, cancel=None):
+        """Sends the request, plus a second copy if hedging is on and the first is slower than usual. Returns the first answer"""
+        attempts = {}
+        def send():
+            attempt = _Attempt()
+            attempts[_request_pool.submit(self._send_once, request, estimated_prompt_tokens, deadline, attempt)] = attempt
+        send()
+        first = next(iter(attempts))
+        # Waited on alongside the attempts, so cancelling the turn stops the wait straight away
+        cancelled = {cancel.future} if cancel else set()
+        try:
+            if self.hedge:
+                hedge_after = metrics.percentile(f"openai.attempt.{request['model']}", 95) if self._enough_samples(request["model"]) else self.hedge_after
+                done, _ = wait(list(attempts) + list(cancelled), timeout=max(0, min(hedge_after, deadline - time.monotonic())), return_when=FIRST_COMPLETED)
+                if cancelled & done:
+                    raise TurnCancelled()
+                if not done and time.monotonic() < deadline:
+                    metrics.increment("openai.hedges")
+                    send()
+
+            pending = set(attempts)
+            error = None
+            while pending:
+                done, pending = wait(pending | cancelled, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if cancelled & done:
+                    raise TurnCancelled()
+                pending -= cancelled
+                if not done:
+                    break
+                for future in done:
+                    if future.exception() is None:
+                        if future is not first:
+                            metrics.increment("openai.hedge_wins")
+                        return future.result()
+                    error = future.exception()
+            if error is not None and not pending:
+                raise error
+            raise OpenAiDeadlineExceeded(f"No answer from {request['model']} before its deadline")
+        finally:
+            # Whatever is still running isn't wanted any more (cancelled, out of time, or the other copy won), so stop it generating
+            for future, attempt in attempts.items():
+                if not future.done():
+                    attempt.close()
+
+    def _send_once(self, request, estimated_prompt_tokens, deadline, attempt):
+        import openai
+        start_time = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(timeout=max(0.1, deadline - time.monotonic()), stream=True,
+                                                         stream_options={"include_usage": True}, **request)
+            if not attempt.opened(stream):
+                raise _AttemptAbandoned()
+            with stream:
+                completion = _collect_stream(stream, attempt)
+        except openai.APIStatusError as e:
+            metrics.increment(f"openai.errors.{e.status_code}")
+            raise
+        except Exception as e:
+            if attempt.closed:
+                # We closed it ourselves. OpenAI still bills the prompt and whatever it generated up to then, so count our estimate of that
+                metrics.increment("openai.abandoned")
+                usage_tracker.record(self.name, request["model"], _EstimatedUsage(estimated_prompt_tokens or 0, attempt.received), estimated_prompt_tokens)
+                raise _AttemptAbandoned() from e
+            if isinstance(e, (openai.APIConnectionError, _StreamEndedEarly)):
+                metrics.increment("openai.errors.connection")
+            raise
+        metrics.observe(f"openai.attempt.{request['model']}", time.perf_counter() - start_time)
+        # Recorded for every attempt that gets an answer, including a hedge that finished just after the winner, since those are paid for too
+        usage_tracker.record(self.name, completion.model or request["model"], completion.usage, estimated_prompt_tokens)
+        return completion
+
+    @staticmethod
+    def _enough_samples(model, minimum=20):
+        return len(metrics.timings.get(f"openai.attempt.{model}", ())) >= minimum
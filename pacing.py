@@ -0,0 +1,174 @@
+import re
+import time
+import threading
+from collections import deque
+
+from metrics import metrics
+
+# Stops an answer from running on into a second paragraph, or into a line for another character ("\n[VICTORIA] ...")
+STOP_SEQUENCES = ["\n\n", "\n["]
+
+# Roughly how fast the voices talk, for guessing how long a line will play before its audio exists
+WORDS_PER_SECOND = 2.7
+
+END_OF_SENTENCE = re.compile(r"[.!?][\"')\]]*$")
+
+
+def estimate_speech_seconds(text):
+    return len(text.split()) / WORDS_PER_SECOND
+
+
+def trim_to_sentences(text):
+    """Drops an unfinished sentence from the end of text (e.g. one cut off by max_tokens), as long as there's a finished one before it"""
+    text = text.rstrip()
+    if END_OF_SENTENCE.search(text):
+        return text
+    cut = max(text.rfind(". "), text.rfind("! "), text.rfind("? "))
+    return text[:cut + 1] if cut > 0 else text
+
+
+class _LatencyModel:
+    """
+    seconds = base + per_token * tokens, fitted by least squares over the recent turns (each older turn counts a bit less).
+    The starting guesses are mixed in as a couple of made-up turns that never fade, so a run of same-length answers can't make the fit blow up.
+    """
+
+    def __init__(self, base, per_token, decay=0.9, prior_weight=2.0):
+        self.decay = decay
+        # Weighted sums for the regression: count, x, x^2, y, x*y
+        self._prior = [0.0] * 5
+        for tokens in (20, 100):
+            self._add(self._prior, tokens, base + per_token * tokens, prior_weight / 2)
+        self._sums = [0.0] * 5
+
+    @staticmethod
+    def _add(sums, tokens, seconds, weight=1.0):
+        for i, value in enumerate((1, tokens, tokens * tokens, seconds, tokens * seconds)):
+            sums[i] += weight * value
+
+    def add(self, tokens, seconds):
+        self._sums = [value * self.decay for value in self._sums]
+        self._add(self._sums, tokens, seconds)
+
+    def coefficients(self):
+        count, x, xx, y, xy = (prior + data for prior, data in zip(self._prior, self._sums))
+        per_token = max(1e-4, (count * xy - x * y) / (count * xx - x * x))
+        base = max(0.0, (y - per_token * x) / count)
+        return base, per_token
+
+
+class PacingController:
+    """
+    Keeps the next agent's answer short enough that it's written and voiced before the current speaker finishes, so there's no dead air.
+
+    When an agent starts talking it calls clip_started(), so we know when playback will end. The next agent calls plan_turn()
+    before asking ChatGPT. That compares the time left with how long an answer takes to generate and synthesize (learned from
+    the last few turns), and picks how many sentences to ask for (up to target_sentences), the max_tokens cap and stop sequences.
+    Once the answer's audio is ready, turn_ready() records the slack: how long before the current clip ends it was ready
+    (negative means the audience sat through that much silence). Slack over time is in the metrics (pacing.*) and snapshot().
+
+    With adaptive=False every turn asks for target_sentences as before, but the slack is still measured.
+    """
+
+    def __init__(self, target_sentences=3, min_sentences=1, tokens_per_sentence=28, safety=0.8, idle_budget=4.0, gap=1.0, adaptive=True, history_size=200):
+        self.target_sentences = target_sentences
+        self.min_sentences = min_sentences
+        self.tokens_per_sentence = tokens_per_sentence
+        # Only plan on using this fraction of the time left, to leave room for a slower than usual request
+        self.safety = safety
+        # Nothing is playing (start of the show, or just after the human spoke), so everyone is already waiting: aim for this many seconds
+        self.idle_budget = idle_budget
+        # The pause between speakers (the sleep after each clip in multi_agent_gpt.py)
+        self.gap = gap
+        self.adaptive = adaptive
+        self.generation = _LatencyModel(base=0.8, per_token=0.02)
+        self.speech = _LatencyModel(base=0.4, per_token=0.01)
+        self.playback_ends_at = 0.0
+        # Budget minus predicted time for the last planned turn, None before the first
+        self.predicted_slack = None
+        self.history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    def clip_started(self, seconds):
+        with self._lock:
+            self.playback_ends_at = time.monotonic() + seconds + self.gap
+
+    def clip_stopped(self):
+        # Cut off early (e.g. by a barge-in), so nothing is playing any more
+        with self._lock:
+            self.playback_ends_at = 0.0
+
+    def plan_turn(self):
+        """How long the next answer should be. A dict with sentences, instruction, max_tokens and stop, plus what it was based on"""
+        now = time.monotonic()
+        with self._lock:
+            playback_ends_at = self.playback_ends_at
+            generation_base, generation_per_token = self.generation.coefficients()
+            speech_base, speech_per_token = self.speech.coefficients()
+        idle = playback_ends_at <= now
+        budget = self.idle_budget if idle else playback_ends_at - now
+        sentences = self.target_sentences
+        if self.adaptive:
+            affordable_tokens = (budget * self.safety - generation_base - speech_base) / (generation_per_token + speech_per_token)
+            sentences = max(self.min_sentences, min(self.target_sentences, int(affordable_tokens // self.tokens_per_sentence)))
+        tokens = sentences * self.tokens_per_sentence
+        predicted = generation_base + speech_base + tokens * (generation_per_token + speech_per_token)
+        with self._lock:
+            self.predicted_slack = budget - predicted
+        metrics.set_gauge("pacing.budget", budget)
+        metrics.set_gauge("pacing.predicted_slack", budget - predicted)
+        metrics.increment(f"pacing.sentences.{sentences}")
+        return {
+            "sentences": sentences,
+            "instruction": f"Again, {sentences} sentence{'' if sentences == 1 else 's'} maximum.",
+            # Headroom over the target, since the instruction is what shapes the answer. This only stops one that runs away
+            "max_tokens": int(tokens * 1.5) if self.adaptive else None,
+            "stop": STOP_SEQUENCES if self.adaptive else None,
+            "planned_at": now,
+            # When nothing was playing, the silence started when this turn did
+            "playback_ends_at": now if idle else playback_ends_at,
+            "predicted_seconds": predicted,
+        }
+
+    def is_behind(self):
+        """True when the last planned turn isn't predicted to be ready in time, even at the length it was given (see ModelRouter.is_behind)"""
+        with self._lock:
+            return self.predicted_slack is not None and self.predicted_slack < 0
+
+    def turn_ready(self, plan, tokens, generation_seconds, speech_seconds=None):
+        """Call once the answer's audio is ready to play. speech_seconds is None when it's streamed instead"""
+        ready_at = time.monotonic()
+        slack = plan["playback_ends_at"] - ready_at
+        with self._lock:
+            self.generation.add(tokens, generation_seconds)
+            if speech_seconds is not None:
+                self.speech.add(tokens, speech_seconds)
+            self.history.append({
+                "time": time.time(),
+                "slack": round(slack, 3),
+                "sentences": plan["sentences"],
+                "tokens": tokens,
+                "predicted_seconds": round(plan["predicted_seconds"], 3),
+                "actual_seconds": round(ready_at - plan["planned_at"], 3),
+            })
+        metrics.observe("pacing.slack", slack)
+        metrics.set_gauge("pacing.slack", slack)
+        if slack < 0:
+            metrics.increment("pacing.dead_air_turns")
+            metrics.observe("pacing.dead_air", -slack)
+        return slack
+
+    def snapshot(self):
+        with self._lock:
+            generation_base, generation_per_token = self.generation.coefficients()
+            speech_base, speech_per_token = self.speech.coefficients()
+            return {
+                "adaptive": self.adaptive,
+                "generation": {"base_seconds": generation_base, "seconds_per_token": generation_per_token},
+                "speech": {"base_seconds": speech_base, "seconds_per_token": speech_per_token},
+                "recent_turns": list(self.history),
+            }
+
+
+# Process-wide instance, import this rather than making your own
+pacing_controller = PacingController()
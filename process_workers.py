@@ -0,0 +1,402 @@
+import io
+import os
+import sys
+import json
+import time
+import queue
+import pickle
+import itertools
+import threading
+import traceback
+import subprocess
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+from rich import print
+
+from metrics import metrics
+
+# Runs Whisper or a speech manager in its own Python process, so torch/ffmpeg/pydub work never holds the main process's GIL
+# (which is what makes subtitles and keyboard handling stutter while Whisper is busy).
+#
+# The main process talks to each worker with small pickled messages over the worker's stdin/stdout.
+# Audio never goes through those pipes: numpy arrays, bytes and BytesIO buffers are copied into a shared memory block
+# and only the block's name is sent. Whoever created a block keeps it open until the other side says it's done with it.
+#
+# Workers are started with "python -m process_workers" rather than multiprocessing.Process, because spawning a
+# multiprocessing child re-runs the top level of multi_agent_gpt.py (which would start another web server, OBS connection etc).
+
+
+class WorkerError(RuntimeError):
+    """A call failed inside the worker process, or the worker died while handling it"""
+
+
+def _create_block(size):
+    return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+
+def _attach_block(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, attaching also registers the block with this process's resource tracker,
+        # which would delete it when we exit even though the other process created it
+        block = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+class _SharedBlocks:
+    """The shared memory blocks this process has created, grouped by the request they belong to"""
+
+    def __init__(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def pack(self, request_id, value):
+        """Copies any audio in value into shared memory, and returns value with the audio swapped for block descriptors"""
+        if isinstance(value, np.ndarray):
+            array = np.ascontiguousarray(value)
+            block = self._new_block(request_id, array.nbytes)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            return {"__shm__": block.name, "kind": "array", "dtype": array.dtype.str, "shape": array.shape}
+        if isinstance(value, (bytes, bytearray)) or hasattr(value, "getvalue"):
+            data = value.getvalue() if hasattr(value, "getvalue") else bytes(value)
+            block = self._new_block(request_id, len(data))
+            block.buf[:len(data)] = data
+            descriptor = {"__shm__": block.name, "kind": "bytes", "size": len(data)}
+            if hasattr(value, "getvalue"):
+                descriptor["kind"] = "file"
+                descriptor["name"] = getattr(value, "name", None)
+            return descriptor
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.pack(request_id, item) for item in value)
+        if isinstance(value, dict):
+            return {key: self.pack(request_id, item) for key, item in value.items()}
+        return value
+
+    def release(self, request_id):
+        with self._lock:
+            blocks = self._blocks.pop(request_id, [])
+        for block in blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    def release_all(self):
+        with self._lock:
+            request_ids = list(self._blocks)
+        for request_id in request_ids:
+            self.release(request_id)
+
+    def _new_block(self, request_id, size):
+        block = _create_block(size)
+        with self._lock:
+            self._blocks.setdefault(request_id, []).append(block)
+        return block
+
+
+def _unpack(value):
+    """Turns block descriptors back into arrays/bytes/BytesIO, copied out of shared memory"""
+    if isinstance(value, dict) and "__shm__" in value:
+        block = _attach_block(value["__shm__"])
+        try:
+            if value["kind"] == "array":
+                return np.ndarray(value["shape"], dtype=np.dtype(value["dtype"]), buffer=block.buf).copy()
+            data = bytes(block.buf[:value["size"]])
+        finally:
+            block.close()
+        if value["kind"] == "file":
+            buffer = io.BytesIO(data)
+            if value.get("name"):
+                buffer.name = value["name"]
+            return buffer
+        return data
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unpack(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _unpack(item) for key, item in value.items()}
+    return value
+
+
+class WorkerProcess:
+    """
+    Runs a handler object (see ROLES at the bottom) in a separate process, and lets you call its methods from this one.
+    A supervisor thread restarts the worker with a backoff if it crashes. Calls that were in flight when it died fail
+    with a WorkerError, new calls wait for the replacement to be ready.
+    If the worker dies before it ever got ready (e.g. a missing model), it isn't restarted and every call raises instead.
+
+    Note that metrics recorded inside the worker stay in the worker, only the timings of the calls show up on /metrics.
+    """
+
+    def __init__(self, role, options=None, name=None, threads=1, max_backoff=30.0):
+        self.role = role
+        self.options = options or {}
+        self.name = name or f"{role}-worker"
+        # How many calls the worker handles at once
+        self.threads = threads
+        self.max_backoff = max_backoff
+        self.restarts = 0
+        self.error = None
+        self.info = {}
+        self._process = None
+        self._ids = itertools.count()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._blocks = _SharedBlocks()
+        self._ready = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._supervise, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def wait_ready(self, timeout=None):
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError(f"The {self.name} process isn't ready yet")
+        if self.error is not None:
+            raise WorkerError(f"The {self.name} process couldn't start: {self.error}")
+        return self
+
+    def submit(self, method, *args, **kwargs):
+        """Calls handler.method(*args, **kwargs) in the worker. Returns a Future."""
+        self.wait_ready()
+        request_id = next(self._ids)
+        future = Future()
+        future.submitted_at = time.perf_counter()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            payload = (method, self._blocks.pack(request_id, args), self._blocks.pack(request_id, kwargs))
+            self._send(("call", request_id, payload))
+        except Exception as e:
+            self._finish(request_id, error=WorkerError(f"Couldn't send {method} to the {self.name} process: {e}"))
+        return future
+
+    def call(self, method, *args, timeout=None, **kwargs):
+        return self.submit(method, *args, **kwargs).result(timeout)
+
+    def stop(self):
+        self._stopping = True
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def _send(self, message):
+        with self._send_lock:
+            pickle.dump(message, self._process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+            self._process.stdin.flush()
+
+    def _finish(self, request_id, result=None, error=None):
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+        # The worker has read everything we sent it for this request by now
+        self._blocks.release(request_id)
+        if future is None:
+            return
+        metrics.observe(f"workers.{self.name}.call", time.perf_counter() - future.submitted_at)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _supervise(self):
+        backoff = 1.0
+        while not self._stopping:
+            started_at = time.perf_counter()
+            self._process = None
+            try:
+                self._process = subprocess.Popen(
+                    [sys.executable, "-m", "process_workers", self.role, json.dumps(self.options), str(self.threads)],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    cwd=os.path.dirname(os.path.abspath(__file__)),
+                )
+                self._serve()
+            except Exception as e:
+                print(f"[red]The {self.name} process had a problem: {e}")
+                if self._process is None:
+                    self.error = f"{type(e).__name__}: {e}"
+            self._ready.clear()
+            metrics.set_gauge(f"workers.{self.name}.alive", 0)
+            exit_code = None
+            if self._process is not None:
+                if self._process.poll() is None:
+                    self._process.kill()
+                exit_code = self._process.wait()
+            with self._pending_lock:
+                request_ids = list(self._pending)
+            for request_id in request_ids:
+                self._finish(request_id, error=WorkerError(f"The {self.name} process exited while handling this request"))
+            if self._stopping:
+                break
+            if not self.info or self._process is None:
+                # It never got as far as loading, so restarting it would just fail again
+                self.error = self.error or f"exited with code {exit_code}"
+                print(f"[red]The {self.name} process couldn't start ({self.error}), not restarting it.")
+                self._ready.set()
+                return
+
+            # Don't hammer a worker that keeps crashing, but one that ran fine for a while gets restarted straight away
+            if time.perf_counter() - started_at > 60:
+                backoff = 1.0
+            self.restarts += 1
+            metrics.increment(f"workers.{self.name}.restarts")
+            print(f"[yellow]The {self.name} process exited (code {exit_code}), restarting it in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _serve(self):
+        # Reads messages from the worker until it exits
+        while True:
+            try:
+                kind, request_id, payload = pickle.load(self._process.stdout)
+            except EOFError:
+                return
+            if kind == "ready":
+                self.info = payload
+                metrics.set_gauge(f"workers.{self.name}.alive", 1)
+                print(f"[green]The {self.name} process is ready (pid {self._process.pid})")
+                self._ready.set()
+            elif kind == "failed":
+                self.error = payload
+            elif kind == "result":
+                try:
+                    result = _unpack(payload)
+                except Exception as e:
+                    self._finish(request_id, error=WorkerError(f"Couldn't read the result from the {self.name} process: {e}"))
+                else:
+                    self._finish(request_id, result=result)
+                # Tell the worker it can free the result's shared memory
+                self._send(("release", request_id, None))
+            elif kind == "error":
+                self._finish(request_id, error=WorkerError(payload))
+
+
+class WhisperWorker(WorkerProcess):
+    """
+    A WhisperManager running in its own process. Has the same audio_to_text / audio_to_text_batch / warm_up methods,
+    so it can be handed to the WhisperLoader (manager_factory=WhisperWorker) and TranscriptionService unchanged.
+    Creating one blocks until the model has loaded in the worker.
+    """
+
+    def __init__(self, **options):
+        super().__init__("whisper", options)
+        self.wait_ready()
+
+    def warm_up(self, seconds=1.0):
+        return self.call("warm_up", seconds)
+
+    def audio_to_text(self, audio_file, timestamps=None):
+        return self.call("audio_to_text", audio_file, timestamps)
+
+    def audio_to_text_batch(self, audio_files, timestamps=None, batch_size=None):
+        return self.call("audio_to_text_batch", audio_files, timestamps, batch_size=batch_size)
+
+
+class SpeechWorker(WorkerProcess):
+    """
+    A speech manager ("offline", "gtts" or "elevenlabs") running in its own process, for generating audio off the main process.
+    Audio comes back as the same named BytesIO (or file path, if archiving is on) the speech managers return.
+    Playback still happens in the main process, so speak()/stream_speech()/stream_to_audio() aren't available here.
+    """
+
+    def __init__(self, backend="offline", threads=2, **options):
+        super().__init__("speech", dict(options, backend=backend), name=f"{backend}-speech-worker", threads=threads)
+        self.wait_ready()
+        self.engine_name = self.info.get("engine_name", backend)
+
+    def text_to_audio(self, *args, **kwargs):
+        return self.call("text_to_audio", *args, **kwargs)
+
+    def text_to_audio_with_timings(self, *args, **kwargs):
+        return self.call("text_to_audio_with_timings", *args, **kwargs)
+
+
+def _make_whisper(**options):
+    from whisper_openai import WhisperManager
+    return WhisperManager(**options)
+
+
+def _make_speech_manager(backend="offline", **options):
+    if backend == "elevenlabs":
+        from eleven_labs import ElevenLabsManager
+        return ElevenLabsManager(**options)
+    if backend == "offline":
+        from offline_speech_manager import OfflineSpeechManager
+        return OfflineSpeechManager(**options)
+    from local_speech_manager import LocalSpeechManager
+    return LocalSpeechManager(**options)
+
+
+ROLES = {
+    "whisper": _make_whisper,
+    "speech": _make_speech_manager,
+}
+
+
+def _worker_main(role, options, threads):
+    # Our real stdout is the channel back to the main process, so point everything else that prints at stderr
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    channel_in = sys.stdin.buffer
+    send_lock = threading.Lock()
+    blocks = _SharedBlocks()
+
+    def send(message):
+        with send_lock:
+            pickle.dump(message, channel_out, protocol=pickle.HIGHEST_PROTOCOL)
+            channel_out.flush()
+
+    try:
+        handler = ROLES[role](**options)
+    except Exception as e:
+        traceback.print_exc()
+        send(("failed", None, f"{type(e).__name__}: {e}"))
+        return 1
+    send(("ready", None, {"pid": os.getpid(), "engine_name": getattr(handler, "engine_name", role)}))
+
+    calls = queue.Queue()
+
+    def handle_calls():
+        while True:
+            request_id, (method, args, kwargs) = calls.get()
+            try:
+                result = getattr(handler, method)(*_unpack(args), **_unpack(kwargs))
+                send(("result", request_id, blocks.pack(request_id, result)))
+            except Exception as e:
+                traceback.print_exc()
+                blocks.release(request_id)
+                send(("error", request_id, f"{type(e).__name__}: {e}"))
+
+    for _ in range(threads):
+        threading.Thread(target=handle_calls, daemon=True).start()
+
+    # Runs until the main process closes our stdin (i.e. it exited)
+    while True:
+        try:
+            kind, request_id, payload = pickle.load(channel_in)
+        except EOFError:
+            break
+        if kind == "call":
+            calls.put((request_id, payload))
+        elif kind == "release":
+            blocks.release(request_id)
+    blocks.release_all()
+    return 0
+
+
+if __name__ == '__main__':
+    # python -m process_workers <role> <options as json> <threads>
+    exit_code = _worker_main(sys.argv[1], json.loads(sys.argv[2]), int(sys.argv[3]))
+    sys.stdout.flush()
+    os._exit(exit_code)
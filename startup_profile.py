@@ -0,0 +1,67 @@
+import sys
+import time
+import builtins
+import threading
+from contextlib import contextmanager
+from rich import print
+
+
+class StartupProfile:
+    """
+    Times how long the app takes to get ready, step by step. Wrap each part of startup in step():
+        with startup_profile.step("load speech manager"): ...
+    Run with --profile-startup to also time every package the first time it's imported (on any thread),
+    print the report once the app is ready, and exit, so startup changes are easy to compare.
+    Times are measured from when this module was imported, which multi_agent_gpt.py does first.
+    """
+
+    def __init__(self, enabled=None):
+        self.started_at = time.perf_counter()
+        self.enabled = "--profile-startup" in sys.argv if enabled is None else enabled
+        self.steps = []
+        self.imports = {}
+        self._local = threading.local()
+        self._original_import = None
+        if self.enabled:
+            self._install_import_timer()
+
+    @contextmanager
+    def step(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, start_time - self.started_at, time.perf_counter() - start_time))
+
+    def _install_import_timer(self):
+        self._original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            package = name.partition(".")[0]
+            # Only the outermost new import on each thread is timed, so a package's time includes everything it pulls in
+            if level != 0 or package in sys.modules or getattr(self._local, "importing", False):
+                return self._original_import(name, globals, locals, fromlist, level)
+            self._local.importing = True
+            start_time = time.perf_counter()
+            try:
+                return self._original_import(name, globals, locals, fromlist, level)
+            finally:
+                self._local.importing = False
+                self.imports[package] = self.imports.get(package, 0) + time.perf_counter() - start_time
+
+        builtins.__import__ = timed_import
+
+    def report(self, top_imports=15):
+        total = time.perf_counter() - self.started_at
+        print(f"[bold cyan]Startup profile: ready {total:.2f}s after startup began")
+        for name, started, seconds in self.steps:
+            print(f"[white]  {started:6.2f}s  {seconds * 1000:8.1f}ms  {name}")
+        if self.imports:
+            print(f"[bold cyan]Slowest imports (first import, including everything they import):")
+            for package, seconds in sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:top_imports]:
+                print(f"[white]  {seconds * 1000:8.1f}ms  {package}")
+        return total
+
+
+# Process-wide instance, import this rather than making your own
+startup_profile = StartupProfile()
@@ -5,6 +5,11 @@ $(document).ready(function() {
 
     var socket = io();
 
+    // Follow one conversation's events, e.g. index.html?room=main
+    socket.on('connect', function() {
+        socket.emit('join', { room: new URLSearchParams(window.location.search).get('room') || 'main' });
+    });
+
     socket.on('start_agent', function(msg, cb) {
         console.log("Got data: " + msg)
 
@@ -54,6 +59,48 @@ $(document).ready(function() {
             cb();
     });
 
+    // Live transcript of the human while they're still talking. Stable words won't change, unstable ones might
+    socket.on('human_partial', function (msg, cb) {
+        $('#human-text-stable').text(msg.stable);
+        $('#human-text-unstable').text(msg.unstable ? " " + msg.unstable : "");
+        $('#human-container').stop(true).css({ opacity: 1 });
+
+        if (cb)
+            cb();
+    });
+
+    // Final transcript, shown for a moment before fading out
+    socket.on('human_final', function (msg, cb) {
+        $('#human-text-stable').text(msg.text);
+        $('#human-text-unstable').text("");
+        $('#human-container').stop(true).css({ opacity: 1 }).delay(3000).animate({ opacity: 0 }, 500);
+
+        if (cb)
+            cb();
+    });
+
+    // Shows whether the Whisper model (used to transcribe the human's mic) has finished loading yet
+    socket.on('whisper_status', function (msg, cb) {
+        const labels = {
+            "not_started": "Speech recognition: waiting to load",
+            "loading": "Speech recognition: loading model...",
+            "warming_up": "Speech recognition: warming up...",
+            "ready": "Speech recognition: ready",
+            "failed": "Speech recognition: failed to load"
+        };
+        let $status = $('#whisper-status');
+        $status.text(labels[msg.state] || msg.state);
+        $status.removeClass('loading failed');
+        if (msg.state === "failed") {
+            $status.addClass('failed');
+        } else if (msg.state !== "ready") {
+            $status.addClass('loading');
+        }
+
+        if (cb)
+            cb();
+    });
+
     socket.on('clear_agent', function (msg, cb) {
         console.log("Client received clear message instruction!")
 
@@ -0,0 +1,112 @@
+import re
+import threading
+import numpy as np
+from rich import print
+
+from transcription_service import HUMAN_PRIORITY
+
+
+def _normalize_word(word):
+    return re.sub(r"[^a-z0-9']", "", word.lower())
+
+
+class StreamingTranscriber:
+    """
+    Transcribes mic audio while it's still being recorded, instead of waiting for a finished file.
+
+    feed() it audio frames as they arrive. Every `interval` seconds a background thread re-decodes the audio that
+    hasn't been committed yet (a sliding window), and compares the result with the previous decode:
+    the words both decodes agree on are treated as stable, the rest may still change.
+    on_partial(stable_text, unstable_text) is called after every decode, e.g. to show it on the overlay.
+    Once the window gets longer than max_window seconds, its stable words are committed and the window slides forward,
+    so each decode stays short no matter how long the human talks.
+
+    finish() only has to decode the last few seconds that weren't committed yet, so the final transcript is ready
+    a fraction of a second after the human stops talking.
+    """
+
+    SAMPLE_RATE = 16000
+
+    def __init__(self, transcription_service, on_partial=None, interval=0.5, min_new_audio=0.25, max_window=8.0, sample_rate=16000):
+        self.transcription_service = transcription_service
+        self.on_partial = on_partial
+        self.interval = interval
+        self.min_new_audio = min_new_audio
+        self.max_window = max_window
+        self.sample_rate = sample_rate
+        self.committed_words = []
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._offset = 0 # samples before this have been committed
+        self._previous_words = []
+        self._audio_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="streaming-asr", daemon=True)
+        self._thread.start()
+
+    def feed(self, frames):
+        """Adds audio. frames is a float32 numpy array, mono or (frames, channels)"""
+        frames = np.asarray(frames, dtype=np.float32)
+        if frames.ndim > 1:
+            frames = frames.mean(axis=1)
+        if self.sample_rate != self.SAMPLE_RATE:
+            # Whisper wants 16kHz. Linear interpolation is plenty for speech recognition
+            target_length = int(len(frames) * self.SAMPLE_RATE / self.sample_rate)
+            frames = np.interp(np.linspace(0, len(frames), target_length, endpoint=False), np.arange(len(frames)), frames).astype(np.float32)
+        with self._audio_lock:
+            self._audio = np.concatenate([self._audio, frames])
+
+    def finish(self):
+        """Call once the human has stopped talking. Returns the final transcript."""
+        self._stop.set()
+        self._thread.join()
+        with self._audio_lock:
+            end = len(self._audio)
+        self._decode(end, final=True)
+        return " ".join(self.committed_words)
+
+    def _run(self):
+        decoded_up_to = 0
+        while not self._stop.wait(self.interval):
+            with self._audio_lock:
+                end = len(self._audio)
+            if end - decoded_up_to < self.min_new_audio * self.SAMPLE_RATE:
+                continue
+            decoded_up_to = end
+            try:
+                self._decode(end, final=False)
+            except Exception as e:
+                print(f"[red]Streaming transcription failed: {e}")
+
+    def _decode(self, end, final):
+        with self._audio_lock:
+            window = self._audio[self._offset:end].copy()
+        words = []
+        if len(window) >= 0.1 * self.SAMPLE_RATE:
+            chunks = self.transcription_service.transcribe({"raw": window, "sampling_rate": self.SAMPLE_RATE}, "word", HUMAN_PRIORITY)
+            words = [(chunk["text"].strip(), chunk["end_time"]) for chunk in chunks if chunk["text"].strip()]
+
+        if final:
+            self.committed_words.extend(word for word, _ in words)
+            return
+
+        # Local agreement: the words at the start of this decode that match the previous decode are stable
+        stable_count = 0
+        for (word, _), (previous_word, _) in zip(words, self._previous_words):
+            if _normalize_word(word) != _normalize_word(previous_word):
+                break
+            stable_count += 1
+        self._previous_words = words
+
+        # Slide the window forward once it gets long, so every re-decode stays quick
+        if len(window) / self.SAMPLE_RATE > self.max_window and stable_count > 0 and words[stable_count - 1][1] is not None:
+            self.committed_words.extend(word for word, _ in words[:stable_count])
+            self._offset += int(words[stable_count - 1][1] * self.SAMPLE_RATE)
+            words = words[stable_count:]
+            stable_count = 0
+            # The remaining words' timestamps are relative to the old window, so start the agreement over
+            self._previous_words = []
+
+        if self.on_partial:
+            stable_text = " ".join(self.committed_words + [word for word, _ in words[:stable_count]])
+            unstable_text = " ".join(word for word, _ in words[stable_count:])
+            self.on_partial(stable_text, unstable_text)
@@ -0,0 +1,115 @@
+import os
+from pydub import AudioSegment
+from pydub.silence import detect_silence
+
+from text_chunking import split_sentences
+
+# Subtitle timings for text we already know, so we never have to run Whisper over our own TTS output.
+# Everything here returns the same format WhisperManager.audio_to_text(..., "sentence") does:
+#     [{'text': 'here is my speech', 'start_time': 11.58, 'end_time': 14.74}, ...]
+
+
+def timings_from_durations(texts, durations):
+    """Back-to-back clips (e.g. one per sentence) -> timings, using each clip's duration in seconds"""
+    timings = []
+    current_time = 0.0
+    for text, duration in zip(texts, durations):
+        timings.append({"text": text, "start_time": current_time, "end_time": current_time + duration})
+        current_time += duration
+    return timings
+
+
+def timings_from_character_alignment(text, characters, start_times, end_times):
+    """
+    Uses per-character timestamps (like ElevenLabs' convert_with_timestamps alignment) to time each sentence of text.
+    characters/start_times/end_times are parallel lists, one entry per character of the synthesized text.
+    """
+    aligned_text = "".join(characters)
+    timings = []
+    cursor = 0
+    for sentence in split_sentences(text):
+        position = aligned_text.find(sentence, cursor)
+        if position == -1:
+            # The service normalized something in this sentence, so just assume it lines up with where we are
+            position = min(cursor, len(aligned_text) - 1)
+        last_character = min(position + len(sentence), len(aligned_text)) - 1
+        timings.append({"text": sentence, "start_time": start_times[position], "end_time": end_times[last_character]})
+        cursor = last_character + 1
+    return timings
+
+
+def estimate_timings(text, audio, snap_window=0.6):
+    """
+    A lightweight forced alignment of known text against its audio, no speech recognition needed.
+    Each sentence gets a share of the clip proportional to its length (plus a little extra for the pause after it),
+    then each sentence boundary is snapped to the nearest pause in the audio within snap_window seconds.
+    audio can be an AudioSegment, a file path, or an in-memory file object.
+    """
+    audio = load_audio(audio)
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    total_duration = len(audio) / 1000
+
+    # Rough guess from sentence length. The constant stands in for the pause after each sentence
+    weights = [len(sentence) + 8 for sentence in sentences]
+    boundaries = [0.0]
+    for weight in weights:
+        boundaries.append(boundaries[-1] + total_duration * weight / sum(weights))
+
+    # Pauses in the speech, as (start, end) in seconds
+    silence_threshold = audio.dBFS - 16 if audio.dBFS != float("-inf") else -50
+    pauses = [(start / 1000, end / 1000) for start, end in detect_silence(audio, min_silence_len=120, silence_thresh=silence_threshold)]
+
+    starts = [0.0] * len(sentences)
+    ends = [total_duration] * len(sentences)
+    if pauses and pauses[0][0] == 0:
+        starts[0] = pauses[0][1]
+    if pauses and abs(pauses[-1][1] - total_duration) < 0.01:
+        ends[-1] = pauses[-1][0]
+    for i in range(1, len(sentences)):
+        guess = boundaries[i]
+        nearby = [pause for pause in pauses if abs((pause[0] + pause[1]) / 2 - guess) <= snap_window and pause[0] > starts[i - 1]]
+        if nearby:
+            pause_start, pause_end = min(nearby, key=lambda pause: abs((pause[0] + pause[1]) / 2 - guess))
+            ends[i - 1], starts[i] = pause_start, pause_end
+        else:
+            ends[i - 1] = starts[i] = max(guess, starts[i - 1])
+
+    return [{"text": sentence, "start_time": start, "end_time": max(start, end)} for sentence, start, end in zip(sentences, starts, ends)]
+
+
+def _timestamp(seconds, separator):
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def format_srt(timings):
+    """Timings (same format as above) -> the text of an .srt subtitle file"""
+    blocks = []
+    for index, timing in enumerate(timings, 1):
+        blocks.append(f"{index}\n{_timestamp(timing['start_time'], ',')} --> {_timestamp(timing['end_time'], ',')}\n{timing['text'].strip()}\n")
+    return "\n".join(blocks)
+
+
+def format_vtt(timings):
+    """Timings (same format as above) -> the text of a WebVTT (.vtt) subtitle file"""
+    blocks = ["WEBVTT\n"]
+    for timing in timings:
+        blocks.append(f"{_timestamp(timing['start_time'], '.')} --> {_timestamp(timing['end_time'], '.')}\n{timing['text'].strip()}\n")
+    return "\n".join(blocks)
+
+
+def load_audio(audio):
+    if isinstance(audio, AudioSegment):
+        return audio
+    if hasattr(audio, "read"):
+        audio.seek(0)
+        _, ext = os.path.splitext(getattr(audio, "name", "tts.mp3"))
+        segment = AudioSegment.from_file(audio, format=ext[1:])
+        audio.seek(0)
+        return segment
+    return AudioSegment.from_file(audio)
@@ -0,0 +1,41 @@
+# Broadcaster's queue: coalesced events replace the waiting one without jumping ahead of anything emitted after it
+
+import time
+import threading
+
+from broadcaster import Broadcaster
+
+
+class _RecordingSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def start_background_task(self, target):
+        threading.Thread(target=target, daemon=True).start()
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data))
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_coalesced_event_goes_after_events_emitted_before_it():
+    socketio = _RecordingSocketIO()
+    broadcaster = Broadcaster(socketio)
+    # The broadcaster is a turn behind: last turn's line is still queued when that agent is cleared and starts its next line
+    broadcaster.emit("agent_message", {"agent_id": 1, "text": "Old line."}, coalesce_key=1)
+    broadcaster.emit("clear_agent", {"agent_id": 1})
+    broadcaster.emit("start_agent", {"agent_id": 1})
+    broadcaster.emit("agent_message", {"agent_id": 1, "text": "New line."}, coalesce_key=1)
+    broadcaster.start()
+    assert wait_until(lambda: len(socketio.emitted) == 3)
+    assert socketio.emitted == [
+        ("clear_agent", {"agent_id": 1}),
+        ("start_agent", {"agent_id": 1}),
+        ("agent_message", {"agent_id": 1, "text": "New line."}),
+    ]
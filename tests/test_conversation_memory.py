@@ -0,0 +1,39 @@
+from conversation_memory import ConversationMemory, HashingEmbedder
+
+
+def weather_history(final_line):
+    # B has been trading weather small talk with A for a while, and A once mentioned a toaster
+    history = [{"role": "system", "content": "You are B"}]
+    for n in range(30):
+        if n == 3:
+            history.append({"role": "user", "content": "[A] the haunted toaster burned my bagel"})
+        history.append({"role": "user", "content": f"[A] how about the weather {n}?"})
+        history.append({"role": "assistant", "content": f"sure the weather {n}"})
+    history.append({"role": "user", "content": final_line})
+    return history
+
+
+def recalled(messages):
+    memories = [message["content"] for message in messages[1:] if message["role"] == "system"]
+    return memories[0].splitlines()[1:] if memories else []
+
+
+def test_recalls_what_the_other_speaker_asks_about():
+    memory = ConversationMemory(HashingEmbedder(), recent_messages=12, top_k=4)
+    messages = memory.build_messages(weather_history("[A] remember that toaster bagel thing?"), "B")
+    assert "[A] the haunted toaster burned my bagel" in recalled(messages)
+    assert not any("weather" in line for line in recalled(messages))
+
+
+def test_own_answer_is_not_the_query():
+    memory = ConversationMemory(HashingEmbedder(), recent_messages=12, top_k=4)
+    memory.add_lines(["[B] sure the weather 0", "[A] the haunted toaster burned my bagel"])
+    assert memory.recall(["[B] sure the weather 29", "[A] remember that toaster bagel thing?"], speaker_name="B") == ["[A] the haunted toaster burned my bagel"]
+
+
+def test_recent_window_and_system_prompt_are_kept():
+    memory = ConversationMemory(HashingEmbedder(), recent_messages=12, top_k=4)
+    history = weather_history("[A] remember that toaster bagel thing?")
+    messages = memory.build_messages(history, "B")
+    assert messages[0] == history[0]
+    assert messages[-12:] == history[-12:]
@@ -0,0 +1,83 @@
+# ElevenLabsManager's streaming paths against the local ElevenLabs stand-in
+
+import time
+import wave
+import threading
+import pytest
+
+from turn_cancellation import CancelToken, TurnCancelled
+from benchmarks.standins import ElevenLabsStandIn, install_elevenlabs_sdk_standin
+
+# The SDK isn't needed to run these: without it, a minimal stand-in for it still sends every request to ElevenLabsStandIn
+install_elevenlabs_sdk_standin()
+
+TEXT = "Hello there. This is the second sentence. And here is a third one to finish."
+
+
+@pytest.fixture
+def standin(monkeypatch, tmp_path):
+    # The voice catalog is cached in the working directory
+    monkeypatch.chdir(tmp_path)
+    with ElevenLabsStandIn(first_byte_delay=0.0, chunk_delay=0.0, seconds_per_character=0.01) as standin:
+        yield standin
+
+
+def make_manager(standin, **kwargs):
+    from eleven_labs import ElevenLabsManager
+    return ElevenLabsManager(base_url=standin.url, cache=False, archive_dir="", **kwargs)
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.02)
+    return condition()
+
+
+def duration(buffer):
+    buffer.seek(0)
+    with wave.open(buffer, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+def test_streamed_clip_is_complete(standin):
+    audio, player, timings = make_manager(standin).stream_to_audio(TEXT, "OSWALD", autoplay=False)
+    assert player is None
+    assert duration(audio) == pytest.approx(len(TEXT) * standin.seconds_per_character, abs=0.01)
+    assert [timing["text"] for timing in timings][0].startswith("Hello there.")
+
+
+def test_parallel_chunks_give_a_timing_per_chunk(standin):
+    manager = make_manager(standin, parallel_chunks=True, max_concurrent_requests=3)
+    requests_before = standin.request_count
+    audio, _, timings = manager.stream_to_audio(TEXT, "OSWALD", autoplay=False)
+    assert standin.request_count - requests_before == len(timings)
+    assert timings[-1]["end_time"] == pytest.approx(duration(audio), abs=0.01)
+
+
+def test_cancellable_timings_still_come_from_the_alignment(standin):
+    cancel = CancelToken(0)
+    audio, timings = make_manager(standin).text_to_audio_with_timings(TEXT, "OSWALD", False, cancel=cancel)
+    assert standin.paths[-1].endswith("/with-timestamps/stream")
+    # save_as_wave=False is kept: the audio is returned as it arrived rather than converted to a wav
+    assert audio.name.endswith(".mp3")
+    assert audio.getvalue() == standin.make_pcm(TEXT)
+    # Each sentence starts and ends exactly on its characters' alignment
+    seconds = standin.seconds_per_character
+    assert [(timing["text"], timing["start_time"], timing["end_time"]) for timing in timings] == [
+        ("Hello there.", 0.0, pytest.approx(12 * seconds)),
+        ("This is the second sentence.", pytest.approx(13 * seconds), pytest.approx(41 * seconds)),
+        ("And here is a third one to finish.", pytest.approx(42 * seconds), pytest.approx(76 * seconds)),
+    ]
+
+
+def test_cancelling_stops_the_download(standin):
+    standin.chunk_delay = 0.2
+    cancel = CancelToken(0)
+    threading.Timer(0.2, cancel.cancel).start()
+    start_time = time.monotonic()
+    with pytest.raises(TurnCancelled):
+        make_manager(standin).text_to_audio_with_timings(TEXT, "OSWALD", False, cancel=cancel)
+    assert time.monotonic() - start_time < 1.0
+    # The request was closed part way, rather than left to finish
+    assert wait_until(lambda: standin.streams_closed == 1)
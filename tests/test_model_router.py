@@ -0,0 +1,38 @@
+# ModelRouter's fallback when the show is running late, driven by PacingController's predicted slack
+
+import pytest
+
+from model_router import ModelRouter
+from pacing import PacingController
+
+
+@pytest.fixture
+def pacing():
+    return PacingController()
+
+
+@pytest.fixture
+def router(pacing):
+    router = ModelRouter(default_model="routed-model", fallback_model="fallback-model")
+    router.is_behind = pacing.is_behind
+    return router
+
+
+def test_turn_with_time_to_spare_uses_the_routed_model(router, pacing):
+    # Nothing playing yet (the first turn, or just after a barge-in) isn't the same as running late
+    pacing.plan_turn()
+    assert router.plan("OSWALD", "conversation") == ["routed-model", "fallback-model"]
+
+
+def test_late_turn_uses_the_fallback_model(router, pacing):
+    # The current speaker finishes before even the shortest answer could be ready
+    pacing.clip_started(0.1 - pacing.gap)
+    pacing.plan_turn()
+    assert router.plan("OSWALD", "conversation") == ["fallback-model"]
+
+
+def test_only_conversation_turns_fall_back_when_late(router, pacing):
+    pacing.clip_started(0.1 - pacing.gap)
+    pacing.plan_turn()
+    assert router.plan("OSWALD", "image") == ["routed-model", "fallback-model"]
+    assert router.plan("OSWALD", "question") == ["routed-model", "fallback-model"]
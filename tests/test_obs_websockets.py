@@ -0,0 +1,82 @@
+# OBSWebsocketsManager against the local OBS stand-in: commands end up in the state they asked for, batched and through reconnects
+
+import time
+import pytest
+
+from obs_websockets import OBSWebsocketsManager
+from metrics import metrics
+from benchmarks.standins import OBSStandIn
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def standin():
+    with OBSStandIn(password="standin", request_latency=0.02) as standin:
+        yield standin
+
+
+@pytest.fixture
+def manager(standin):
+    manager = OBSWebsocketsManager(host="127.0.0.1", port=standin.port, password="standin", max_backoff=0.5)
+    assert wait_until(lambda: manager.connected)
+    yield manager
+    manager.disconnect()
+
+
+def filter_enabled(standin):
+    return standin.filters.get(("Line In", "Move Oswald"))
+
+
+def test_quick_on_then_off_ends_off(standin, manager):
+    for _ in range(5):
+        manager.set_filter_visibility("Line In", "Move Oswald", True)
+        # The OFF comes while the ON is still waiting on OBS
+        time.sleep(0.005)
+        manager.set_filter_visibility("Line In", "Move Oswald", False)
+        assert wait_until(lambda: filter_enabled(standin) is False)
+        time.sleep(0.1)
+        assert filter_enabled(standin) is False
+
+
+def test_repeated_state_is_skipped_but_changes_are_sent(standin, manager):
+    manager.set_filter_visibility("Line In", "Move Oswald", True)
+    assert wait_until(lambda: filter_enabled(standin) is True)
+    sent = len(standin.requests)
+    manager.set_filter_visibility("Line In", "Move Oswald", True)
+    manager.set_filter_visibility("Line In", "Move Oswald", False)
+    assert wait_until(lambda: filter_enabled(standin) is False)
+    assert len(standin.requests) == sent + 1
+
+
+def test_batched_cue_is_one_round_trip(standin, manager):
+    # Look the scene item up first, so the cue itself doesn't need a GetSceneItemId
+    manager.set_source_visibility("Scene", "OSWALD", True)
+    assert wait_until(lambda: any(request_type == "SetSceneItemEnabled" for request_type, _ in standin.requests))
+    time.sleep(0.1)
+    round_trips = standin.message_count
+    with manager.batch():
+        manager.set_filter_visibility("Line In", "Move Oswald", True)
+        manager.set_source_visibility("Scene", "OSWALD", False)
+        manager.set_text("Subtitles", "Hello there")
+    assert wait_until(lambda: standin.input_settings.get("Subtitles", {}).get("text") == "Hello there")
+    assert filter_enabled(standin) is True
+    assert standin.scene_items["Scene"]["OSWALD"]["sceneItemEnabled"] is False
+    assert standin.message_count == round_trips + 1
+
+
+def test_commands_after_a_reconnect_are_applied(standin, manager):
+    manager.set_filter_visibility("Line In", "Move Oswald", True)
+    assert wait_until(lambda: filter_enabled(standin) is True)
+    connects = metrics.counters["obs.connects"]
+    standin.drop_connections()
+    assert wait_until(lambda: metrics.counters["obs.connects"] > connects and manager.connected)
+    # What OBS was last told is forgotten on reconnect, so the same state is sent again rather than skipped
+    standin.filters.clear()
+    manager.set_filter_visibility("Line In", "Move Oswald", True)
+    assert wait_until(lambda: filter_enabled(standin) is True)
@@ -0,0 +1,131 @@
+# OpenAiManager's deadlines, retries, hedging and cancellation, against the local OpenAI stand-in
+
+import time
+import threading
+import pytest
+
+import openai_chat
+from openai_chat import OpenAiManager, OpenAiDeadlineExceeded
+from turn_cancellation import CancelToken
+from metrics import metrics
+from benchmarks.standins import OpenAIStandIn
+
+MESSAGES = [{"role": "user", "content": "What's the weather like?"}]
+
+
+class _CharacterEncoder:
+    # tiktoken downloads its encodings on first use, so the tests count characters instead
+    name = "characters"
+
+    def encode(self, text):
+        return list(text)
+
+
+@pytest.fixture(autouse=True)
+def offline_tokenizer(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "standin")
+    monkeypatch.setattr(openai_chat, "encoder_for_model", lambda model: _CharacterEncoder())
+
+
+@pytest.fixture
+def standin():
+    with OpenAIStandIn(request_latency=0.02) as standin:
+        yield standin
+
+
+def make_manager(standin, **kwargs):
+    manager = OpenAiManager(name="test", base_url=standin.url + "/v1", **kwargs)
+    manager.logging = False
+    return manager
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_answer_is_assembled_from_the_stream(standin):
+    completion = make_manager(standin)._create_completion("question", MESSAGES, model="standin-model")
+    assert completion.choices[0].message.content == "Stand-in reply. Nobody ever asks the skeleton how it feels."
+    assert completion.choices[0].finish_reason == "stop"
+    assert completion.usage.completion_tokens > 0
+    assert standin.requests[0]["stream"] is True
+
+
+def test_server_errors_are_retried(standin):
+    standin.failures.extend([500, 503])
+    completion = make_manager(standin, max_retries=3)._create_completion("question", MESSAGES, model="standin-model")
+    assert completion.choices[0].message.content
+    assert standin.request_count == 3
+
+
+def test_rate_limits_wait_for_retry_after(standin):
+    standin.failures.append(429)
+    standin.retry_after = 0.3
+    start_time = time.monotonic()
+    make_manager(standin, max_retries=3)._create_completion("question", MESSAGES, model="standin-model")
+    assert time.monotonic() - start_time >= 0.3
+    assert standin.request_count == 2
+
+
+def test_bad_requests_are_not_retried(standin):
+    import openai
+    standin.failures.append(400)
+    with pytest.raises(openai.BadRequestError):
+        make_manager(standin, max_retries=3)._create_completion("question", MESSAGES, model="standin-model")
+    assert standin.request_count == 1
+
+
+def test_gives_up_at_the_deadline(standin):
+    standin.request_latency = 1.0
+    start_time = time.monotonic()
+    with pytest.raises(OpenAiDeadlineExceeded):
+        make_manager(standin, deadline=0.3)._create_completion("question", MESSAGES, model="standin-model")
+    assert time.monotonic() - start_time < 0.8
+    # The abandoned request is closed rather than left generating
+    assert wait_until(lambda: standin.streams_closed == 1)
+
+
+def test_hedged_copy_wins_and_the_slow_one_is_closed(standin):
+    standin.request_latency = 1.0
+    manager = make_manager(standin, hedge=True)
+    manager.hedge_after = 0.1
+    # Only the first request is slow: the hedge arrives after the stand-in has sped up
+    threading.Timer(0.05, setattr, (standin, "request_latency", 0.02)).start()
+    hedge_wins = metrics.counters["openai.hedge_wins"]
+    start_time = time.monotonic()
+    completion = manager._create_completion("question", MESSAGES, model="standin-hedge-model")
+    assert completion.choices[0].message.content
+    assert time.monotonic() - start_time < 0.8
+    assert metrics.counters["openai.hedge_wins"] == hedge_wins + 1
+    assert wait_until(lambda: standin.streams_closed == 1)
+
+
+def test_cancelling_the_turn_closes_the_request(standin):
+    standin.token_delay = 0.2
+    manager = make_manager(standin)
+    cancel = CancelToken(0)
+    threading.Timer(0.3, cancel.cancel).start()
+    start_time = time.monotonic()
+    assert manager.chat_with_history("Say something", cancel=cancel) is None
+    assert time.monotonic() - start_time < 1.0
+    # The unanswered prompt isn't left in the history
+    assert manager.chat_history == []
+    assert wait_until(lambda: standin.streams_closed == 1)
+    assert standin.streams_completed == 0
+
+
+def test_timeout_just_after_the_deadline_is_a_deadline_miss(standin, monkeypatch):
+    import openai
+    import httpx
+
+    def times_out_late(self, request, estimated_prompt_tokens, deadline, cancel=None):
+        # The HTTP timeout is set to the time left, so it can go off a moment after the deadline has passed
+        time.sleep(max(0, deadline - time.monotonic()) + 0.01)
+        raise openai.APITimeoutError(request=httpx.Request("POST", standin.url))
+
+    monkeypatch.setattr(OpenAiManager, "_send_hedged", times_out_late)
+    with pytest.raises(OpenAiDeadlineExceeded):
+        make_manager(standin, deadline=0.1)._create_completion("question", MESSAGES, model="standin-model")
@@ -0,0 +1,35 @@
+# TTSCache's index staying consistent with what's on disk, across evictions and other processes' writes
+
+import os
+
+from tts_cache import TTSCache
+
+
+def test_entry_evicted_while_being_read_is_not_kept(monkeypatch, tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=150)
+    cache.put("aa-first", b"x" * 100)
+    # Only on disk now, so get() has to read the file
+    cache._memory.clear()
+
+    utime = os.utime
+
+    def utime_then_evict(path, *args, **kwargs):
+        utime(path, *args, **kwargs)
+        # Another thread's put() evicts the entry just after this one has read it
+        monkeypatch.undo()
+        cache.put("bb-second", b"y" * 100)
+
+    monkeypatch.setattr(os, "utime", utime_then_evict)
+    assert cache.get("aa-first") == b"x" * 100
+    assert "aa-first" not in cache._memory
+    assert cache.get("aa-first") is None
+    assert cache.get("bb-second") == b"y" * 100
+
+
+def test_entry_written_by_another_process_is_a_hit(tmp_path):
+    cache = TTSCache(tmp_path)
+    # A second instance stands in for another process sharing the directory, each with its own index
+    TTSCache(tmp_path).put("cc-other", b"z" * 10)
+    assert cache.get("cc-other") == b"z" * 10
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 10
@@ -0,0 +1,37 @@
+import re
+
+# A sentence is a run of text up to and including its . ! or ? (plus any closing quotes/brackets)
+SENTENCE_REGEX = re.compile(r"[^.!?]+(?:[.!?]+[\"')\]]*|$)")
+
+
+def split_sentences(text):
+    """
+    Splits text into sentences, keeping the punctuation on each one.
+    "Hi there. How are you?" -> ["Hi there.", "How are you?"]
+    """
+    sentences = []
+    for match in SENTENCE_REGEX.finditer(text):
+        sentence = match.group(0).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+def group_sentences(sentences, min_chars=40):
+    """
+    Merges very short sentences into the one after them, so "Wow! Okay." doesn't turn into two separate TTS requests.
+    Every group is at least min_chars long, apart from possibly the last one.
+    """
+    groups = []
+    current = ""
+    for sentence in sentences:
+        current = f"{current} {sentence}".strip()
+        if len(current) >= min_chars:
+            groups.append(current)
+            current = ""
+    if current:
+        if groups and len(current) < min_chars:
+            groups[-1] = f"{groups[-1]} {current}"
+        else:
+            groups.append(current)
+    return groups
@@ -0,0 +1,111 @@
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from rich import print
+
+from metrics import metrics
+
+# Lower numbers go first
+HUMAN_PRIORITY = 0
+SUBTITLE_PRIORITY = 10
+
+
+class _TranscriptionRequest:
+    def __init__(self, audio, timestamps, priority):
+        self.audio = audio
+        self.timestamps = timestamps
+        self.priority = priority
+        self.submitted_at = time.perf_counter()
+        self.future = Future()
+
+
+class TranscriptionService:
+    """
+    Owns the Whisper pipeline and runs every transcription on one worker thread.
+    Requests that arrive within batch_window seconds of each other are coalesced into a single batched forward pass,
+    so several threads transcribing at once cost about as much as one. Requests are served by priority,
+    so the human's mic (HUMAN_PRIORITY) always jumps ahead of background work like subtitle alignment (SUBTITLE_PRIORITY).
+
+    whisper_source is either a WhisperManager or a WhisperLoader (in which case we wait for it to be ready on the worker thread).
+    """
+
+    def __init__(self, whisper_source, batch_window=0.03, max_batch_size=8):
+        self.whisper_source = whisper_source
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="transcription-service", daemon=True)
+        self._thread.start()
+
+    def submit(self, audio, timestamps=None, priority=SUBTITLE_PRIORITY):
+        """Queues audio for transcription and returns a Future with the same result WhisperManager.audio_to_text would give"""
+        request = _TranscriptionRequest(audio, timestamps, priority)
+        with self._condition:
+            # The sequence number keeps requests with the same priority first-come first-served
+            heapq.heappush(self._queue, (priority, next(self._sequence), request))
+            self._condition.notify()
+        metrics.set_gauge("transcription.queue_length", len(self._queue))
+        return request.future
+
+    def transcribe(self, audio, timestamps=None, priority=HUMAN_PRIORITY, timeout=None):
+        """Blocking version of submit()"""
+        return self.submit(audio, timestamps, priority).result(timeout)
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            # Give anyone else who's about to ask a moment to join this batch. A human request doesn't wait though.
+            if self._queue[0][0] > HUMAN_PRIORITY:
+                deadline = time.perf_counter() + self.batch_window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or self._queue[0][0] == HUMAN_PRIORITY:
+                        break
+                    self._condition.wait(remaining)
+
+            # Everything in a batch needs the same timestamp mode, so take the most urgent request and anything compatible with it
+            _, _, first = heapq.heappop(self._queue)
+            batch = [first]
+            leftovers = []
+            while self._queue and len(batch) < self.max_batch_size:
+                entry = heapq.heappop(self._queue)
+                if entry[2].timestamps == first.timestamps:
+                    batch.append(entry[2])
+                else:
+                    leftovers.append(entry)
+            for entry in leftovers:
+                heapq.heappush(self._queue, entry)
+            metrics.set_gauge("transcription.queue_length", len(self._queue))
+            return batch
+
+    def _get_manager(self):
+        # A WhisperLoader hands out the manager once it has finished loading
+        if hasattr(self.whisper_source, "get"):
+            return self.whisper_source.get()
+        return self.whisper_source
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            start_time = time.perf_counter()
+            for request in batch:
+                metrics.observe("transcription.queue_wait", start_time - request.submitted_at)
+            try:
+                # A lone request keeps the pipeline's own batch size, which still batches the chunks of a long clip
+                batch_size = len(batch) if len(batch) > 1 else None
+                results = self._get_manager().audio_to_text_batch([request.audio for request in batch], batch[0].timestamps, batch_size=batch_size)
+            except Exception as e:
+                print(f"[red]Transcription failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            metrics.observe("transcription.batch", time.perf_counter() - start_time)
+            metrics.increment("transcription.requests", len(batch))
+            metrics.increment("transcription.batches")
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
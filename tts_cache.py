@@ -0,0 +1,189 @@
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from rich import print
+
+from metrics import metrics
+
+
+class TTSCache:
+    """
+    Content-addressed cache of synthesized audio, shared by the speech managers.
+    Entries are keyed on (engine, voice, model_id, speed, format, text) and stored on disk as cache_dir/ab/abcdef...
+    The disk cache is capped at max_bytes and evicts the least recently used entries first.
+    The most recent entries are also kept in memory, so repeated catchphrases come back without touching the disk.
+
+    Override the location and size with TTS_CACHE_DIR and TTS_CACHE_MAX_MB.
+    Each instance keeps its own index of the directory and caps that at max_bytes, so use get_tts_cache() rather than making your own.
+    Separate processes (e.g. the speech worker processes) can't share one, so each enforces the cap on what it has written or read:
+    the directory can grow to about max_bytes per process until the next start, when the index is rebuilt from what's on disk.
+    Entries written by another process are still found on disk.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None, memory_items=64):
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("TTS_CACHE_DIR", ".tts_cache"))
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv("TTS_CACHE_MAX_MB", "500")) * 1024 * 1024)
+        self.memory_items = memory_items
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # digest -> size in bytes, ordered from least to most recently used
+        self._index = OrderedDict()
+        self._total_bytes = 0
+        # digest -> audio bytes, a small in-memory tier on top of the disk cache
+        self._memory = OrderedDict()
+        self._load_index()
+
+    @staticmethod
+    def make_key(engine, voice, model_id, speed, text, audio_format):
+        key_data = json.dumps([engine, voice, model_id, round(float(speed), 3), audio_format, text], ensure_ascii=False)
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached audio bytes, or None on a miss"""
+        start_time = time.perf_counter()
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._index.move_to_end(key)
+            indexed = key in self._index
+        # Not in our index can still be on disk, written by another process sharing the directory
+        if data is None:
+            try:
+                with open(self._path(key), "rb") as file:
+                    data = file.read()
+                # Bump the mtime so the LRU order survives a restart
+                os.utime(self._path(key))
+            except OSError:
+                with self._lock:
+                    self._forget(key)
+                    self.misses += 1
+                metrics.increment("tts_cache.misses")
+                return None
+            with self._lock:
+                if key in self._index:
+                    self._index.move_to_end(key)
+                    self._remember(key, data)
+                elif not indexed:
+                    # From another process, so from now on it counts towards our size cap too
+                    self._index[key] = len(data)
+                    self._total_bytes += len(data)
+                    self._remember(key, data)
+                # Otherwise a put() evicted it while we were reading, so it isn't kept in memory either
+        with self._lock:
+            self.hits += 1
+        metrics.increment("tts_cache.hits")
+        metrics.observe("tts_cache.hit_latency", time.perf_counter() - start_time)
+        return data
+
+    def get_buffer(self, key, name):
+        """Same as get(), but wraps the bytes in a named BytesIO like the speech managers return"""
+        data = self.get(key)
+        if data is None:
+            return None
+        buffer = io.BytesIO(data)
+        buffer.name = name
+        return buffer
+
+    def put(self, key, data):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so a crash never leaves a half-written entry behind.
+            # Named per process and thread, since several processes can share the cache (e.g. batch_render.py's speech workers)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"[red]TTS cache write failed: {e}")
+            return
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            self._remember(key, data)
+            evicted = self._evict()
+        for evicted_key in evicted:
+            try:
+                os.remove(self._path(evicted_key))
+            except OSError:
+                pass
+        if evicted:
+            metrics.increment("tts_cache.evictions", len(evicted))
+        metrics.set_gauge("tts_cache.bytes", self._total_bytes)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _load_index(self):
+        # Rebuild the LRU order from the files already on disk, oldest first
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for file_name in files:
+                    if file_name.endswith(".tmp"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(root, file_name))
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, file_name, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        metrics.set_gauge("tts_cache.bytes", self._total_bytes)
+
+    def _remember(self, key, data):
+        # Caller must hold self._lock
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        # Caller must hold self._lock
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+        self._memory.pop(key, None)
+
+    def _evict(self):
+        # Caller must hold self._lock. Returns the keys whose files need deleting.
+        evicted = []
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._memory.pop(key, None)
+            evicted.append(key)
+        return evicted
+
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_tts_cache(cache_dir=None):
+    """The TTSCache every speech manager in the process shares for cache_dir (default TTS_CACHE_DIR), so the cap covers the whole directory"""
+    cache_dir = os.path.abspath(cache_dir or os.getenv("TTS_CACHE_DIR", ".tts_cache"))
+    with _shared_caches_lock:
+        if cache_dir not in _shared_caches:
+            _shared_caches[cache_dir] = TTSCache(cache_dir)
+        return _shared_caches[cache_dir]
@@ -0,0 +1,127 @@
+import time
+import weakref
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rich import print
+
+from metrics import metrics
+
+
+class TurnCancelled(Exception):
+    pass
+
+
+# Blocking calls that can't be interrupted themselves (e.g. a local TTS engine) run here, so a cancelled turn can walk away from them.
+# Whatever they were doing finishes on its own, and the result is thrown away.
+_background_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="turn")
+
+
+class CancelToken:
+    """
+    Everything one agent's turn is doing: its OpenAI request, its TTS and its playback. Cancelling the token stops all of them.
+    Anything that blocks during the turn should wait through the token (sleep, wait_for, run), so it gives up with
+    TurnCancelled the moment the turn is cancelled. Things that need stopping (e.g. a playing sound) are registered with on_cancel.
+    Use it as a context manager, so once the turn is over, cancelling it can't stop anything that belongs to a later turn.
+    """
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        # Completes when the turn is cancelled, so it can be waited on alongside other futures
+        self.future = Future()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self._callbacks = []
+        return False
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self.future.set_result(None)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[yellow]Problem while cancelling a turn: {e}")
+
+    def on_cancel(self, callback):
+        """Calls callback when the turn is cancelled, or right away if it already has been"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        if self._event.is_set():
+            raise TurnCancelled()
+
+    def sleep(self, seconds):
+        """time.sleep(), except it wakes up (with TurnCancelled) as soon as the turn is cancelled"""
+        if self._event.wait(max(0, seconds)):
+            raise TurnCancelled()
+
+    def wait_for(self, future, timeout=None):
+        """future.result(), unless the turn is cancelled first"""
+        done, _ = wait([future, self.future], timeout=timeout, return_when=FIRST_COMPLETED)
+        if self.future in done:
+            raise TurnCancelled()
+        return future.result(timeout=0)
+
+    def run(self, function, *args, **kwargs):
+        """Calls function on a background thread and returns its result, unless the turn is cancelled first"""
+        return self.wait_for(_background_pool.submit(function, *args, **kwargs))
+
+
+class TurnCanceller:
+    """
+    Hands out a CancelToken for every turn, and cancels all of them at once when the human barges in.
+    Each barge-in starts a new epoch. A turn that was queued up before it (an agent that had already been activated,
+    or had its answer and audio ready and was waiting to speak) is from an old epoch, so its token starts out cancelled.
+    """
+
+    def __init__(self):
+        self.epoch = 0
+        self._tokens = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def new_turn(self, epoch=None):
+        """A token for a turn that was queued up in epoch (default: now)"""
+        with self._lock:
+            token = CancelToken(self.epoch if epoch is None else epoch)
+            if token.epoch == self.epoch:
+                self._tokens.add(token)
+                return token
+        metrics.increment("turns.discarded")
+        token.cancel()
+        return token
+
+    def cancel_all(self):
+        """Starts a new epoch and cancels every turn that's in progress. Returns how many were cancelled"""
+        start_time = time.perf_counter()
+        with self._lock:
+            self.epoch += 1
+            tokens = [token for token in self._tokens if not token.cancelled]
+            self._tokens = weakref.WeakSet()
+        for token in tokens:
+            token.cancel()
+        metrics.increment("turns.cancelled", len(tokens))
+        metrics.observe("turns.cancel_all", time.perf_counter() - start_time)
+        return len(tokens)
+
+
+# Process-wide instance, import this rather than making your own
+turn_canceller = TurnCanceller()
@@ -0,0 +1,160 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from rich import print
+
+from metrics import metrics
+
+# US dollars per million tokens: (input, cached input, output). These change, check https://openai.com/api/pricing
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+
+def price_for(model):
+    # Responses name the exact snapshot (e.g. gpt-4o-2024-08-06), so match on the longest known prefix
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model and model.startswith(name):
+            return MODEL_PRICES[name]
+    return None
+
+
+def _new_totals():
+    return {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "estimated_prompt_tokens": 0, "cost_usd": 0.0}
+
+
+class UsageTracker:
+    """
+    Adds up the token usage OpenAI reports on every completion (completion.usage), per agent, per model, per minute and for the whole session,
+    along with what it cost. Where we also estimated the prompt size locally with tiktoken, the two are compared, so you can see how far
+    off the estimate is (images especially).
+
+    Budgets, all optional (set them here or with the environment variables):
+    - session_budget_usd / OPENAI_BUDGET_SESSION_USD: once the whole session has spent this much, every agent is downgraded to downgrade_model
+    - agent_budget_usd / OPENAI_BUDGET_AGENT_USD: same, but for each agent on its own
+    - tokens_per_minute / OPENAI_BUDGET_TOKENS_PER_MINUTE: requests wait (throttle) while the last 60 seconds used more than this
+    """
+
+    def __init__(self, session_budget_usd=None, agent_budget_usd=None, tokens_per_minute=None, downgrade_model=None, max_throttle_seconds=60):
+        self.session_budget_usd = session_budget_usd if session_budget_usd is not None else self._env_float("OPENAI_BUDGET_SESSION_USD")
+        self.agent_budget_usd = agent_budget_usd if agent_budget_usd is not None else self._env_float("OPENAI_BUDGET_AGENT_USD")
+        self.tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else self._env_float("OPENAI_BUDGET_TOKENS_PER_MINUTE")
+        self.downgrade_model = downgrade_model or os.getenv("OPENAI_DOWNGRADE_MODEL", "gpt-4o-mini")
+        self.max_throttle_seconds = max_throttle_seconds
+        self.started_at = time.time()
+        self.session = _new_totals()
+        self.agents = defaultdict(_new_totals)
+        self.models = defaultdict(_new_totals)
+        # Minute (since the epoch) -> totals, for the last hour
+        self.minutes = {}
+        # (time, tokens) of recent requests, for the tokens_per_minute budget
+        self._recent = deque()
+        self._downgraded = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _env_float(name):
+        value = os.getenv(name)
+        return float(value) if value else None
+
+    def record(self, agent, model, usage, estimated_prompt_tokens=None):
+        """Call with completion.usage after every request. estimated_prompt_tokens is our own tiktoken count of the prompt, if we have one."""
+        if usage is None:
+            return
+        prompt_tokens = usage.prompt_tokens or 0
+        completion_tokens = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        prices = price_for(model)
+        cost = 0.0
+        if prices:
+            input_price, cached_price, output_price = prices
+            cost = ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+        now = time.time()
+        minute = int(now // 60)
+        with self._lock:
+            if minute not in self.minutes:
+                self.minutes[minute] = _new_totals()
+                for old_minute in [old_minute for old_minute in self.minutes if old_minute < minute - 60]:
+                    del self.minutes[old_minute]
+            for totals in (self.session, self.agents[agent], self.models[model], self.minutes[minute]):
+                totals["requests"] += 1
+                totals["prompt_tokens"] += prompt_tokens
+                totals["cached_tokens"] += cached_tokens
+                totals["completion_tokens"] += completion_tokens
+                totals["estimated_prompt_tokens"] += estimated_prompt_tokens or 0
+                totals["cost_usd"] += cost
+            self._recent.append((now, prompt_tokens + completion_tokens))
+            session_cost = self.session["cost_usd"]
+
+        metrics.increment("openai.prompt_tokens", prompt_tokens)
+        metrics.increment("openai.cached_tokens", cached_tokens)
+        metrics.increment("openai.completion_tokens", completion_tokens)
+        metrics.increment(f"openai.{agent}.cost_usd", cost)
+        metrics.set_gauge("openai.session_cost_usd", session_cost)
+        metrics.set_gauge("openai.tokens_last_minute", self.tokens_last_minute())
+        if estimated_prompt_tokens and prompt_tokens:
+            # Positive means we overestimated
+            metrics.observe("openai.estimate_error", (estimated_prompt_tokens - prompt_tokens) / prompt_tokens)
+        if prices is None:
+            print(f"[yellow]No price known for model {model}, add it to MODEL_PRICES in usage_tracker.py")
+
+    def choose_model(self, agent, model):
+        """Call before every request (after wait_for_budget). Returns the model to use: downgrade_model instead of model if a spending budget has run out"""
+        with self._lock:
+            over_budget = ((self.session_budget_usd is not None and self.session["cost_usd"] >= self.session_budget_usd)
+                           or (self.agent_budget_usd is not None and self.agents[agent]["cost_usd"] >= self.agent_budget_usd))
+        if not over_budget or model == self.downgrade_model:
+            return model
+        if agent not in self._downgraded:
+            self._downgraded.add(agent)
+            print(f"[yellow]{agent} has used up its OpenAI budget, switching it from {model} to {self.downgrade_model}")
+            metrics.increment("openai.downgrades")
+        return self.downgrade_model
+
+    def tokens_last_minute(self):
+        with self._lock:
+            cutoff = time.time() - 60
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            return sum(tokens for _, tokens in self._recent)
+
+    def wait_for_budget(self, cancel=None):
+        """
+        Call before every request, and before taking any lock other threads need. Waits (at most max_throttle_seconds)
+        while we're over the tokens_per_minute budget. Pass a CancelToken to stop waiting (with TurnCancelled) when the turn is cancelled.
+        """
+        if self.tokens_per_minute is None:
+            return
+        start_time = time.perf_counter()
+        while self.tokens_last_minute() >= self.tokens_per_minute and time.perf_counter() - start_time < self.max_throttle_seconds:
+            if cancel:
+                cancel.sleep(0.5)
+            else:
+                time.sleep(0.5)
+        waited = time.perf_counter() - start_time
+        if waited > 0.1:
+            metrics.observe("openai.throttled", waited)
+            print(f"[yellow]Waited {waited:.1f}s to stay under {self.tokens_per_minute:.0f} OpenAI tokens per minute")
+
+    def snapshot(self):
+        with self._lock:
+            recent_minutes = sorted(self.minutes.items())[-10:]
+            return {
+                "session": dict(self.session, seconds=time.time() - self.started_at),
+                "agents": {agent: dict(totals) for agent, totals in self.agents.items()},
+                "models": {model: dict(totals) for model, totals in self.models.items()},
+                "last_minutes": {time.strftime("%H:%M", time.localtime(minute * 60)): dict(totals) for minute, totals in recent_minutes},
+                "budgets": {"session_usd": self.session_budget_usd, "agent_usd": self.agent_budget_usd, "tokens_per_minute": self.tokens_per_minute,
+                            "downgraded_agents": sorted(self._downgraded)},
+            }
+
+
+# Process-wide instance, import this rather than making your own
+usage_tracker = UsageTracker()
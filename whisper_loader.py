@@ -0,0 +1,85 @@
+import time
+import threading
+from rich import print
+
+from metrics import metrics
+
+
+class WhisperLoader:
+    """
+    Loads the Whisper model on a background thread as soon as start() is called, then warms it up on a bit of silence,
+    so the first time someone talks to the agents doesn't stall on downloading/loading the model.
+    whisper_openai (and so torch/transformers) is only imported on the background thread, so this never slows down startup.
+
+    state is one of: "not_started", "loading", "warming_up", "ready", "failed"
+    on_state_change(state) is called whenever it changes, e.g. to tell the overlay.
+    manager_factory builds the manager instead of WhisperManager(), e.g. process_workers.WhisperWorker to run it in its own process.
+    """
+
+    def __init__(self, on_state_change=None, manager_factory=None):
+        self.on_state_change = on_state_change
+        self.manager_factory = manager_factory
+        self.state = "not_started"
+        self.error = None
+        self._manager = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._load, name="whisper-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def get(self, timeout=None):
+        """Returns the WhisperManager, waiting for it to finish loading if it hasn't yet. Starts loading if nobody has."""
+        self.start()
+        if not self._finished.is_set():
+            print("[yellow]Waiting for the Whisper model to finish loading...")
+        if not self._finished.wait(timeout):
+            raise TimeoutError("The Whisper model is still loading")
+        if self._manager is None:
+            raise RuntimeError(f"The Whisper model failed to load: {self.error}")
+        return self._manager
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.set_gauge("whisper.ready", 1 if state == "ready" else 0)
+        if self.on_state_change:
+            try:
+                self.on_state_change(state)
+            except Exception as e:
+                print(f"[red]Whisper status callback failed: {e}")
+
+    def _load(self):
+        try:
+            self._set_state("loading")
+            start_time = time.perf_counter()
+            if self.manager_factory:
+                manager = self.manager_factory()
+            else:
+                from whisper_openai import WhisperManager
+                manager = WhisperManager()
+            load_time = time.perf_counter() - start_time
+            metrics.observe("whisper.load", load_time)
+
+            self._set_state("warming_up")
+            warm_up_time = manager.warm_up()
+            metrics.observe("whisper.warm_up", warm_up_time)
+
+            self._manager = manager
+            self._set_state("ready")
+            print(f"[green]Whisper model is ready! (loaded in {load_time:.1f}s, warmed up in {warm_up_time:.1f}s)")
+        except Exception as e:
+            self.error = e
+            self._set_state("failed")
+            print(f"[red]Couldn't load the Whisper model: {e}")
+        finally:
+            self._finished.set()
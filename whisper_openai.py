@@ -1,4 +1,6 @@
 import os
+import time
+import numpy as np
 import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
 from rich import print
@@ -10,9 +12,16 @@ class WhisperManager:
     - Good accuracy for English speech
     - Safe on machines without CUDA (falls back to CPU)
     - Override model via env: WHISPER_MODEL=openai/whisper-small (or base, medium, large-v3)
+
+    CPU-only machines can pick a faster backend via env: WHISPER_BACKEND=
+    - torch (default): plain float32 model
+    - int8: dynamic int8 quantization of the Linear layers. Usually ~2x faster on CPU for a small accuracy cost
+    - onnx: export the model to ONNX Runtime (needs pip install optimum[onnxruntime]). Exported once, then loaded from .whisper_onnx/
+    WHISPER_THREADS sets how many CPU threads inference uses (defaults to torch's choice, usually every core).
+    WHISPER_BATCH_SIZE / WHISPER_CHUNK_LENGTH override the pipeline's batching.
     """
 
-    def __init__(self, language="en", multilingual=False):
+    def __init__(self, language="en", multilingual=False, backend=None, num_threads=None):
         use_cuda = torch.cuda.is_available()
         print(f"[bold cyan]CUDA available:[/bold cyan] {use_cuda}")
         if use_cuda:
@@ -30,13 +39,38 @@ class WhisperManager:
         model_id = os.getenv("WHISPER_MODEL", default_model)
         print(f"[cyan]Loading Whisper model: {model_id}[/cyan]")
 
+        self.backend = (backend or os.getenv("WHISPER_BACKEND", "torch")).lower()
+        if use_cuda and self.backend != "torch":
+            print(f"[yellow]WHISPER_BACKEND={self.backend} is for CPU-only machines, using the normal torch backend on the GPU")
+            self.backend = "torch"
+
+        # Explicit CPU threading. Intra-op threads are what matter for a single transcription
+        num_threads = num_threads or os.getenv("WHISPER_THREADS")
+        if num_threads and not use_cuda:
+            torch.set_num_threads(int(num_threads))
+            try:
+                # Can only be set once per process, before any parallel work has run
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass
+        self.num_threads = int(num_threads) if num_threads else torch.get_num_threads()
+        print(f"[cyan]Whisper backend: {self.backend}, CPU threads: {self.num_threads}[/cyan]")
+
         # Load model & processor
-        model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id,
-            torch_dtype=torch_dtype,
-            low_cpu_mem_usage=True,
-            use_safetensors=True,
-        ).to(self.device)
+        if self.backend == "onnx":
+            model = self._load_onnx_model(model_id)
+        else:
+            model = AutoModelForSpeechSeq2Seq.from_pretrained(
+                model_id,
+                torch_dtype=torch_dtype,
+                low_cpu_mem_usage=True,
+                use_safetensors=True,
+            ).to(self.device)
+            if self.backend == "int8":
+                # Swaps every Linear layer for an int8 version that quantizes its activations on the fly
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            elif self.backend != "torch":
+                raise ValueError(f"Unknown WHISPER_BACKEND '{self.backend}'. Use torch, int8 or onnx.")
 
         # Basic generation prefs
         model.generation_config.is_multilingual = multilingual
@@ -52,6 +86,8 @@ class WhisperManager:
         # Batch/Chunk sizing optimized for tiny model
         batch_size = 16 if use_cuda else 4  # Increased for tiny model
         chunk_length_s = 30 if use_cuda else 20  # Slightly increased for better accuracy
+        batch_size = int(os.getenv("WHISPER_BATCH_SIZE", batch_size))
+        chunk_length_s = int(os.getenv("WHISPER_CHUNK_LENGTH", chunk_length_s))
 
         self.pipe = pipeline(
             "automatic-speech-recognition",
@@ -66,28 +102,74 @@ class WhisperManager:
             device=device_arg,
         )
 
+    def _load_onnx_model(self, model_id):
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = self.num_threads
+        session_options.inter_op_num_threads = 1
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Exporting takes a while, so only do it the first time
+        onnx_dir = os.path.join(".whisper_onnx", model_id.replace("/", "--"))
+        exported = os.path.isdir(onnx_dir)
+        model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            onnx_dir if exported else model_id,
+            export=not exported,
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+        )
+        if not exported:
+            model.save_pretrained(onnx_dir)
+        return model
+
+    def warm_up(self, seconds=1.0):
+        """
+        Runs one inference on a little silence. The first call through the pipeline pays for a lot of one-off setup
+        (kernel selection, memory allocation, etc), so do it here instead of on the first real transcription.
+        Returns how long it took.
+        """
+        start_time = time.perf_counter()
+        sampling_rate = self.pipe.feature_extractor.sampling_rate
+        silence = np.zeros(int(sampling_rate * seconds), dtype=np.float32)
+        self.pipe({"raw": silence, "sampling_rate": sampling_rate}, return_timestamps=False)
+        return time.perf_counter() - start_time
+
     def audio_to_text(self, audio_file, timestamps=None):
         """
         timestamps: None | "sentence" | "word"
+        audio_file can be a path or an in-memory file object (e.g. the BytesIO returned by the speech managers)
         Returns text if timestamps=None, else a list of dicts with text/start_time/end_time
         """
-        if timestamps is None:
-            result = self.pipe(audio_file, return_timestamps=False)
-            return result["text"]
-
-        if timestamps == "sentence":
-            result = self.pipe(audio_file, return_timestamps=True)
-        elif timestamps == "word":
-            result = self.pipe(audio_file, return_timestamps="word")
-        else:
+        if timestamps not in (None, "sentence", "word"):
             return " "
+        return self.audio_to_text_batch([audio_file], timestamps)[0]
+
+    def audio_to_text_batch(self, audio_files, timestamps=None, batch_size=None):
+        """
+        Same as audio_to_text, but transcribes several clips in one go. Their chunks are run through the model
+        together in batches of batch_size, which is much faster than transcribing them one at a time.
+        Returns one result per clip, in order.
+        """
+        # The pipeline decodes raw bytes with ffmpeg, same as it would a file
+        audio_files = [audio_file.getvalue() if hasattr(audio_file, "getvalue") else audio_file for audio_file in audio_files]
+        return_timestamps = {None: False, "sentence": True, "word": "word"}[timestamps]
+        pipe_kwargs = {"return_timestamps": return_timestamps}
+        if batch_size:
+            pipe_kwargs["batch_size"] = batch_size
+        results = self.pipe(audio_files, **pipe_kwargs)
+
+        if timestamps is None:
+            return [result["text"] for result in results]
 
         # normalize chunked timestamps
-        out = []
-        for ch in result.get("chunks", []):
-            out.append({
-                "text": ch.get("text", ""),
-                "start_time": (ch.get("timestamp") or [None, None])[0],
-                "end_time":   (ch.get("timestamp") or [None, None])[1],
-            })
-        return out
+        outputs = []
+        for result in results:
+            out = []
+            for ch in result.get("chunks", []):
+                out.append({
+                    "text": ch.get("text", ""),
+                    "start_time": (ch.get("timestamp") or [None, None])[0],
+                    "end_time":   (ch.get("timestamp") or [None, None])[1],
+                })
+            outputs.append(out)
+        return outputs